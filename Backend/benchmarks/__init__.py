@@ -0,0 +1,43 @@
+"""
+Standalone performance benchmarks for the quiz backend.
+
+Run from the Backend directory, e.g. ``python -m benchmarks.quiz_create``.
+Each benchmark runs against a throwaway test database created from the
+current settings, so it never touches development data.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configure Django for running outside manage.py."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_project.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Create a throwaway test database for the duration of the block."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+@contextmanager
+def timed():
+    """Yield a dict that receives the elapsed wall time in milliseconds."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['ms'] = (time.perf_counter() - start) * 1000
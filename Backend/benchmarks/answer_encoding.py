@@ -0,0 +1,97 @@
+"""
+Benchmark the packed attempt answer encoding against JSON.
+
+Seeds one quiz with synthetic attempts stored as JSON in a throwaway
+database, measures the answer bytes per attempt and the time to rebuild the
+quiz's stats, converts every attempt with ``convert_attempt_answers`` and
+measures again.
+
+    python -m benchmarks.answer_encoding --attempts 100000 --questions 20
+"""
+import argparse
+import io
+import json
+import random
+import time
+
+from . import setup_django, test_database
+
+
+OPTIONS = ['Mitochondria', 'Golgi apparatus', 'Endoplasmic reticulum', 'Ribosome']
+
+
+def seed_attempts(quiz, questions, count, batch_size=5000):
+    from quiz.models import QuizAttempt
+
+    rng = random.Random(42)
+    keys = [str(question.id) for question in questions]
+    for start in range(0, count, batch_size):
+        attempts = []
+        for _ in range(min(batch_size, count - start)):
+            # Leave roughly one question in ten unanswered
+            answers = {key: rng.choice(OPTIONS) for key in keys if rng.random() > 0.1}
+            score = sum(answers.get(key) == OPTIONS[0] for key in keys)
+            attempts.append(QuizAttempt(quiz=quiz, answers=answers, score=score, total_questions=len(keys)))
+        QuizAttempt.objects.bulk_create(attempts)
+
+
+def answer_bytes(connection):
+    """Average stored bytes per attempt for the answer columns."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT AVG(LENGTH(answers) + COALESCE(LENGTH(packed), 0)) FROM quiz_quizattempt'
+        )
+        return cursor.fetchone()[0]
+
+
+def time_stats_rebuild(quiz_id):
+    from quiz.stats import rebuild_quiz_stats
+
+    start = time.perf_counter()
+    rebuild_quiz_stats(quiz_id)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--questions', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from quiz.models import Question, Quiz
+
+    with test_database() as connection:
+        quiz = Quiz.objects.create(title='Encoding benchmark')
+        questions = Question.objects.bulk_create([
+            Question(quiz=quiz, question_text=f'Q{i}', question_type='mcq',
+                     options=OPTIONS, correct_answer=OPTIONS[0], order=i)
+            for i in range(args.questions)
+        ])
+        seed_attempts(quiz, questions, args.attempts)
+
+        json_bytes = answer_bytes(connection)
+        json_stats = time_stats_rebuild(quiz.id)
+
+        start = time.perf_counter()
+        call_command('convert_attempt_answers', stdout=io.StringIO())
+        convert_seconds = time.perf_counter() - start
+
+        packed_bytes = answer_bytes(connection)
+        packed_stats = time_stats_rebuild(quiz.id)
+
+    print(json.dumps({
+        'attempts': args.attempts,
+        'questions': args.questions,
+        'json_bytes_per_attempt': round(json_bytes, 1),
+        # + 8 bytes for the layout id column
+        'packed_bytes_per_attempt': round(packed_bytes + 8, 1),
+        'stats_rebuild_json_seconds': round(json_stats, 2),
+        'stats_rebuild_packed_seconds': round(packed_stats, 2),
+        'convert_attempts_per_second': round(args.attempts / convert_seconds),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
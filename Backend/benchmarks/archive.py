@@ -0,0 +1,94 @@
+"""
+Benchmark archiving old attempts to gzip segment files.
+
+Seeds one quiz with synthetic attempts spread over a year in a throwaway
+database, archives everything older than 30 days and reports the archive
+throughput, bytes per archived attempt, and the time to read one week of
+archived attempts against reading the whole archive.
+
+    python -m benchmarks.archive --attempts 200000 --questions 20
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from . import setup_django, test_database
+
+
+def seed_attempts(quiz, questions, count, now, batch_size=5000):
+    from quiz.models import QuizAttempt
+
+    rng = random.Random(42)
+    keys = [str(question.id) for question in questions]
+    for start in range(0, count, batch_size):
+        attempts = []
+        for _ in range(min(batch_size, count - start)):
+            answers = {key: rng.choice('ABCD') for key in keys}
+            score = sum(answers[key] == 'A' for key in keys)
+            submitted_at = now - timedelta(seconds=rng.randrange(365 * 86400))
+            attempts.append(QuizAttempt(quiz=quiz, answers=answers, score=score,
+                                        total_questions=len(keys), submitted_at=submitted_at))
+        QuizAttempt.objects.bulk_create(attempts)
+
+
+def time_read(quiz_id, since=None, until=None):
+    from quiz.archive import iter_archived_attempts
+
+    start = time.perf_counter()
+    rows = sum(1 for _ in iter_archived_attempts(quiz_id, since, until))
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=200000)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.utils import timezone
+    from quiz.archive import archive_quiz
+    from quiz.models import Question, Quiz
+
+    with tempfile.TemporaryDirectory() as tmp, test_database():
+        settings.QUIZ_ARCHIVE_DIR = tmp
+        now = timezone.now()
+        quiz = Quiz.objects.create(title='Archive benchmark')
+        questions = Question.objects.bulk_create([
+            Question(quiz=quiz, question_text=f'Q{i}', question_type='mcq',
+                     options=['A', 'B', 'C', 'D'], correct_answer='A', order=i)
+            for i in range(args.questions)
+        ])
+        seed_attempts(quiz, questions, args.attempts, now)
+
+        start = time.perf_counter()
+        result = archive_quiz(quiz.id, now - timedelta(days=30), batch_size=args.batch_size)
+        archive_seconds = time.perf_counter() - start
+
+        archive_bytes = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(tmp) for name in names
+        )
+        all_rows, all_seconds = time_read(quiz.id)
+        week_rows, week_seconds = time_read(quiz.id, now - timedelta(days=200), now - timedelta(days=193))
+
+    print(json.dumps({
+        'archived': result.attempts,
+        'segments': result.segments,
+        'archive_attempts_per_second': round(result.attempts / archive_seconds),
+        'bytes_per_archived_attempt': round(archive_bytes / result.attempts, 1),
+        'read_all_rows': all_rows,
+        'read_all_seconds': round(all_seconds, 3),
+        'read_week_rows': week_rows,
+        'read_week_seconds': round(week_seconds, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare WSGI (gunicorn sync workers) with ASGI (gunicorn + uvicorn workers).
+
+Migrates a throwaway SQLite file, then for each server mode starts gunicorn
+on a free port, drives quiz-detail and quiz-submit over HTTP at increasing
+concurrency (see benchmarks.load) and stops it again. Both modes serve the
+same database and quizzes, so the numbers are directly comparable.
+
+    python -m benchmarks.asgi --workers 2 --concurrency 1 16 64 --requests 500
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from .load import HttpDriver, Workload, prepare_http, run_endpoint
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ENDPOINTS = ['quiz-detail', 'quiz-submit']
+
+
+def server_command(mode, port, workers, threads):
+    command = ['gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    if mode == 'wsgi':
+        return command + ['--threads', str(threads), 'quiz_project.wsgi:application']
+    return command + ['--worker-class', 'uvicorn.workers.UvicornWorker', 'quiz_project.asgi:application']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + '/api/quizzes/', timeout=1).close()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'server at {url} did not start within {timeout}s')
+
+
+def benchmark_mode(mode, env, args, questions, username):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        server_command(mode, port, args.workers, args.threads),
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url)
+        driver = HttpDriver(url)
+        if questions is None:
+            username, questions = prepare_http(driver, args.quizzes, args.questions)
+        workload = Workload(driver, questions, args.questions, random.Random(args.seed), username)
+        results = {}
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                results[f'{endpoint}@{concurrency}'] = run_endpoint(
+                    driver, workload, endpoint, args.requests, concurrency,
+                )
+        return results, questions, username
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes per mode.')
+    parser.add_argument('--threads', type=int, default=1, help='Threads per WSGI worker.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and concurrency.')
+    parser.add_argument('--quizzes', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Also write the JSON report here.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f'sqlite:///{tmp}/bench.sqlite3',
+            QUIZ_ATTEMPT_SPOOL_PATH=f'{tmp}/spool.sqlite3',
+            QUIZ_LOGIN_USERNAME_BURST='0',
+            QUIZ_LOGIN_IP_BURST='0',
+            DEBUG='False',
+        )
+        env.pop('QUIZ_ASGI', None)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+                       cwd=BACKEND_DIR, env=env, check=True)
+
+        report = {}
+        questions = username = None
+        for mode in ('wsgi', 'asgi'):
+            report[mode], questions, username = benchmark_mode(mode, env, args, questions, username)
+
+    print(f"{'endpoint@concurrency':>22} {'mode':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for key in report['wsgi']:
+        for mode in ('wsgi', 'asgi'):
+            row = report[mode][key]
+            print(f"{key:>22} {mode:>5} {row['rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['errors']:>7}")
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(json.dumps(report, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the composite indexes added in quiz migration 0004.
+
+Seeds synthetic quizzes, questions and attempts into a throwaway database
+migrated to 0003, runs the hot queries with EXPLAIN and timings, then
+migrates to 0004 and repeats. Uses whichever database the settings point at:
+SQLite by default, PostgreSQL when DATABASE_URL is set.
+
+    python -m benchmarks.indexes --quizzes 20 --questions 50 --attempts 200000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from . import setup_django, test_database
+from .seed import seed
+
+
+BEFORE = ('quiz', '0003_quiz_stats')
+AFTER = ('quiz', '0004_composite_indexes')
+
+
+def migrate_to(connection, target):
+    """
+    Migrate to ``target`` and return its historical app registry: later
+    migrations add columns the current models would query.
+    """
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate([target])
+    return executor.loader.project_state(target).apps
+
+
+def queries(quiz_id, apps):
+    from django.utils import timezone
+
+    Question = apps.get_model('quiz', 'Question')
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+
+    since = timezone.now() - timedelta(days=7)
+    return {
+        'question_order': Question.objects.filter(quiz_id=quiz_id).order_by('order'),
+        'attempts_by_time': QuizAttempt.objects.filter(
+            quiz_id=quiz_id, submitted_at__gte=since,
+        ).order_by('-submitted_at'),
+        'leaderboard_top10': QuizAttempt.objects.filter(quiz_id=quiz_id).order_by(
+            '-score', 'submitted_at',
+        ).values_list('id', 'score', 'total_questions')[:10],
+    }
+
+
+def measure(quiz_id, repeat, apps):
+    report = {}
+    for name, queryset in queries(quiz_id, apps).items():
+        plan = queryset.explain().replace('\n', '\n  ')
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        report[name] = {'plan': plan, 'best_ms': round(min(timings), 3)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quizzes', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--attempts', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    with test_database():
+        apps = migrate_to(connection, BEFORE)
+        quiz_ids = list(seed(args.quizzes, args.questions, args.attempts, apps=apps))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        quiz_id = quiz_ids[len(quiz_ids) // 2]
+
+        before = measure(quiz_id, args.repeat, apps)
+        apps = migrate_to(connection, AFTER)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        after = measure(quiz_id, args.repeat, apps)
+
+    print(f'Database: {connection.vendor}, {args.attempts} attempts, '
+          f'{args.quizzes} quizzes x {args.questions} questions\n')
+    for name in before:
+        print(f'== {name}')
+        print(f"before ({before[name]['best_ms']} ms):\n  {before[name]['plan']}")
+        print(f"after  ({after[name]['best_ms']} ms):\n  {after[name]['plan']}\n")
+
+
+if __name__ == '__main__':
+    main()
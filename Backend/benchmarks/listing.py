@@ -0,0 +1,67 @@
+"""
+Benchmark deep pages of GET /api/quizzes/.
+
+Seeds many quizzes, then times the keyset-paginated listing at increasing
+depths against the equivalent OFFSET query. Keyset latency should stay flat
+while OFFSET grows with depth.
+
+    python -m benchmarks.listing --quizzes 200000 --depths 0 1000 10000 100000
+"""
+import argparse
+import time
+
+from . import setup_django, test_database
+
+
+def seed_quizzes(num_quizzes, batch_size=10000):
+    from quiz.models import Quiz
+
+    for offset in range(0, num_quizzes, batch_size):
+        Quiz.objects.bulk_create([
+            Quiz(title=f'Listed quiz {i}')
+            for i in range(offset, min(num_quizzes, offset + batch_size))
+        ])
+
+
+def best_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quizzes', type=int, default=100000)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1000, 10000, 50000, 90000])
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from quiz.pagination import KeysetPagination
+    from quiz.views import QuizListCreateView
+
+    with test_database():
+        seed_quizzes(args.quizzes)
+        client = Client()
+        queryset = QuizListCreateView().get_queryset().order_by('-created_at', '-id')
+        paginator = KeysetPagination()
+
+        print(f"{'depth':>8} {'keyset_http_ms':>15} {'offset_query_ms':>16}")
+        for depth in args.depths:
+            url = f'/api/quizzes/?page_size={args.page_size}'
+            if depth:
+                url += f'&cursor={paginator.encode_cursor(queryset[depth - 1])}'
+
+            keyset = best_ms(lambda: client.get(url), args.repeat)
+            # Offset baseline is ORM-only (no HTTP overhead), so it is flattered
+            offset = best_ms(lambda: list(queryset[depth:depth + args.page_size]), args.repeat)
+            print(f'{depth:>8} {keyset:>15} {offset:>16}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+End-to-end load benchmark for the quiz API.
+
+Two drivers are available:
+
+* ``inprocess`` seeds a throwaway database at the requested scale and sends
+  requests through Django's test client, recording queries per request.
+* ``http`` drives a running server (e.g. ``manage.py runserver`` or gunicorn)
+  over HTTP with a thread pool. It prepares its own user and quizzes through
+  the API, so it works against any deployment you are allowed to load.
+
+Login throttling is switched off for the in-process driver so auth-login
+measures password hashing rather than 429s; start the server under test with
+QUIZ_LOGIN_USERNAME_BURST=0 QUIZ_LOGIN_IP_BURST=0 for the same effect over HTTP.
+
+Results are written as JSON so runs can be compared across commits:
+
+    python -m benchmarks.load --driver inprocess --scale 10x20x10000 --output before.json
+    python -m benchmarks.load --driver http --url http://127.0.0.1:8000 --concurrency 16
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from . import setup_django, test_database
+from .seed import BENCH_PASSWORD, BENCH_USERNAME, parse_scale, seed
+
+
+ENDPOINTS = ['auth-login', 'quiz-detail', 'quiz-submit', 'quiz-create']
+
+
+class InProcessDriver:
+    """Sends requests through django.test.Client and counts queries."""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        kwargs = {}
+        if token:
+            kwargs['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        if data is not None:
+            kwargs['data'] = json.dumps(data)
+            kwargs['content_type'] = 'application/json'
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method.lower())(path, **kwargs)
+            elapsed = (time.perf_counter() - start) * 1000
+        return response.status_code, elapsed, len(response.content), len(queries), response.content
+
+
+class HttpDriver:
+    """Sends requests to a running server with urllib (no query counts)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Accept': 'application/json'}
+        body = None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, content = exc.code, exc.read()
+        elapsed = (time.perf_counter() - start) * 1000
+        return status, elapsed, len(content), None, content
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(sample['ms'] for sample in samples)
+    queries = [sample['queries'] for sample in samples if sample['queries'] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample['status'] >= 400),
+        'rps': round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'mean_bytes': round(sum(sample['bytes'] for sample in samples) / len(samples)) if samples else None,
+    }
+
+
+class Workload:
+    """Builds requests for each benchmarked endpoint."""
+
+    def __init__(self, driver, questions, num_questions, rng, username=BENCH_USERNAME):
+        self.driver = driver
+        self.username = username
+        self.questions = questions
+        self.quiz_ids = list(questions)
+        self.num_questions = num_questions
+        self.rng = rng
+        self.token = None
+
+    def login(self):
+        status, _, _, _, content = self.driver.request(
+            'POST', '/api/auth/login/', {'username': self.username, 'password': BENCH_PASSWORD},
+        )
+        if status != 200:
+            raise RuntimeError(f'benchmark login failed with HTTP {status}')
+        self.token = json.loads(content)['tokens']['access']
+
+    def build(self, endpoint):
+        """Return (method, path, data, token) for one request."""
+        if endpoint == 'auth-login':
+            return 'POST', '/api/auth/login/', {'username': self.username, 'password': BENCH_PASSWORD}, None
+        if endpoint == 'quiz-detail':
+            return 'GET', f'/api/quizzes/{self.rng.choice(self.quiz_ids)}/', None, None
+        if endpoint == 'quiz-submit':
+            quiz_id = self.rng.choice(self.quiz_ids)
+            answers = {str(q): self.rng.choice(['True', 'False']) for q in self.questions[quiz_id]}
+            return 'POST', f'/api/quizzes/{quiz_id}/submit/', {'answers': answers}, None
+        if endpoint == 'quiz-create':
+            return 'POST', '/api/quizzes/', quiz_payload(self.num_questions), self.token
+        raise ValueError(f'unknown endpoint {endpoint}')
+
+
+def quiz_payload(num_questions, title='Load test quiz'):
+    return {
+        'title': title,
+        'questions': [
+            {'question_text': f'Q{i}', 'question_type': 'tf',
+             'options': ['True', 'False'], 'correct_answer': 'True'}
+            for i in range(num_questions)
+        ],
+    }
+
+
+def run_endpoint(driver, workload, endpoint, num_requests, concurrency):
+    samples = []
+    lock = threading.Lock()
+
+    def one(_):
+        method, path, data, token = workload.build(endpoint)
+        status, ms, size, queries, _ = driver.request(method, path, data, token)
+        with lock:
+            samples.append({'status': status, 'ms': ms, 'bytes': size, 'queries': queries})
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(num_requests):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(num_requests)))
+    return summarize(samples, time.perf_counter() - start)
+
+
+def prepare_http(driver, num_quizzes, num_questions):
+    """Create a user and quizzes through the API; return {quiz_id: [question_id, ...]}."""
+    username = f'bench-{uuid.uuid4().hex[:8]}'
+    status, _, _, _, content = driver.request('POST', '/api/auth/signup/', {
+        'username': username, 'email': f'{username}@example.com', 'password': BENCH_PASSWORD,
+    })
+    if status != 201:
+        raise RuntimeError(f'benchmark signup failed with HTTP {status}: {content[:200]!r}')
+    token = json.loads(content)['tokens']['access']
+
+    questions = {}
+    for i in range(num_quizzes):
+        status, _, _, _, content = driver.request(
+            'POST', '/api/quizzes/', quiz_payload(num_questions, f'Load test quiz {i}'), token,
+        )
+        if status != 201:
+            raise RuntimeError(f'benchmark quiz creation failed with HTTP {status}')
+        quiz = json.loads(content)
+        questions[quiz['id']] = [question['id'] for question in quiz['questions']]
+    return username, questions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    num_quizzes, num_questions, num_attempts = args.scale
+    results = {}
+
+    if args.driver == 'inprocess':
+        setup_django()
+        from django.db import connection
+        from django.test import override_settings
+
+        with test_database(), override_settings(QUIZ_LOGIN_USERNAME_BURST=0, QUIZ_LOGIN_IP_BURST=0):
+            questions = seed(num_quizzes, num_questions, num_attempts, rng=rng)
+            driver = InProcessDriver()
+            workload = Workload(driver, questions, num_questions, rng)
+            workload.login()
+            for endpoint in args.endpoints:
+                results[endpoint] = run_endpoint(driver, workload, endpoint, args.requests, 1)
+            database = connection.vendor
+    else:
+        driver = HttpDriver(args.url)
+        username, questions = prepare_http(driver, num_quizzes, num_questions)
+        # The HTTP driver signs up a fresh user instead of the seeded one
+        workload = Workload(driver, questions, num_questions, rng, username=username)
+        workload.login()
+        for endpoint in args.endpoints:
+            results[endpoint] = run_endpoint(driver, workload, endpoint, args.requests, args.concurrency)
+        database = None
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'driver': args.driver,
+            'url': args.url if args.driver == 'http' else None,
+            'database': database,
+            'scale': {'quizzes': num_quizzes, 'questions': num_questions, 'attempts': num_attempts},
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency if args.driver == 'http' else 1,
+            'python': platform.python_version(),
+        },
+        'endpoints': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--driver', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--scale', type=parse_scale, default=(10, 20, 10000),
+                        help='QUIZZESxQUESTIONSxATTEMPTS (attempts are only seeded in-process)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP driver threads.')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark password hashers at different cost settings.
+
+Times one verify (what every login costs) for PBKDF2, scrypt and argon2
+(skipped unless argon2-cffi is installed) and derives the logins per second a
+single core can sustain. Pick the strongest setting whose verify time still
+meets your class-start login burst, then set QUIZ_PASSWORD_HASHER and the
+matching QUIZ_PBKDF2_* / QUIZ_SCRYPT_* / QUIZ_ARGON2_* variables.
+
+    python -m benchmarks.password_hashing --repeat 5
+"""
+import argparse
+import time
+
+from . import setup_django
+
+
+def configurations(args):
+    """Yield (label, hasher class, attribute overrides) to measure."""
+    from django.contrib.auth.hashers import (
+        Argon2PasswordHasher,
+        PBKDF2PasswordHasher,
+        ScryptPasswordHasher,
+    )
+
+    for iterations in args.pbkdf2_iterations:
+        yield f'pbkdf2 iterations={iterations}', PBKDF2PasswordHasher, {'iterations': iterations}
+    for work_factor in args.scrypt_work_factors:
+        yield f'scrypt n={work_factor} r=8 p=1', ScryptPasswordHasher, {
+            'work_factor': work_factor, 'maxmem': 2 * 128 * work_factor * 8,
+        }
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        print('argon2-cffi not installed; skipping argon2')
+        return
+    for memory_cost in args.argon2_memory_costs:
+        yield f'argon2 t=2 m={memory_cost} p=8', Argon2PasswordHasher, {'memory_cost': memory_cost}
+
+
+def measure(hasher_class, overrides, repeat):
+    hasher = type('BenchHasher', (hasher_class,), overrides)()
+    encoded = hasher.encode('correct horse battery staple', hasher.salt())
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assert hasher.verify('correct horse battery staple', encoded)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pbkdf2-iterations', type=int, nargs='+', default=[100000, 300000, 600000])
+    parser.add_argument('--scrypt-work-factors', type=int, nargs='+', default=[2 ** 13, 2 ** 14, 2 ** 15])
+    parser.add_argument('--argon2-memory-costs', type=int, nargs='+', default=[19456, 65536, 102400])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    print(f"{'hasher':>32} {'verify ms':>10} {'logins/s/core':>14}")
+    for label, hasher_class, overrides in configurations(args):
+        ms = measure(hasher_class, overrides, args.repeat)
+        print(f'{label:>32} {ms:>10.1f} {1000 / ms:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
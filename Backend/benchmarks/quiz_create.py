@@ -0,0 +1,62 @@
+"""
+Benchmark QuizCreateSerializer.create for growing question counts.
+
+Reports the number of queries and wall time per quiz size; the query count
+should stay flat as the number of questions grows. It only steps up once a
+quiz exceeds the backend's bulk insert limit (SQLite caps parameters per
+statement, so its batches hold ~160 questions).
+
+    python -m benchmarks.quiz_create --sizes 1 10 100 1000
+"""
+import argparse
+
+from . import setup_django, test_database, timed
+
+
+def build_payload(num_questions):
+    return {
+        'title': f'Benchmark quiz ({num_questions} questions)',
+        'questions': [
+            {
+                'question_text': f'Question {i}',
+                'question_type': 'mcq',
+                'options': ['A', 'B', 'C', 'D'],
+                'correct_answer': 'A',
+            }
+            for i in range(num_questions)
+        ],
+    }
+
+
+def run(sizes):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from quiz.serializers import QuizCreateSerializer
+
+    rows = []
+    for size in sizes:
+        serializer = QuizCreateSerializer(data=build_payload(size))
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries, timed() as elapsed:
+            serializer.save()
+            serializer.data
+        rows.append({'questions': size, 'queries': len(queries), 'ms': round(elapsed['ms'], 2)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 200, 1000])
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        rows = run(args.sizes)
+
+    print(f"{'questions':>10} {'queries':>8} {'ms':>10}")
+    for row in rows:
+        print(f"{row['questions']:>10} {row['queries']:>8} {row['ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
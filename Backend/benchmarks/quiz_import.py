@@ -0,0 +1,68 @@
+"""
+Benchmark question bank import and export.
+
+Writes a synthetic JSON Lines bank, imports it with ``manage.py
+import_quizzes`` into a throwaway database, exports it again with
+``export_quizzes`` and reports throughput and peak memory.
+
+    python -m benchmarks.quiz_import --questions 100000 --per-quiz 50
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+from . import setup_django, test_database
+
+
+def write_bank(path, num_questions, per_quiz):
+    with open(path, 'w', encoding='utf-8') as fh:
+        for i in range(num_questions):
+            quiz = i // per_quiz
+            fh.write(json.dumps({
+                'quiz_key': f'bank-{quiz}',
+                'quiz': f'Imported quiz {quiz}',
+                'question_text': f'Question {i}?',
+                'question_type': 'mcq',
+                'options': ['A', 'B', 'C', 'D'],
+                'correct_answer': 'A',
+            }) + '\n')
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--per-quiz', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+
+    with tempfile.TemporaryDirectory() as tmp, test_database():
+        bank = os.path.join(tmp, 'bank.jsonl')
+        write_bank(bank, args.questions, args.per_quiz)
+        rss_before = peak_rss_mb()
+
+        start = time.perf_counter()
+        call_command('import_quizzes', bank, batch_size=args.batch_size)
+        import_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        call_command('export_quizzes', output=os.path.join(tmp, 'export.jsonl'))
+        export_seconds = time.perf_counter() - start
+
+        print(f'import: {import_seconds:.2f}s ({args.questions / import_seconds:.0f} questions/s)')
+        print(f'export: {export_seconds:.2f}s ({args.questions / export_seconds:.0f} questions/s)')
+        print(f'peak RSS: {peak_rss_mb():.0f} MiB (was {rss_before:.0f} MiB before import)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark bulk regrading after an answer key correction.
+
+Seeds one quiz with synthetic attempts in a throwaway database, flips the
+correct answer of one question and times ``regrade_quiz`` with the given
+number of worker processes (the test database is a file so they can share it).
+
+    python -m benchmarks.regrade --attempts 1000000 --questions 20 --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from . import setup_django, test_database
+
+
+def seed_attempts(quiz, questions, count, batch_size=5000):
+    from quiz.models import QuizAttempt
+
+    rng = random.Random(42)
+    keys = [str(question.id) for question in questions]
+    for start in range(0, count, batch_size):
+        attempts = []
+        for _ in range(min(batch_size, count - start)):
+            answers = {key: rng.choice('ABCD') for key in keys}
+            score = sum(answers[key] == 'A' for key in keys)
+            attempts.append(QuizAttempt(quiz=quiz, answers=answers, score=score, total_questions=len(keys)))
+        QuizAttempt.objects.bulk_create(attempts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=200000)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from quiz.models import Question, Quiz
+    from quiz.regrade import regrade_quiz
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'regrade.sqlite3')
+        with test_database():
+            quiz = Quiz.objects.create(title='Regrade benchmark')
+            questions = Question.objects.bulk_create([
+                Question(quiz=quiz, question_text=f'Q{i}', question_type='mcq',
+                         options=['A', 'B', 'C', 'D'], correct_answer='A', order=i)
+                for i in range(args.questions)
+            ])
+            seed_attempts(quiz, questions, args.attempts)
+            Question.objects.filter(pk=questions[0].pk).update(correct_answer='B')
+
+            start = time.perf_counter()
+            result = regrade_quiz(quiz.id, chunk_size=args.chunk_size, workers=args.workers)
+            seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'attempts': result.attempts,
+        'changed': result.changed,
+        'workers': args.workers,
+        'seconds': round(seconds, 2),
+        'attempts_per_second': round(result.attempts / seconds),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Microbenchmark for rendering grading results.
+
+Compares the old path (QuizResultSerializer(data=...).is_valid() then .data)
+with the trusted QuizResult.to_representation() path, both rendered by DRF's
+JSONRenderer, and checks that the two produce identical bytes.
+
+    python -m benchmarks.result_rendering --questions 100 --repeat 200
+"""
+import argparse
+import timeit
+
+from . import setup_django
+
+
+def build_result(num_questions):
+    from quiz.grading import AnswerKey
+
+    answer_key = AnswerKey(quiz_id=1, entries=tuple(
+        (i, f'Question {i}?', 'A', i) for i in range(num_questions)
+    ))
+    answers = {str(i): ('A' if i % 3 else 'B') for i in range(0, num_questions, 2)}
+    return answer_key.grade(answers)
+
+
+def run(num_questions, repeat):
+    from rest_framework.renderers import JSONRenderer
+    from quiz.serializers import QuizResultSerializer
+
+    result = build_result(num_questions)
+    renderer = JSONRenderer()
+
+    def serializer_path():
+        serializer = QuizResultSerializer(data=result.to_representation())
+        serializer.is_valid(raise_exception=True)
+        return renderer.render(serializer.data)
+
+    def trusted_path():
+        return renderer.render(result.to_representation())
+
+    assert serializer_path() == trusted_path(), 'rendered bytes differ'
+
+    rows = []
+    for name, func in (('serializer', serializer_path), ('trusted', trusted_path)):
+        seconds = min(timeit.repeat(func, number=repeat, repeat=3))
+        rows.append({'path': name, 'us_per_call': round(seconds / repeat * 1e6, 1)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    rows = run(args.questions, args.repeat)
+
+    print(f"{'path':>12} {'us/call':>10}")
+    for row in rows:
+        print(f"{row['path']:>12} {row['us_per_call']:>10}")
+    speedup = rows[0]['us_per_call'] / rows[1]['us_per_call']
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
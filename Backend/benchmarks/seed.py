@@ -0,0 +1,104 @@
+"""
+Synthetic data seeding for benchmarks.
+
+    python -m benchmarks.seed --quizzes 100 --questions 20 --attempts 100000 --yes
+
+Without ``--yes`` nothing is written; the command seeds the database the
+current settings point at, so never run it against production.
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from . import setup_django
+
+
+BENCH_USERNAME = 'bench-user'
+BENCH_PASSWORD = 'bench-password'
+
+
+def parse_scale(value):
+    """Parse a ``QUIZZESxQUESTIONSxATTEMPTS`` scale string, e.g. ``10x20x1000``."""
+    try:
+        quizzes, questions, attempts = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('scale must look like QUIZZESxQUESTIONSxATTEMPTS')
+    return quizzes, questions, attempts
+
+
+def seed(num_quizzes, num_questions, num_attempts, batch_size=5000, rng=None, apps=None):
+    """
+    Bulk insert quizzes, questions and attempts. Attempts are spread randomly
+    over quizzes and the past year. Returns {quiz_id: [question_id, ...]}.
+    Pass the ``apps`` of a migration state to seed a partially migrated
+    database with its historical models.
+    """
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    if apps is None:
+        from django.apps import apps
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Question = apps.get_model('quiz', 'Question')
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+
+    rng = rng or random.Random(42)
+    if not User.objects.filter(username=BENCH_USERNAME).exists():
+        User.objects.create_user(username=BENCH_USERNAME, password=BENCH_PASSWORD)
+
+    first_id = Quiz.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    Quiz.objects.bulk_create([Quiz(title=f'Bench quiz {i}') for i in range(num_quizzes)])
+    quiz_ids = list(Quiz.objects.filter(id__gt=first_id).values_list('id', flat=True))
+
+    Question.objects.bulk_create(
+        [
+            Question(quiz_id=quiz_id, question_text=f'Q{i}', question_type='tf',
+                     options=['True', 'False'], correct_answer='True', order=i)
+            for quiz_id in quiz_ids
+            # Insert in reverse so ordering cannot come for free from rowid
+            for i in reversed(range(num_questions))
+        ],
+        batch_size=batch_size,
+    )
+    questions = {quiz_id: [] for quiz_id in quiz_ids}
+    for quiz_id, question_id in (
+        Question.objects.filter(quiz_id__in=quiz_ids).order_by('order').values_list('quiz_id', 'id')
+    ):
+        questions[quiz_id].append(question_id)
+
+    start = timezone.now() - timedelta(days=365)
+    for offset in range(0, num_attempts, batch_size):
+        attempts = []
+        for _ in range(min(batch_size, num_attempts - offset)):
+            quiz_id = rng.choice(quiz_ids)
+            answers = {str(q): rng.choice(['True', 'False']) for q in questions[quiz_id]}
+            attempts.append(QuizAttempt(
+                quiz_id=quiz_id,
+                answers=answers,
+                score=sum(answer == 'True' for answer in answers.values()),
+                total_questions=num_questions,
+                submitted_at=start + timedelta(seconds=rng.randint(0, 365 * 86400)),
+            ))
+        QuizAttempt.objects.bulk_create(attempts)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quizzes', type=int, default=100)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--yes', action='store_true', help='Actually write to the configured database.')
+    args = parser.parse_args()
+
+    if not args.yes:
+        parser.error('refusing to seed the configured database without --yes')
+
+    setup_django()
+    questions = seed(args.quizzes, args.questions, args.attempts)
+    print(f'Seeded {len(questions)} quizzes, {args.quizzes * args.questions} questions, '
+          f'{args.attempts} attempts (login: {BENCH_USERNAME} / {BENCH_PASSWORD})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark quiz-id sharding over N local SQLite databases.
+
+Creates N shard files in a temporary directory, spreads a set of quizzes
+over them by hash, records graded attempts through ``record_attempts`` and
+reports the attempts per shard and the insert throughput. It then moves one
+quiz to another shard with ``move_quiz`` and reports how long the move took
+and how long the quiz's writes were paused.
+
+    python -m benchmarks.sharding --shards 4 --quizzes 20 --attempts 2000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from . import setup_django, test_database
+
+
+def record(quiz_ids, questions, count):
+    from quiz.attempts import record_attempts
+    from quiz.grading import get_answer_key
+
+    rng = random.Random(42)
+    for quiz_id in quiz_ids:
+        answer_key = get_answer_key(quiz_id)
+        graded = []
+        for _ in range(count):
+            answers = {str(question_id): rng.choice('ABCD') for question_id in questions[quiz_id]}
+            graded.append((answers, answer_key.grade(answers)))
+        record_attempts(quiz_id, graded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--quizzes', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--attempts', type=int, default=2000, help='Attempts per quiz.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Read by the settings module, so set before Django starts
+        os.environ['DATABASE_SHARD_URLS'] = ','.join(
+            f'sqlite:///{os.path.join(tmp, f"shard{number}.sqlite3")}' for number in range(1, args.shards + 1)
+        )
+        os.environ.pop('QUIZ_SHARDS', None)
+        setup_django()
+        from django.conf import settings
+        from django.core.management import call_command
+        from quiz.models import Question, Quiz, QuizAttempt
+        from quiz.sharding import move_quiz, shard_for_quiz
+
+        with test_database():
+            for alias in settings.QUIZ_SHARDS:
+                call_command('migrate', database=alias, verbosity=0)
+            questions = {}
+            for number in range(args.quizzes):
+                # Outside a transaction the shard mirror is synced on save
+                quiz = Quiz.objects.create(title=f'Shard benchmark {number}')
+                Question.objects.bulk_create([
+                    Question(quiz=quiz, question_text=f'Q{i}', question_type='mcq',
+                             options=['A', 'B', 'C', 'D'], correct_answer='A', order=i)
+                    for i in range(args.questions)
+                ])
+                quiz.save()
+                questions[quiz.id] = list(quiz.questions.values_list('id', flat=True))
+
+            start = time.perf_counter()
+            record(list(questions), questions, args.attempts)
+            record_seconds = time.perf_counter() - start
+
+            per_shard = {
+                alias: QuizAttempt.objects.using(alias).count() for alias in settings.QUIZ_SHARDS
+            }
+            quiz_id = next(iter(questions))
+            source = shard_for_quiz(quiz_id)
+            target = next(alias for alias in settings.QUIZ_SHARDS if alias != source) if args.shards > 1 else source
+            start = time.perf_counter()
+            result = move_quiz(quiz_id, target, freeze_grace=0)
+            move_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'shards': args.shards,
+        'quizzes': args.quizzes,
+        'attempts_per_shard': per_shard,
+        'record_attempts_per_second': round(args.quizzes * args.attempts / record_seconds),
+        'move': {
+            'source': result.source,
+            'target': result.target,
+            'attempts': result.attempts,
+            'seconds': round(move_seconds, 3),
+            'writes_paused_seconds': round(result.frozen_seconds, 3),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,10 @@
+import subprocess
+import sys
+
+from django.conf import settings
 from django.contrib import admin
 from .models import Quiz, Question, QuizAttempt
+from .packing import stored_answers
 
 
 class QuestionInline(admin.TabularInline):
@@ -12,12 +17,22 @@ class QuizAdmin(admin.ModelAdmin):
     list_display = ('title', 'created_at')
     search_fields = ('title',)
     inlines = [QuestionInline]
+    actions = ['regrade']
+
+    @admin.action(description='Regrade attempts against the current answer key')
+    def regrade(self, request, queryset):
+        quiz_ids = [str(quiz_id) for quiz_id in queryset.values_list('id', flat=True)]
+        # Large quizzes take minutes, so the command (which also drains the
+        # write-behind spool first) runs outside the request
+        subprocess.Popen([sys.executable, str(settings.BASE_DIR / 'manage.py'), 'regrade_quiz', *quiz_ids])
+        self.message_user(request, f'Started regrading {len(quiz_ids)} quizzes; the result is in the server log.')
 
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ('quiz', 'question_text', 'question_type', 'order')
     list_filter = ('question_type', 'quiz')
+    list_select_related = ('quiz',)
     search_fields = ('question_text',)
 
 
@@ -25,3 +40,9 @@ class QuestionAdmin(admin.ModelAdmin):
 class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ('quiz', 'score', 'total_questions', 'submitted_at')
     list_filter = ('quiz',)
+    list_select_related = ('quiz',)
+    readonly_fields = ('stored_answers',)
+
+    @admin.display(description='Answers (decoded)')
+    def stored_answers(self, obj):
+        return stored_answers(obj.answers, obj.layout_id, obj.packed)
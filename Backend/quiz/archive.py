@@ -0,0 +1,289 @@
+"""
+Cold storage for old QuizAttempt rows.
+
+``archive_quiz`` streams a quiz's attempts submitted before a cutoff into
+append-only segment files under QUIZ_ARCHIVE_DIR/quiz-<id>/ and then deletes
+them from the hot table in batches. A segment is gzip-compressed NDJSON
+written as independent gzip members of QUIZ_ARCHIVE_BLOCK_ROWS rows each,
+followed by an index footer:
+
+    block member | block member | ... | footer member | trailer
+
+The footer member holds one JSON object listing every block's byte offset,
+length, row count and submitted_at range; the 16-byte trailer is a magic
+string and the footer's offset. ``iter_archived_attempts`` reads only the
+footer and the blocks overlapping the requested time range. (``zcat`` still
+reads a segment, warning about the trailer.)
+
+Rows are written in (submitted_at, id) order with answers decoded, so
+segments don't depend on AnswerLayout rows. A segment is fsynced and renamed
+into place before any row is deleted; a crash in between archives those rows
+again on the next run, and the reader drops the duplicate ids. Each batch
+of deleted rows is taken out of the quiz's stats and leaderboard buckets in
+the same transaction, so live analytics always describe the hot table and
+attempts stored meanwhile keep their increments. Per-question counters lose
+the archived rows' results under the current answer key, as
+``rebuild_quiz_stats`` and ``regrade_quiz`` count them.
+"""
+import gzip
+import json
+import os
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from .grading import compile_answer_key
+from .leaderboard import apply_scores
+from .models import QuizAttempt
+from .packing import ANSWER_COLUMNS, stored_answers
+from .regrade import Regrader
+from .sharding import on_quiz_shard, shard_atomic
+from .stats import apply_stats
+
+
+FORMAT_VERSION = 1
+TRAILER_MAGIC = b'QZARCH01'
+TRAILER_SIZE = len(TRAILER_MAGIC) + 8
+SEGMENT_SUFFIX = '.ndjson.gz'
+# Filename timestamps let readers skip whole segments without opening them
+STAMP_FORMAT = '%Y%m%dT%H%M%S%fZ'
+
+ARCHIVE_FIELDS = ('id', 'submitted_at', 'score', 'total_questions', 'seed', 'user_id')
+
+
+class ArchiveError(Exception):
+    """A segment file is truncated or not in the expected format."""
+
+
+def quiz_dir(quiz_id, root=None):
+    return Path(root or settings.QUIZ_ARCHIVE_DIR) / f'quiz-{quiz_id}'
+
+
+def stamp(value):
+    return value.astimezone(timezone.utc).strftime(STAMP_FORMAT)
+
+
+class SegmentWriter:
+    """Writes one segment: gzip blocks, then the index footer and trailer."""
+
+    def __init__(self, quiz_id, root=None, block_rows=None):
+        self.quiz_id = quiz_id
+        self.directory = quiz_dir(quiz_id, root)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.block_rows = block_rows or settings.QUIZ_ARCHIVE_BLOCK_ROWS
+        self.tmp_path = self.directory / f'.{uuid.uuid4().hex}.tmp'
+        self.file = open(self.tmp_path, 'wb')
+        self.blocks = []
+        self.block = []
+        self.ids = []
+
+    def write(self, row):
+        self.block.append(row)
+        self.ids.append(row['id'])
+        if len(self.block) >= self.block_rows:
+            self.flush_block()
+
+    def flush_block(self):
+        if not self.block:
+            return
+        data = ''.join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n' for row in self.block)
+        compressed = gzip.compress(data.encode('utf-8'), mtime=0)
+        self.blocks.append({
+            'offset': self.file.tell(),
+            'length': len(compressed),
+            'rows': len(self.block),
+            'first': self.block[0]['submitted_at'],
+            'last': self.block[-1]['submitted_at'],
+        })
+        self.file.write(compressed)
+        self.block = []
+
+    def close(self):
+        """Finish the segment, move it into place and return its path (None if empty)."""
+        self.flush_block()
+        if not self.blocks:
+            self.file.close()
+            self.tmp_path.unlink()
+            return None
+        footer = {
+            'format': FORMAT_VERSION,
+            'quiz_id': self.quiz_id,
+            'rows': len(self.ids),
+            'blocks': self.blocks,
+        }
+        footer_offset = self.file.tell()
+        self.file.write(gzip.compress(json.dumps(footer, separators=(',', ':')).encode(), mtime=0))
+        self.file.write(TRAILER_MAGIC + footer_offset.to_bytes(8, 'big'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        first = stamp(parse_datetime(self.blocks[0]['first']))
+        last = stamp(parse_datetime(self.blocks[-1]['last']))
+        path = self.directory / f'{first}-{last}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}'
+        os.replace(self.tmp_path, path)
+        # Make the rename durable before the rows are deleted
+        directory_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+        return path
+
+
+def read_footer(fh):
+    """Return the index footer of an open segment file."""
+    fh.seek(0, os.SEEK_END)
+    size = fh.tell()
+    if size < TRAILER_SIZE:
+        raise ArchiveError('segment is truncated')
+    fh.seek(size - TRAILER_SIZE)
+    trailer = fh.read(TRAILER_SIZE)
+    if not trailer.startswith(TRAILER_MAGIC):
+        raise ArchiveError('segment has no index trailer')
+    footer_offset = int.from_bytes(trailer[len(TRAILER_MAGIC):], 'big')
+    fh.seek(footer_offset)
+    footer = json.loads(gzip.decompress(fh.read(size - TRAILER_SIZE - footer_offset)))
+    if footer.get('format') != FORMAT_VERSION:
+        raise ArchiveError(f'unknown segment format {footer.get("format")}')
+    return footer
+
+
+def segment_range(path):
+    """(first, last) submitted_at stamps encoded in a segment's file name."""
+    first, last, _ = path.name[:-len(SEGMENT_SUFFIX)].split('-')
+    return first, last
+
+
+def iter_archived_attempts(quiz_id, since=None, until=None, root=None):
+    """
+    Yield archived attempt dicts of a quiz with since <= submitted_at < until,
+    oldest first. Only the blocks overlapping the range are decompressed.
+    """
+    directory = quiz_dir(quiz_id, root)
+    if not directory.is_dir():
+        return
+    since_stamp = stamp(since) if since else None
+    until_stamp = stamp(until) if until else None
+    segments = []
+    for path in directory.glob(f'*{SEGMENT_SUFFIX}'):
+        first, last = segment_range(path)
+        if (since_stamp and last < since_stamp) or (until_stamp and first >= until_stamp):
+            continue
+        segments.append((first, path))
+
+    seen = set()
+    for _, path in sorted(segments):
+        with open(path, 'rb') as fh:
+            for block in read_footer(fh)['blocks']:
+                if since and parse_datetime(block['last']) < since:
+                    continue
+                if until and parse_datetime(block['first']) >= until:
+                    continue
+                fh.seek(block['offset'])
+                for line in gzip.decompress(fh.read(block['length'])).splitlines():
+                    row = json.loads(line)
+                    submitted_at = parse_datetime(row['submitted_at'])
+                    if (since and submitted_at < since) or (until and submitted_at >= until):
+                        continue
+                    # Rows archived twice (crash before the delete) are yielded once
+                    if row['id'] in seen:
+                        continue
+                    seen.add(row['id'])
+                    yield row
+
+
+@dataclass
+class ArchiveResult:
+    attempts: int = 0
+    segments: int = 0
+
+
+def archive_row(quiz_id, attempt_id, submitted_at, score, total_questions, seed, user_id, *stored):
+    return {
+        'id': attempt_id,
+        'quiz_id': quiz_id,
+        'submitted_at': submitted_at.isoformat(),
+        'score': score,
+        'total_questions': total_questions,
+        'seed': seed,
+        'user_id': user_id,
+        'answers': stored_answers(*stored),
+    }
+
+
+def delete_archived(answer_key, ids, batch_size):
+    """Delete archived rows and subtract them from their quiz's counters."""
+    quiz_id = answer_key.quiz_id
+    for start in range(0, len(ids), batch_size):
+        with shard_atomic():
+            # Rows deleted by an earlier, crashed run aren't found, so they aren't subtracted twice
+            rows = [
+                (attempt_id, stored_answers(*stored), seed, score, total_questions)
+                for attempt_id, seed, score, total_questions, *stored in
+                QuizAttempt.objects.filter(pk__in=ids[start:start + batch_size]).select_for_update()
+                .values_list('id', 'seed', 'score', 'total_questions', *ANSWER_COLUMNS)
+            ]
+            if not rows:
+                continue
+            QuizAttempt.objects.filter(pk__in=[row[0] for row in rows]).delete()
+            # Grading counts the rows' stored totals and per-question results
+            regrader = Regrader(answer_key)
+            regrader.grade_chunk(rows)
+            counted = regrader.result
+            apply_stats(
+                quiz_id, -len(rows), -counted.old_score, -counted.old_possible,
+                Counter({question_id: -count for question_id, count in counted.correct.items()}),
+                Counter({question_id: counted.correct[question_id] - count
+                         for question_id, count in counted.shown.items()}),
+            )
+            scores = Counter(score for _, _, _, score, _ in rows)
+            apply_scores(quiz_id, Counter({score: -count for score, count in scores.items()}))
+
+
+@on_quiz_shard
+def archive_quiz(quiz_id, cutoff, batch_size=2000, segment_rows=None, root=None, dry_run=False):
+    """
+    Move a quiz's attempts submitted before ``cutoff`` to segment files and
+    delete them from the hot table. Returns an ArchiveResult.
+    """
+    segment_rows = segment_rows or settings.QUIZ_ARCHIVE_SEGMENT_ROWS
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id, submitted_at__lt=cutoff)
+    result = ArchiveResult()
+    if dry_run:
+        result.attempts = attempts.count()
+        return result
+
+    answer_key = compile_answer_key(quiz_id)
+    writer = None
+    last = None
+    while True:
+        # Keyset pagination on (submitted_at, id) via attempt_quiz_submitted_idx
+        page = attempts.order_by('submitted_at', 'id')
+        if last is not None:
+            page = page.filter(submitted_at__gte=last[0]).exclude(submitted_at=last[0], id__lte=last[1])
+        rows = list(page.values_list(*ARCHIVE_FIELDS, *ANSWER_COLUMNS)[:batch_size])
+        if not rows:
+            break
+        last = rows[-1][1], rows[-1][0]
+        for row in rows:
+            if writer is None:
+                writer = SegmentWriter(quiz_id, root)
+            writer.write(archive_row(quiz_id, *row))
+            if len(writer.ids) >= segment_rows:
+                writer.close()
+                delete_archived(answer_key, writer.ids, batch_size)
+                result.attempts += len(writer.ids)
+                result.segments += 1
+                writer = None
+    if writer is not None and writer.ids:
+        writer.close()
+        delete_archived(answer_key, writer.ids, batch_size)
+        result.attempts += len(writer.ids)
+        result.segments += 1
+    return result
@@ -0,0 +1,152 @@
+"""
+Async implementations of the hot read and submit endpoints.
+
+Used instead of QuizDetailView and QuizSubmitView when QUIZ_ASGI is enabled
+(quiz_project.asgi turns it on). DRF views are sync-only, so under an ASGI
+server every DRF request is handed to a worker thread; these plain Django
+async views stay on the event loop and only leave it for database work. They
+return the same status codes, headers and JSON bytes as the DRF views for
+JSON clients (no browsable API or content negotiation).
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .attempts import record_attempt
+from .authentication import CachedJWTAuthentication
+from .drafts import get_drafts
+from .grading import aget_answer_key
+from .metrics import span
+from .payloads import aget_quiz_payload
+from .routers import replica_reads
+from .serializers import AttemptSubmissionSerializer
+from .sharding import quiz_sharded
+from .shuffle import aget_attempt_seed, answer_key_for_seed, seeded_etag, shuffle_quiz_data, submitting
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def authenticated_user_id(request):
+    """Return the id of the JWT bearer, or None for anonymous requests."""
+    authenticated = CachedJWTAuthentication().authenticate(request)
+    return authenticated[0].id if authenticated else None
+
+
+def not_found(exc):
+    return json_response({'detail': str(exc)}, status.HTTP_404_NOT_FOUND)
+
+
+@replica_reads
+@quiz_sharded
+async def quiz_detail(request, pk):
+    """
+    GET /api/quizzes/{id}/
+    Async counterpart of QuizDetailView (same ETag and Cache-Control handling).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    attempt = request.GET.get('attempt')
+    try:
+        payload = await aget_quiz_payload(pk)
+        if attempt:
+            answer_key = await aget_answer_key(pk)
+            answer_key = answer_key.for_seed(await aget_attempt_seed(pk, attempt))
+    except Http404 as exc:
+        return not_found(exc)
+    
+    if attempt:
+        etag = seeded_etag(payload.etag, answer_key)
+        cache_control = 'private, no-cache'
+    else:
+        etag = payload.etag
+        cache_control = settings.QUIZ_DETAIL_CACHE_CONTROL
+    
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and ('*' in parse_etags(if_none_match) or etag in parse_etags(if_none_match)):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    elif attempt:
+        response = json_response(shuffle_quiz_data(payload.data, answer_key))
+    else:
+        response = HttpResponse(payload.content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def submit_attempt(quiz_id, attempt, answer_key, user_answers, user_id):
+    """
+    Claim the attempt (if any), merge its draft, grade and record the submit.
+
+    The attempt insert and the stats update share one transaction, which the
+    async ORM cannot open, so the whole write runs in a single sync_to_async
+    hop (one thread switch instead of one per query).
+    """
+    with submitting(quiz_id, attempt):
+        if attempt:
+            user_answers = {**get_drafts().load(attempt), **user_answers}
+        result = answer_key.grade(user_answers)
+        record_attempt(quiz_id, user_answers, result, user_id)
+    return result
+
+
+@quiz_sharded
+async def quiz_submit(request, pk):
+    """
+    POST /api/quizzes/{id}/submit/
+    Async counterpart of QuizSubmitView.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user_id = None
+    if 'HTTP_AUTHORIZATION' in request.META:
+        # Attribute the attempt like DRF would (invalid tokens are rejected)
+        try:
+            user_id = await sync_to_async(authenticated_user_id)(request)
+        except APIException as exc:
+            return json_response(exc.detail, exc.status_code)
+    try:
+        answer_key = await aget_answer_key(pk)
+    except Http404 as exc:
+        return not_found(exc)
+    
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError as exc:
+        return json_response({'detail': f'JSON parse error - {exc}'}, status.HTTP_400_BAD_REQUEST)
+    
+    serializer = AttemptSubmissionSerializer(data=data)
+    with span('serializer'):
+        valid = serializer.is_valid()
+    if not valid:
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    
+    attempt = serializer.validated_data.get('attempt')
+    try:
+        seed = await aget_attempt_seed(pk, attempt) if attempt else None
+        answer_key = answer_key_for_seed(answer_key, seed)
+    except Http404 as exc:
+        return not_found(exc)
+    except ValidationError as exc:
+        return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+    
+    user_answers = serializer.validated_data.get('answers', {})
+    try:
+        result = await sync_to_async(submit_attempt)(pk, attempt, answer_key, user_answers, user_id)
+    except ValidationError as exc:
+        return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+    if attempt:
+        await sync_to_async(get_drafts().discard)(attempt)
+    return json_response(result.to_representation())
+
+
+# Like DRF's APIView, the submit endpoint is called without a CSRF token.
+# (Django 4.2's csrf_exempt decorator would wrap the coroutine in a sync view.)
+quiz_submit.csrf_exempt = True
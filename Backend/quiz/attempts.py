@@ -0,0 +1,304 @@
+"""
+Recording of QuizAttempt rows.
+
+By default attempts are inserted synchronously inside the submit request.
+With QUIZ_ATTEMPT_WRITE_BEHIND enabled, graded attempts are appended to a
+durable local spool (a SQLite database in WAL mode) and a background thread
+bulk-inserts them in batches. Every worker process runs such a thread on the
+same spool, so a flusher first claims its batch in one write transaction;
+claims of a flusher that died expire after AttemptSpool.claim_timeout.
+Delivery is at-least-once: a crash between the database commit and the
+spool acknowledgement replays that batch.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .leaderboard import apply_scores
+from .models import Quiz, QuizAttempt
+from .packing import attempt_answer_fields
+from .sharding import on_quiz_shard, shard_atomic, shard_for_quiz, use_shard
+from .stats import apply_stats, record_result_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptSpool:
+    """Append-only SQLite spool of graded attempts waiting to be inserted."""
+
+    # Seconds after which a claimed but unacknowledged batch may be claimed again
+    claim_timeout = 300
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS spool ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, claimed_at REAL)'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(spool)')}
+            if 'claimed_at' not in columns:
+                # Spools written before batches were claimed
+                conn.execute('ALTER TABLE spool ADD COLUMN claimed_at REAL')
+            self._local.connection = conn
+        return conn
+
+    def append(self, quiz_id, graded, submitted_at, user_id=None):
+        """Spool (answers, QuizResult) pairs for one quiz in a single transaction."""
+        rows = [
+            (json.dumps({
+                'quiz_id': quiz_id,
+                'answers': answers,
+                'score': result.score,
+                'total_questions': result.total_questions,
+                'correct': [r.question_id for r in result.results if r.is_correct],
+                'incorrect': [r.question_id for r in result.results if not r.is_correct],
+                'submitted_at': submitted_at.isoformat(),
+                'seed': result.seed,
+                'user_id': user_id,
+            }),)
+            for answers, result in graded
+        ]
+        conn = self.connection
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('INSERT INTO spool (payload) VALUES (?)', rows)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def claim(self, limit):
+        """
+        Claim up to ``limit`` of the oldest unclaimed (id, payload dict) rows,
+        so concurrent flushers never take the same row.
+        """
+        conn = self.connection
+        now = time.time()
+        # IMMEDIATE takes the write lock before reading, so the claim is atomic
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, payload FROM spool WHERE claimed_at IS NULL OR claimed_at < ? '
+                'ORDER BY id LIMIT ?',
+                (now - self.claim_timeout, limit),
+            ).fetchall()
+            conn.executemany('UPDATE spool SET claimed_at = ? WHERE id = ?', [(now, row_id) for row_id, _ in rows])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, ids):
+        """Drop claimed rows once they are stored."""
+        self._update('DELETE FROM spool WHERE id = ?', ids)
+
+    def release(self, ids):
+        """Return claimed rows to the spool after a failed flush."""
+        self._update('UPDATE spool SET claimed_at = NULL WHERE id = ?', ids)
+
+    def _update(self, sql, ids):
+        conn = self.connection
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(sql, [(row_id,) for row_id in ids])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+
+def flush_batch(spool, batch_size):
+    """
+    Insert the oldest batch of spooled attempts. Returns the number of rows
+    taken off the spool (0 when nothing is left to claim).
+    """
+    rows = spool.claim(batch_size)
+    if not rows:
+        return 0
+    ids = [row_id for row_id, _ in rows]
+    try:
+        store_spooled([payload for _, payload in rows])
+    except BaseException:
+        spool.release(ids)
+        raise
+    spool.ack(ids)
+    return len(rows)
+
+
+def store_spooled(payloads):
+    """Insert a claimed batch of spooled payloads, one transaction per shard."""
+
+    # Skip attempts whose quiz was deleted while they waited in the spool
+    quiz_ids = {payload['quiz_id'] for payload in payloads}
+    existing = set(Quiz.objects.filter(pk__in=quiz_ids).values_list('pk', flat=True))
+    # ...and keep attempts of since-deleted users, anonymously
+    user_ids = {payload.get('user_id') for payload in payloads} - {None}
+    users = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+
+    # One transaction per shard holding the batch's quizzes
+    by_shard = defaultdict(list)
+    for payload in payloads:
+        if payload['quiz_id'] in existing:
+            by_shard[shard_for_quiz(payload['quiz_id'])].append(payload)
+    dropped = len(payloads) - sum(len(shard_payloads) for shard_payloads in by_shard.values())
+    if dropped:
+        logger.warning('Dropping %d spooled attempts for deleted quizzes', dropped)
+
+    for alias, shard_payloads in by_shard.items():
+        with use_shard(alias):
+            insert_spooled(shard_payloads, users)
+
+
+def insert_spooled(payloads, users):
+    """Insert spooled attempt payloads and add them to their quizzes' counters."""
+    attempts = []
+    stats = {}
+    scores = {}
+    for payload in payloads:
+        quiz_id = payload['quiz_id']
+        attempts.append(QuizAttempt(
+            quiz_id=quiz_id,
+            **attempt_answer_fields(quiz_id, payload['answers']),
+            score=payload['score'],
+            total_questions=payload['total_questions'],
+            submitted_at=parse_datetime(payload['submitted_at']),
+            seed=payload.get('seed'),
+            user_id=payload.get('user_id') if payload.get('user_id') in users else None,
+        ))
+        # Aggregate counters per quiz so the batch costs a few UPDATEs per quiz
+        quiz_stats = stats.setdefault(quiz_id, [0, 0, 0, Counter(), Counter()])
+        scores.setdefault(quiz_id, Counter())[payload['score']] += 1
+        quiz_stats[0] += 1
+        quiz_stats[1] += payload['score']
+        quiz_stats[2] += payload['total_questions']
+        quiz_stats[3].update(payload['correct'])
+        quiz_stats[4].update(payload['incorrect'])
+
+    with shard_atomic():
+        # Counted before the insert, like record_attempts()
+        for quiz_id, quiz_stats in stats.items():
+            apply_stats(quiz_id, *quiz_stats)
+            apply_scores(quiz_id, scores[quiz_id])
+        QuizAttempt.objects.bulk_create(attempts)
+
+
+def drain(spool, batch_size, wait=True):
+    """
+    Flush the spool until it is empty. With ``wait`` it also waits for
+    batches other flushers claimed (or for their claims to expire), so every
+    attempt spooled before the call is stored on return. Returns the number of
+    rows flushed by this call.
+    """
+    total = 0
+    while True:
+        flushed = flush_batch(spool, batch_size)
+        if flushed:
+            total += flushed
+        elif wait and len(spool):
+            time.sleep(0.1)
+        else:
+            return total
+
+
+class AttemptFlusher(threading.Thread):
+    """Daemon thread that drains the spool every ``interval`` seconds."""
+
+    def __init__(self, spool, batch_size, interval):
+        super().__init__(name='quiz-attempt-flusher', daemon=True)
+        self.spool = spool
+        self.batch_size = batch_size
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                # Other workers' flushers handle the batches they claimed
+                drain(self.spool, self.batch_size, wait=False)
+            except Exception:
+                logger.exception('Failed to flush spooled quiz attempts')
+            finally:
+                close_old_connections()
+
+
+_spool = None
+_flusher = None
+_lock = threading.Lock()
+
+
+def get_spool():
+    """Return the process-wide spool, starting the flusher thread on first use."""
+    global _spool, _flusher
+    with _lock:
+        if _spool is None or _spool.path != str(settings.QUIZ_ATTEMPT_SPOOL_PATH):
+            _spool = AttemptSpool(settings.QUIZ_ATTEMPT_SPOOL_PATH)
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if _flusher is None and settings.QUIZ_ATTEMPT_FLUSH_INTERVAL > 0:
+            _flusher = AttemptFlusher(
+                _spool,
+                settings.QUIZ_ATTEMPT_BATCH_SIZE,
+                settings.QUIZ_ATTEMPT_FLUSH_INTERVAL,
+            )
+            _flusher.start()
+    return _spool
+
+
+@on_quiz_shard
+def record_attempts(quiz_id, graded, user_id=None):
+    """
+    Persist graded (answers, QuizResult) pairs for one quiz and update its
+    statistics and leaderboard, either directly or through the write-behind
+    spool. ``user_id`` is the authenticated submitter, if any.
+    """
+    if not graded:
+        return
+    if settings.QUIZ_ATTEMPT_WRITE_BEHIND:
+        get_spool().append(quiz_id, graded, timezone.now(), user_id)
+        return
+
+    with shard_atomic():
+        attempts = [
+            QuizAttempt(
+                quiz_id=quiz_id,
+                **attempt_answer_fields(quiz_id, answers),
+                score=result.score,
+                total_questions=result.total_questions,
+                seed=result.seed,
+                user_id=user_id,
+            )
+            for answers, result in graded
+        ]
+        # Counting first takes the QuizStats row lock before the attempt ids are
+        # drawn, which regrade_quiz() relies on to read a consistent id bound
+        record_result_stats(quiz_id, [result for _, result in graded])
+        apply_scores(quiz_id, Counter(result.score for _, result in graded))
+        QuizAttempt.objects.bulk_create(attempts, batch_size=settings.QUIZ_ATTEMPT_BATCH_SIZE)
+
+
+def record_attempt(quiz_id, answers, result, user_id=None):
+    """Persist a single graded QuizResult (see record_attempts)."""
+    record_attempts(quiz_id, [(answers, result)], user_id)
@@ -4,8 +4,25 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .throttling import LoginRateThrottle
+
+
+def duplicate_errors(username, email):
+    """Report which of username/email is taken after a failed signup insert."""
+    errors = {}
+    for existing_username, existing_email in User.objects.filter(
+        Q(username=username) | Q(email=email)
+    ).values_list('username', 'email'):
+        if existing_username == username:
+            errors['username'] = 'Username already exists'
+        if existing_email == email:
+            errors['email'] = 'Email already exists'
+    return errors
+
 
 class SignupView(APIView):
     """
@@ -25,13 +42,9 @@ class SignupView(APIView):
             errors['username'] = 'Username is required'
         elif len(username) < 3:
             errors['username'] = 'Username must be at least 3 characters'
-        elif User.objects.filter(username=username).exists():
-            errors['username'] = 'Username already exists'
 
         if not email:
             errors['email'] = 'Email is required'
-        elif User.objects.filter(email=email).exists():
-            errors['email'] = 'Email already exists'
 
         if not password:
             errors['password'] = 'Password is required'
@@ -41,12 +54,18 @@ class SignupView(APIView):
         if errors:
             return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create user
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password
-        )
+        # Create user; uniqueness of username and email is enforced by the
+        # database, so the common path is a single INSERT
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password
+                )
+        except IntegrityError:
+            return Response({'errors': duplicate_errors(username, email)},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         # Generate tokens
         refresh = RefreshToken.for_user(user)
@@ -68,8 +87,10 @@ class LoginView(APIView):
     """
     POST /api/auth/login/
     Authenticate user and return JWT tokens.
+    Throttled per username and client IP before any password is hashed.
     """
     permission_classes = [AllowAny]
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
         username = request.data.get('username', '').strip()
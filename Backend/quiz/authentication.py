@@ -0,0 +1,54 @@
+"""
+JWT authentication with cheaper user resolution.
+
+simplejwt's JWTAuthentication loads the User row on every request. Depending on
+QUIZ_JWT_USER_RESOLUTION this class instead:
+
+- ``db``: behaves exactly like JWTAuthentication
+- ``cache``: keeps resolved users in a short-TTL in-process LRU keyed by user
+  id and the user's version token, which quiz.signals bumps on user save or
+  delete (so deactivation takes effect on the next request)
+- ``stateless``: trusts the signed claims and returns a TokenUser without any
+  database access
+"""
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import LRUCache, get_version
+
+
+user_cache = LRUCache(maxsize=1024)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication whose user lookup is configurable (see module docstring)."""
+
+    def get_user(self, validated_token):
+        mode = settings.QUIZ_JWT_USER_RESOLUTION
+        if mode == 'stateless':
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken('Token contained no recognizable user identification')
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+
+        # Revocation checks compare per-token claims, so they always hit the DB
+        if mode != 'cache' or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        version = get_version('user', user_id)
+        hit = user_cache.get(user_id)
+        if hit is not None:
+            expires_at, cached_version, user = hit
+            if cached_version == version and expires_at > time.monotonic():
+                return user
+
+        user = super().get_user(validated_token)
+        user_cache.set(user_id, (time.monotonic() + settings.QUIZ_JWT_USER_CACHE_TTL, version, user))
+        return user
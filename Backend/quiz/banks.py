@@ -0,0 +1,209 @@
+"""
+Streaming import and export of question banks.
+
+A bank is a flat list of questions, one per JSON Lines object or CSV row,
+with the columns in BANK_COLUMNS. Consecutive rows with the same ``quiz_key``
+(or, when it is blank, the same ``quiz`` title) form one quiz; a quiz starts
+whenever the key changes. CSV stores ``options`` as a JSON array.
+
+Rows are validated with the same rules as QuizCreateSerializer and inserted
+in transactional batches, so memory is bounded by the batch size however
+large the file is.
+"""
+import csv
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .cache import bump_quiz_version
+from .exports import Echo
+from .models import Quiz, Question, QuestionStats
+from .serializers import QuestionWithAnswerSerializer, validate_question_options
+from .sharding import schedule_content_sync, sharding_enabled
+
+
+BANK_COLUMNS = ['quiz_key', 'quiz', 'question_text', 'question_type', 'options', 'correct_answer']
+QUESTION_FIELDS = ['question_text', 'question_type', 'options', 'correct_answer']
+
+
+class BankError(Exception):
+    """An invalid row; the message is prefixed with its line number."""
+
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+def read_jsonl(fh):
+    """Yield (line number, row dict) for each non-blank JSON Lines record."""
+    for line_number, line in enumerate(fh, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            raise BankError(line_number, f'invalid JSON ({exc})')
+        if not isinstance(row, dict):
+            raise BankError(line_number, 'expected a JSON object')
+        yield line_number, row
+
+
+def read_csv(fh):
+    """Yield (line number, row dict) for each CSV row, decoding ``options``."""
+    reader = csv.DictReader(fh)
+    for row in reader:
+        options = row.get('options') or '[]'
+        try:
+            row['options'] = json.loads(options)
+        except ValueError:
+            raise BankError(reader.line_num, 'options must be a JSON array')
+        yield reader.line_num, row
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+@dataclass
+class PendingQuiz:
+    """A quiz being imported; ``instance`` is unsaved until its first batch is flushed."""
+    instance: Quiz
+    next_order: int = 0
+
+
+@dataclass
+class ImportResult:
+    quizzes: int = 0
+    questions: int = 0
+
+
+class QuizBankImporter:
+    """
+    Validate and insert bank rows in batches of ``batch_size`` questions.
+
+    Each batch is validated as a whole (one ListSerializer pass) and written in
+    one transaction: new quizzes with a single bulk_create, then their
+    questions. With ``dry_run`` rows are validated but nothing is written.
+    ``on_flush(result)`` is called after every batch.
+    """
+
+    def __init__(self, batch_size=5000, dry_run=False, on_flush=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_flush = on_flush
+        self.result = ImportResult()
+        self._buffer = []
+        self._current_key = None
+        self._current = None
+
+    def run(self, rows):
+        for line_number, row in rows:
+            self.add(line_number, row)
+        self.flush()
+        return self.result
+
+    def add(self, line_number, row):
+        title = str(row.get('quiz') or '').strip()
+        if not title:
+            raise BankError(line_number, 'quiz title is required')
+        if len(title) > Quiz._meta.get_field('title').max_length:
+            raise BankError(line_number, 'quiz title is too long')
+
+        key = str(row.get('quiz_key') or '') or title
+        if key != self._current_key:
+            self._current_key = key
+            self._current = PendingQuiz(Quiz(title=title))
+        question = {name: row.get(name) for name in QUESTION_FIELDS}
+        self._buffer.append((line_number, self._current, question))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def validate(self, buffer):
+        questions = [question for _, _, question in buffer]
+        serializer = QuestionWithAnswerSerializer(data=questions, many=True)
+        if not serializer.is_valid():
+            for (line_number, _, _), errors in zip(buffer, serializer.errors):
+                if errors:
+                    message = '; '.join(f'{name}: {" ".join(map(str, msgs))}' for name, msgs in errors.items())
+                    raise BankError(line_number, message)
+        for (line_number, pending, _), data in zip(buffer, serializer.validated_data):
+            try:
+                validate_question_options(data, pending.next_order + 1)
+            except serializers.ValidationError as exc:
+                raise BankError(line_number, ' '.join(map(str, exc.detail)))
+            data['order'] = pending.next_order
+            pending.next_order += 1
+        return serializer.validated_data
+
+    def flush(self):
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+        validated = self.validate(buffer)
+
+        new_quizzes = list({
+            id(pending): pending.instance for _, pending, _ in buffer if pending.instance.pk is None
+        }.values())
+        self.result.quizzes += len(new_quizzes)
+        self.result.questions += len(buffer)
+        if self.dry_run:
+            # Give pending quizzes a placeholder pk so later batches don't recount them
+            for quiz in new_quizzes:
+                quiz.pk = 0
+        else:
+            with transaction.atomic():
+                Quiz.objects.bulk_create(new_quizzes)
+                questions = Question.objects.bulk_create(
+                    [Question(quiz=pending.instance, **data) for (_, pending, _), data in zip(buffer, validated)],
+                    batch_size=settings.QUIZ_QUESTION_BULK_BATCH_SIZE,
+                )
+                # bulk_create skips post_save, so do what the signal handlers would:
+                # give the questions counters (shards get theirs with the mirror sync)...
+                if not sharding_enabled():
+                    QuestionStats.objects.bulk_create(
+                        [QuestionStats(question=question, quiz_id=question.quiz_id) for question in questions],
+                        batch_size=settings.QUIZ_QUESTION_BULK_BATCH_SIZE,
+                        ignore_conflicts=True,
+                    )
+                # ...and drop cached payloads and answer keys of the quizzes touched
+                for quiz_id in {pending.instance.pk for _, pending, _ in buffer}:
+                    transaction.on_commit(lambda pk=quiz_id: bump_quiz_version(pk))
+                    schedule_content_sync(quiz_id)
+        if self.on_flush:
+            self.on_flush(self.result)
+
+
+def iter_bank_rows(quiz_ids=None, chunk_size=None):
+    """Yield one bank row dict per question, grouped by quiz in id order."""
+    questions = Question.objects.order_by('quiz_id', 'order', 'id')
+    if quiz_ids:
+        questions = questions.filter(quiz_id__in=quiz_ids)
+    rows = questions.values_list(
+        'quiz_id', 'quiz__title', 'question_text', 'question_type', 'options', 'correct_answer',
+    ).iterator(chunk_size=chunk_size or settings.QUIZ_EXPORT_CHUNK_SIZE)
+    for row in rows:
+        yield dict(zip(BANK_COLUMNS, row))
+
+
+def write_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def write_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=BANK_COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        row['options'] = json.dumps(row['options'], ensure_ascii=False)
+        yield writer.writerow(row)
+
+
+WRITERS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+}
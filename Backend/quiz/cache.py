@@ -0,0 +1,188 @@
+"""
+Versioned caching helpers for derived data.
+
+Every quiz (and user) has a version token. Anything derived from it (answer
+keys, rendered payloads, resolved users, ...) is cached under that token, so
+bumping the version is enough to invalidate all of it.
+
+User tokens live in Django's cache framework. Quiz tokens live in the Quiz
+row and are cached for only QUIZ_VERSION_CACHE_TIMEOUT seconds, so a bump
+reaches every worker within that time even when the cache is per process.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches, cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+
+from .routers import apin_if_recently_written, mark_quiz_written, pin_if_recently_written
+
+
+VERSION_KEY = '{namespace}:{obj_id}:version'
+
+
+def cache_is_shared():
+    """Whether every worker process sees the same default cache."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def get_version(namespace, obj_id):
+    """Return the current version token for an object, creating one if missing."""
+    key = VERSION_KEY.format(namespace=namespace, obj_id=obj_id)
+    version = cache.get(key)
+    if version is None:
+        # add() keeps the first token if another worker raced us here
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(namespace, obj_id):
+    """Async variant of get_version()."""
+    key = VERSION_KEY.format(namespace=namespace, obj_id=obj_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(namespace, obj_id):
+    """Invalidate all cached data derived from an object."""
+    cache.set(VERSION_KEY.format(namespace=namespace, obj_id=obj_id), uuid.uuid4().hex, timeout=None)
+
+
+def _quiz_versions(quiz_id):
+    from .models import Quiz
+
+    # Always the primary: a lagging replica would hand out the old token
+    return Quiz.objects.using(DEFAULT_DB_ALIAS).filter(pk=quiz_id).values_list('version', flat=True)
+
+
+def get_quiz_version(quiz_id):
+    """Return the current version token for a quiz (None for unknown quizzes)."""
+    key = VERSION_KEY.format(namespace='quiz', obj_id=quiz_id)
+    version = cache.get(key)
+    if version is None:
+        version = _quiz_versions(quiz_id).first()
+        if version is not None:
+            cache.set(key, version, settings.QUIZ_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+async def aget_quiz_version(quiz_id):
+    """Async variant of get_quiz_version()."""
+    key = VERSION_KEY.format(namespace='quiz', obj_id=quiz_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = await _quiz_versions(quiz_id).afirst()
+        if version is not None:
+            await cache.aset(key, version, settings.QUIZ_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def bump_quiz_version(quiz_id):
+    """Invalidate all cached data derived from a quiz."""
+    from .models import Quiz
+
+    Quiz.objects.using(DEFAULT_DB_ALIAS).filter(pk=quiz_id).update(version=uuid.uuid4().hex)
+    cache.delete(VERSION_KEY.format(namespace='quiz', obj_id=quiz_id))
+    mark_quiz_written(quiz_id)
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU mapping."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionedQuizCache:
+    """
+    Two-tier cache for values built from a quiz.
+
+    Lookups go to an in-process LRU first, then to Django's cache, and only
+    call ``builder(quiz_id)`` on a miss in both. Entries are keyed by the
+    quiz version token, so stale values are never served after a bump
+    (builds right after a bump read from the primary, see quiz.routers).
+    ``aget()`` is the same lookup for async views and builds with the
+    coroutine ``abuilder(quiz_id)`` when one is given.
+    """
+
+    def __init__(self, namespace, builder, maxsize=256, timeout=3600, abuilder=None):
+        self.namespace = namespace
+        self.builder = builder
+        self.abuilder = abuilder or sync_to_async(builder)
+        self.timeout = timeout
+        self.local = LRUCache(maxsize)
+
+    def cache_key(self, quiz_id, version):
+        return f'quiz:{quiz_id}:{self.namespace}:{version}'
+
+    def get(self, quiz_id):
+        version = get_quiz_version(quiz_id)
+        hit = self.local.get(quiz_id)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+
+        key = self.cache_key(quiz_id, version)
+        value = cache.get(key)
+        if value is None:
+            # Version was read before building, so a concurrent bump can only
+            # leave a stale value under the old (now unreachable) token.
+            pin_if_recently_written(quiz_id)
+            value = self.builder(quiz_id)
+            cache.set(key, value, self.timeout)
+        self.local.set(quiz_id, (version, value))
+        return value
+
+    async def aget(self, quiz_id):
+        version = await aget_quiz_version(quiz_id)
+        hit = self.local.get(quiz_id)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+
+        key = self.cache_key(quiz_id, version)
+        value = await cache.aget(key)
+        if value is None:
+            await apin_if_recently_written(quiz_id)
+            value = await self.abuilder(quiz_id)
+            await cache.aset(key, value, self.timeout)
+        self.local.set(quiz_id, (version, value))
+        return value
+
+    def clear(self):
+        self.local.clear()
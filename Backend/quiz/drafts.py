@@ -0,0 +1,214 @@
+"""
+Server-side drafts of in-progress attempts.
+
+PATCH /api/quizzes/{id}/attempts/{attempt}/ merges the changed answers into
+the attempt's draft. Merged drafts are written to Django's cache and kept in
+a per-process pending map; a background thread upserts every pending draft
+into AttemptDraft each QUIZ_DRAFT_FLUSH_INTERVAL seconds. Saving after every
+question therefore costs a cache write per save and one row write per flush,
+and the final submit grades what is already stored.
+
+Reads try the cache, then the pending map (in case the cache evicted the
+entry), then the table. Like the attempt spool this trades durability for
+fewer writes: a crashed worker loses its unflushed saves unless a shared
+cache still holds them.
+
+Coalescing needs a cache every worker shares. With a process-local backend
+(LocMem, Dummy) each save is written to the table straight away and reads
+skip the cache, so a save handled by another worker is never missed.
+Submitted attempts (AttemptSeed.submitted_at) are never written again.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.utils import timezone
+
+from .cache import cache_is_shared
+from .models import AttemptDraft, AttemptSeed
+from .sharding import is_frozen, shard_for_quiz, use_shard
+
+
+logger = logging.getLogger(__name__)
+
+DRAFT_KEY = 'attempt-draft:{attempt_id}'
+
+
+class DraftStore:
+    """Coalesces draft saves in the cache until flush() writes them out."""
+
+    def __init__(self):
+        # attempt_id -> (quiz_id, answers); the quiz picks the shard at flush time
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Serialises flush() and discard() so a submitted draft is not re-inserted
+        self._flush_lock = threading.Lock()
+
+    def cache_key(self, attempt_id):
+        return DRAFT_KEY.format(attempt_id=attempt_id)
+
+    def load(self, attempt_id):
+        """Return the saved {question_id: answer} dict of an attempt."""
+        attempt_id = str(attempt_id)
+        shared = cache_is_shared()
+        answers = cache.get(self.cache_key(attempt_id)) if shared else None
+        if answers is None:
+            with self._lock:
+                answers = self._pending.get(attempt_id, (None, None))[1]
+        if answers is None:
+            answers = AttemptDraft.objects.filter(pk=attempt_id).values_list('answers', flat=True).first()
+            if answers is None:
+                # Not cached: a save elsewhere may not have been flushed yet
+                return {}
+            if shared:
+                cache.set(self.cache_key(attempt_id), answers, settings.QUIZ_DRAFT_CACHE_TIMEOUT)
+        return answers
+
+    def save(self, attempt_id, changes, quiz_id=None):
+        """
+        Merge ``changes`` into the draft (a None answer clears it) and return
+        the merged dict. Concurrent saves of one attempt are last-writer-wins.
+        ``quiz_id`` locates the attempt's shard; without it the draft is
+        written to the default database.
+        """
+        attempt_id = str(attempt_id)
+        answers = dict(self.load(attempt_id))
+        for question_id, answer in changes.items():
+            if answer is None:
+                answers.pop(question_id, None)
+            else:
+                answers[question_id] = answer
+        if not cache_is_shared():
+            # Other workers cannot see this process's cache or pending map
+            with use_shard(shard_for_quiz(quiz_id) if quiz_id is not None else DEFAULT_DB_ALIAS):
+                self.write({attempt_id: answers})
+            return answers
+        cache.set(self.cache_key(attempt_id), answers, settings.QUIZ_DRAFT_CACHE_TIMEOUT)
+        with self._lock:
+            self._pending[attempt_id] = (quiz_id, answers)
+        return answers
+
+    def discard(self, attempt_id):
+        """Drop the draft of a submitted attempt everywhere it is stored."""
+        attempt_id = str(attempt_id)
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop(attempt_id, None)
+            cache.delete(self.cache_key(attempt_id))
+            AttemptDraft.objects.filter(pk=attempt_id).delete()
+
+    def flush(self):
+        """Upsert every pending draft, one statement per shard. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                # Another worker may have saved since; the cache holds the newest draft
+                fresh = cache.get_many([self.cache_key(attempt_id) for attempt_id in pending])
+                by_shard = defaultdict(dict)
+                held = {}
+                for attempt_id, (quiz_id, answers) in pending.items():
+                    if quiz_id is not None and is_frozen(quiz_id):
+                        # Being moved: written to its new shard by a later flush
+                        held[attempt_id] = (quiz_id, answers)
+                        continue
+                    alias = shard_for_quiz(quiz_id) if quiz_id is not None else DEFAULT_DB_ALIAS
+                    by_shard[alias][attempt_id] = fresh.get(self.cache_key(attempt_id), answers)
+                written = 0
+                for alias, drafts in by_shard.items():
+                    with use_shard(alias):
+                        written += self.write(drafts)
+                with self._lock:
+                    for attempt_id, draft in held.items():
+                        self._pending.setdefault(attempt_id, draft)
+            except BaseException:
+                # Keep the drafts for the next flush unless they were saved again meanwhile
+                with self._lock:
+                    for attempt_id, draft in pending.items():
+                        self._pending.setdefault(attempt_id, draft)
+                raise
+            return written
+
+    def write(self, drafts):
+        """Upsert {attempt_id: answers} drafts of one shard."""
+        # Skip attempts submitted or whose quiz was deleted in the meantime
+        open_attempts = AttemptSeed.objects.filter(pk__in=list(drafts), submitted_at__isnull=True)
+        existing = {str(pk) for pk in open_attempts.values_list('pk', flat=True)}
+        now = timezone.now()
+        rows = [
+            AttemptDraft(attempt_id=attempt_id, answers=answers, updated_at=now)
+            for attempt_id, answers in drafts.items()
+            if attempt_id in existing
+        ]
+        AttemptDraft.objects.bulk_create(
+            rows,
+            batch_size=settings.QUIZ_ATTEMPT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['attempt'],
+            update_fields=['answers', 'updated_at'],
+        )
+        if rows:
+            # An attempt submitted since the check above has already discarded its draft
+            AttemptDraft.objects.filter(
+                pk__in=[row.attempt_id for row in rows], attempt__submitted_at__isnull=False,
+            ).delete()
+        return len(rows)
+
+    def clear(self):
+        """Forget pending drafts without writing them."""
+        with self._lock:
+            self._pending.clear()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class DraftFlusher(threading.Thread):
+    """Daemon thread that flushes pending drafts every ``interval`` seconds."""
+
+    def __init__(self, store, interval):
+        super().__init__(name='quiz-draft-flusher', daemon=True)
+        self.store = store
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.store.flush()
+            except Exception:
+                logger.exception('Failed to flush attempt drafts')
+            finally:
+                close_old_connections()
+
+
+def flush_at_exit(store):
+    try:
+        store.flush()
+    except Exception:
+        logger.exception('Failed to flush attempt drafts at exit')
+
+
+_store = DraftStore()
+_flusher = None
+_lock = threading.Lock()
+
+
+def get_drafts():
+    """Return the process-wide draft store, starting the flusher thread on first use."""
+    global _flusher
+    with _lock:
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if _flusher is None and settings.QUIZ_DRAFT_FLUSH_INTERVAL > 0:
+            _flusher = DraftFlusher(_store, settings.QUIZ_DRAFT_FLUSH_INTERVAL)
+            _flusher.start()
+            atexit.register(flush_at_exit, _store)
+    return _store
@@ -0,0 +1,100 @@
+"""
+Streaming exports of QuizAttempt history.
+
+Attempts are read with ``values_list(...).iterator()`` and written out one row
+at a time, so memory stays flat however many attempts a quiz has. Answers are
+flattened into one ``q_<question_id>`` column per question (in quiz order),
+giving CSV and NDJSON the same fixed, Parquet-friendly schema. Attempts moved
+to cold storage by ``archive_attempts`` are exported from their segment files
+instead when an ``archived`` (since, until) range is given.
+"""
+import csv
+import json
+
+from django.conf import settings
+
+from .archive import iter_archived_attempts
+from .grading import get_answer_key
+from .models import QuizAttempt
+from .packing import ANSWER_COLUMNS, stored_answers
+from .sharding import shard_for_quiz, use_shard
+
+
+BASE_COLUMNS = ['attempt_id', 'submitted_at', 'score', 'total_questions']
+
+
+class Echo:
+    """File-like object whose write() returns the value (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(quiz_id):
+    """Return the column names for a quiz export. Raises Http404 for unknown quizzes."""
+    answer_key = get_answer_key(quiz_id)
+    return BASE_COLUMNS + [f'q_{entry[0]}' for entry in answer_key.entries]
+
+
+def flat_row(attempt_id, submitted_at, score, total_questions, answers, question_keys):
+    row = {
+        'attempt_id': attempt_id,
+        'submitted_at': submitted_at,
+        'score': score,
+        'total_questions': total_questions,
+    }
+    for key in question_keys:
+        row[f'q_{key}'] = answers.get(key) or None
+    return row
+
+
+def iter_attempt_rows(quiz_id, columns, chunk_size=None, archived=None):
+    """
+    Yield one flat dict per attempt, oldest first. With ``archived`` set to a
+    (since, until) pair (either may be None) the archived attempts submitted
+    in that range are read instead of the live table.
+    """
+    question_keys = [column[2:] for column in columns[len(BASE_COLUMNS):]]
+    if archived is not None:
+        for attempt in iter_archived_attempts(quiz_id, *archived):
+            yield flat_row(
+                attempt['id'], attempt['submitted_at'], attempt['score'], attempt['total_questions'],
+                attempt['answers'], question_keys,
+            )
+        return
+
+    # Streaming responses are consumed after the view returns, outside its shard context
+    shard = shard_for_quiz(quiz_id)
+    attempts = (
+        QuizAttempt.objects.for_quiz(quiz_id)
+        .order_by('submitted_at', 'id')
+        .values_list('id', 'submitted_at', 'score', 'total_questions', *ANSWER_COLUMNS)
+    )
+    for attempt_id, submitted_at, score, total_questions, *stored in attempts.iterator(
+        chunk_size=chunk_size or settings.QUIZ_EXPORT_CHUNK_SIZE
+    ):
+        with use_shard(shard):
+            answers = stored_answers(*stored)
+        yield flat_row(
+            attempt_id, submitted_at.isoformat(), score, total_questions, answers, question_keys,
+        )
+
+
+def iter_csv(quiz_id, columns, chunk_size=None, archived=None):
+    """Yield CSV lines (header first) for a quiz's attempts."""
+    writer = csv.DictWriter(Echo(), fieldnames=columns)
+    yield writer.writeheader()
+    for row in iter_attempt_rows(quiz_id, columns, chunk_size, archived):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(quiz_id, columns, chunk_size=None, archived=None):
+    """Yield one JSON object per line for a quiz's attempts."""
+    for row in iter_attempt_rows(quiz_id, columns, chunk_size, archived):
+        yield json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+EXPORTERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
@@ -0,0 +1,165 @@
+"""
+Compiled answer keys used to grade quiz submissions.
+
+An answer key is a compact, picklable snapshot of a quiz's questions holding
+only what grading needs. Keys are cached per quiz version (see quiz.cache) and
+invalidated by the Question/Quiz signals in quiz.signals.
+"""
+from dataclasses import dataclass, replace
+
+from django.conf import settings
+from django.http import Http404
+
+from .cache import VersionedQuizCache
+from .models import Quiz, Question
+from .shuffle import select_entries
+
+
+@dataclass(slots=True)
+class QuestionResult:
+    """Grading outcome for one question."""
+    question_id: int
+    question_text: str
+    user_answer: str | None
+    correct_answer: str
+    is_correct: bool
+
+    def to_representation(self):
+        # Trimmed like the CharFields of QuestionResultSerializer
+        return {
+            'question_id': self.question_id,
+            'question_text': self.question_text.strip(),
+            'user_answer': self.user_answer.strip() if self.user_answer is not None else None,
+            'correct_answer': self.correct_answer.strip(),
+            'is_correct': self.is_correct,
+        }
+
+
+@dataclass(slots=True)
+class QuizResult:
+    """
+    Grading outcome for a whole submission.
+
+    Built by the server from trusted data, so it is rendered directly instead
+    of being round-tripped through QuizResultSerializer validation.
+    to_representation() produces the same shape and JSON bytes.
+    """
+    score: int
+    total_questions: int
+    results: list
+    # Seed of a shuffled attempt (stored with the attempt, not rendered)
+    seed: int | None = None
+
+    @property
+    def percentage(self):
+        if self.total_questions > 0:
+            return self.score / self.total_questions * 100
+        return 0.0
+
+    def to_representation(self):
+        return {
+            'score': self.score,
+            'total_questions': self.total_questions,
+            'percentage': self.percentage,
+            'results': [result.to_representation() for result in self.results],
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerKey:
+    """
+    Grading data for one quiz: (question_id, question_text, correct_answer, order)
+    rows plus the quiz's shuffle settings. ``for_seed()`` narrows it to the
+    questions of one shuffled attempt.
+    """
+    quiz_id: int
+    entries: tuple
+    questions_per_attempt: int | None = None
+    shuffle_questions: bool = False
+    shuffle_options: bool = False
+    seed: int | None = None
+
+    @property
+    def total_questions(self):
+        return len(self.entries)
+
+    def for_seed(self, seed):
+        """Return the key for the attempt started with ``seed``."""
+        entries = select_entries(self.entries, seed, self.questions_per_attempt, self.shuffle_questions)
+        return replace(self, entries=entries, seed=seed)
+
+    def grade(self, user_answers):
+        """
+        Grade a dict of {question_id (str): answer} and return a QuizResult.
+        Unanswered questions are treated as incorrect.
+        """
+        score = 0
+        results = []
+
+        for question_id, question_text, correct_answer, _order in self.entries:
+            user_answer = user_answers.get(str(question_id), '')
+            is_correct = user_answer == correct_answer
+
+            if is_correct:
+                score += 1
+
+            results.append(QuestionResult(
+                question_id,
+                question_text,
+                user_answer if user_answer else None,
+                correct_answer,
+                is_correct,
+            ))
+
+        return QuizResult(score, len(self.entries), results, self.seed)
+
+
+SHUFFLE_FIELDS = ('questions_per_attempt', 'shuffle_questions', 'shuffle_options')
+
+
+def answer_key_queries(quiz_id):
+    quiz = Quiz.objects.filter(pk=quiz_id).values_list(*SHUFFLE_FIELDS)
+    entries = (
+        Question.objects.filter(quiz_id=quiz_id)
+        .order_by('order', 'id')
+        .values_list('id', 'question_text', 'correct_answer', 'order')
+    )
+    return quiz, entries
+
+
+def compile_answer_key(quiz_id):
+    """Build an AnswerKey from the database. Raises Http404 for unknown quizzes."""
+    quiz, entries = answer_key_queries(quiz_id)
+    settings_row = quiz.first()
+    if settings_row is None:
+        raise Http404('No Quiz matches the given query.')
+    return AnswerKey(quiz_id, tuple(entries), *settings_row)
+
+
+async def acompile_answer_key(quiz_id):
+    """Async variant of compile_answer_key() using the async ORM."""
+    quiz, entries = answer_key_queries(quiz_id)
+    settings_row = await quiz.afirst()
+    if settings_row is None:
+        raise Http404('No Quiz matches the given query.')
+    return AnswerKey(quiz_id, tuple([row async for row in entries]), *settings_row)
+
+
+answer_keys = VersionedQuizCache(
+    # v2: AnswerKey gained shuffle fields; don't unpickle keys cached before them
+    'answer-key-v2',
+    compile_answer_key,
+    maxsize=getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_SIZE', 256),
+    timeout=getattr(settings, 'QUIZ_CACHE_TIMEOUT', 3600),
+    abuilder=acompile_answer_key,
+)
+
+
+def get_answer_key(quiz_id):
+    """Return the cached AnswerKey for a quiz, compiling it on a miss."""
+    return answer_keys.get(quiz_id)
+
+
+async def aget_answer_key(quiz_id):
+    """Async variant of get_answer_key()."""
+    return await answer_keys.aget(quiz_id)
@@ -0,0 +1,35 @@
+"""
+Password hashers whose cost parameters come from settings.
+
+Django's hashers hard-code their cost as class attributes. These subclasses
+keep the same algorithm names (so existing hashes keep verifying) but read
+the cost from QUIZ_PBKDF2_* / QUIZ_SCRYPT_* / QUIZ_ARGON2_* settings. Hashes
+created with other parameters are re-encoded on the user's next successful
+login via Django's ``must_update`` mechanism. Use ``python -m
+benchmarks.password_hashing`` to pick values for the hardware you run on.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = settings.QUIZ_PBKDF2_ITERATIONS
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = settings.QUIZ_SCRYPT_WORK_FACTOR
+    block_size = settings.QUIZ_SCRYPT_BLOCK_SIZE
+    parallelism = settings.QUIZ_SCRYPT_PARALLELISM
+    # scrypt needs ~128 * n * r * p bytes; OpenSSL's default cap is 32 MiB
+    maxmem = 2 * 128 * work_factor * block_size * parallelism
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Requires the optional ``argon2-cffi`` package."""
+    time_cost = settings.QUIZ_ARGON2_TIME_COST
+    memory_cost = settings.QUIZ_ARGON2_MEMORY_COST
+    parallelism = settings.QUIZ_ARGON2_PARALLELISM
@@ -0,0 +1,130 @@
+"""
+Per-quiz leaderboards.
+
+Ranks use competition ranking (1, 2, 2, 4) by score. ScoreBucket rows count
+attempts per score and are bumped whenever attempts are stored, so a rank is
+``1 + attempts in higher buckets`` (at most one row per possible score)
+rather than a COUNT over every attempt. The top-N entries come from an
+index range scan on attempt_leaderboard_idx (quiz, -score, submitted_at).
+``rebuild_leaderboard`` recomputes the buckets from QuizAttempt history.
+"""
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+
+from .models import QuizAttempt, ScoreBucket
+from .sharding import on_quiz_shard, shard_atomic
+
+
+@on_quiz_shard
+def apply_scores(quiz_id, score_counts):
+    """
+    Add a Counter of score -> number of new attempts to a quiz's buckets.
+    Negative counts take attempts out.
+    """
+    # One UPDATE per distinct increment, like the stats counters
+    by_increment = defaultdict(list)
+    for score, count in score_counts.items():
+        if count:
+            by_increment[count].append(score)
+    with shard_atomic():
+        for count, scores in by_increment.items():
+            buckets = ScoreBucket.objects.filter(quiz_id=quiz_id)
+            updated = buckets.filter(score__in=scores).update(count=F('count') + count)
+            if updated == len(scores):
+                continue
+            # First attempts with some of these scores: create their buckets
+            existing = set(buckets.filter(score__in=scores).values_list('score', flat=True))
+            missing = [score for score in scores if score not in existing]
+            ScoreBucket.objects.bulk_create(
+                [ScoreBucket(quiz_id=quiz_id, score=score) for score in missing],
+                ignore_conflicts=True,
+            )
+            buckets.filter(score__in=missing).update(count=F('count') + count)
+
+
+@on_quiz_shard
+def rebuild_leaderboard(quiz_id):
+    """Recompute a quiz's score buckets from its QuizAttempt history."""
+    counts = (
+        QuizAttempt.objects.filter(quiz_id=quiz_id)
+        .values_list('score')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with shard_atomic():
+        ScoreBucket.objects.filter(quiz_id=quiz_id).delete()
+        ScoreBucket.objects.bulk_create([
+            ScoreBucket(quiz_id=quiz_id, score=score, count=count) for score, count in counts
+        ])
+
+
+class Ranks:
+    """Attempts per score for one quiz, answering rank-of-score lookups."""
+
+    def __init__(self, buckets):
+        # (score, attempts with a higher score), best score first
+        self.above = []
+        self.attempt_count = 0
+        for score, count in buckets:
+            self.above.append((score, self.attempt_count))
+            self.attempt_count += count
+
+    @classmethod
+    def load(cls, quiz_id):
+        buckets = ScoreBucket.objects.for_quiz(quiz_id).filter(count__gt=0).order_by('-score')
+        return cls(buckets.values_list('score', 'count'))
+
+    def rank(self, score):
+        """Competition rank of ``score`` (1 + attempts that scored higher)."""
+        higher = self.attempt_count
+        for bucket_score, above in self.above:
+            if bucket_score <= score:
+                higher = above
+                break
+        return higher + 1
+
+
+# Usernames are looked up separately: users stay in the default database
+# while attempts may live on a shard (see quiz.sharding)
+ENTRY_FIELDS = ('score', 'total_questions', 'submitted_at', 'user_id')
+
+
+def with_usernames(rows):
+    """Replace the user_id ending each ENTRY_FIELDS row with the username."""
+    user_ids = {row[-1] for row in rows} - {None}
+    usernames = dict(
+        get_user_model().objects.filter(pk__in=user_ids).values_list('pk', 'username')
+    ) if user_ids else {}
+    return [(*row[:-1], usernames.get(row[-1])) for row in rows]
+
+
+def top_entries(quiz_id, limit, ranks):
+    """Return the best ``limit`` attempts as ranked entry dicts."""
+    attempts = (
+        QuizAttempt.objects.for_quiz(quiz_id)
+        .order_by('-score', 'submitted_at', 'id')
+        .values_list(*ENTRY_FIELDS)[:limit]
+    )
+    return [entry(ranks, *row) for row in with_usernames(list(attempts))]
+
+
+def best_entry(quiz_id, user_id, ranks):
+    """Return the ranked entry of a user's best attempt, or None."""
+    row = (
+        QuizAttempt.objects.for_quiz(quiz_id).filter(user_id=user_id)
+        .order_by('-score', 'submitted_at')
+        .values_list(*ENTRY_FIELDS)
+        .first()
+    )
+    return entry(ranks, *with_usernames([row])[0]) if row else None
+
+
+def entry(ranks, score, total_questions, submitted_at, username):
+    return {
+        'rank': ranks.rank(score),
+        'username': username,
+        'score': score,
+        'total_questions': total_questions,
+        'submitted_at': submitted_at,
+    }
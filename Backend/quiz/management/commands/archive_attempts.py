@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quiz.archive import archive_quiz
+from quiz.attempts import AttemptSpool, drain
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Move attempts older than a cutoff to compressed segment files and delete them from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help='Quizzes to archive (default: all).')
+        parser.add_argument('--older-than', type=float, required=True, metavar='DAYS',
+                            help='Archive attempts submitted more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Attempts read and deleted per query.')
+        parser.add_argument('--segment-rows', type=int, default=settings.QUIZ_ARCHIVE_SEGMENT_ROWS,
+                            help='Attempts per segment file.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the attempts that would be archived.')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+
+        if settings.QUIZ_ATTEMPT_WRITE_BEHIND and not options['dry_run']:
+            # Spooled attempts must reach the table before its counters are rebuilt
+            drain(AttemptSpool(settings.QUIZ_ATTEMPT_SPOOL_PATH), settings.QUIZ_ATTEMPT_BATCH_SIZE)
+
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+        quiz_ids = list(quizzes.values_list('id', flat=True))
+        attempts = segments = 0
+        for quiz_id in quiz_ids:
+            result = archive_quiz(
+                quiz_id, cutoff,
+                batch_size=options['batch_size'],
+                segment_rows=options['segment_rows'],
+                dry_run=options['dry_run'],
+            )
+            attempts += result.attempts
+            segments += result.segments
+        if options['dry_run']:
+            self.stdout.write(f'Would archive {attempts} attempts of {len(quiz_ids)} quizzes submitted before {cutoff:%Y-%m-%d %H:%M}')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {attempts} attempts of {len(quiz_ids)} quizzes to {segments} segments'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import AnswerLayout, Question, QuizAttempt
+from quiz.packing import convert_attempts
+
+
+class Command(BaseCommand):
+    help = 'Re-encode stored attempt answers in batches (JSON to packed, or back with --unpack).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help='Quizzes to convert (default: all).')
+        parser.add_argument('--unpack', action='store_true',
+                            help='Convert packed answers back to JSON.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        converted = convert_attempts(
+            QuizAttempt, AnswerLayout, Question,
+            pack=not options['unpack'],
+            batch_size=options['batch_size'],
+            quiz_ids=options['quiz_ids'],
+        )
+        encoding = 'JSON' if options['unpack'] else 'packed'
+        self.stdout.write(self.style.SUCCESS(f'Converted {converted} attempts to {encoding} answers'))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quiz.attempts import AttemptSpool, drain
+
+
+class Command(BaseCommand):
+    help = 'Insert all quiz attempts waiting in the write-behind spool (also replays after a crash).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.QUIZ_ATTEMPT_BATCH_SIZE)
+        parser.add_argument('--spool', default=settings.QUIZ_ATTEMPT_SPOOL_PATH,
+                            help='Path of the spool database to drain.')
+        parser.add_argument('--status', action='store_true',
+                            help='Only report how many attempts are pending.')
+
+    def handle(self, *args, **options):
+        spool = AttemptSpool(options['spool'])
+        if options['status']:
+            self.stdout.write(f'{len(spool)} attempts pending')
+            return
+
+        flushed = drain(spool, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} attempts'))
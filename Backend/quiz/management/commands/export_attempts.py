@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from quiz.exports import EXPORTERS, export_columns
+
+
+def parse_timestamp(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return make_aware(parsed) if is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = 'Stream the attempt history of a quiz as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('--format', choices=sorted(EXPORTERS), default='csv')
+        parser.add_argument('--output', help='File to write (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=settings.QUIZ_EXPORT_CHUNK_SIZE)
+        parser.add_argument('--archived', action='store_true',
+                            help='Export attempts moved to cold storage by archive_attempts.')
+        parser.add_argument('--since', type=parse_timestamp,
+                            help='With --archived: only attempts submitted at or after this ISO time.')
+        parser.add_argument('--until', type=parse_timestamp,
+                            help='With --archived: only attempts submitted before this ISO time.')
+
+    def handle(self, *args, **options):
+        try:
+            columns = export_columns(options['quiz_id'])
+        except Http404:
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist")
+
+        archived = (options['since'], options['until']) if options['archived'] else None
+        lines = EXPORTERS[options['format']](options['quiz_id'], columns, options['chunk_size'], archived)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                fh.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quiz.banks import WRITERS, iter_bank_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream quizzes and their questions as a JSON Lines or CSV question bank.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids',
+                            help='Quiz id to export (repeatable; default: all quizzes).')
+        parser.add_argument('--format', choices=sorted(WRITERS), default='jsonl')
+        parser.add_argument('--output', help='File to write (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=settings.QUIZ_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        counted = {'questions': 0}
+
+        def counting(rows):
+            for row in rows:
+                counted['questions'] += 1
+                yield row
+
+        start = time.perf_counter()
+        rows = counting(iter_bank_rows(options['quiz_ids'], options['chunk_size']))
+        lines = WRITERS[options['format']](rows)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                fh.writelines(lines)
+            report = self.stdout
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            # Keep stdout a clean bank file
+            report = self.stderr
+        elapsed = time.perf_counter() - start
+
+        rate = counted['questions'] / elapsed if elapsed else 0
+        report.write(self.style.SUCCESS(
+            f"Exported {counted['questions']} questions in {elapsed:.2f}s ({rate:.0f} questions/s)"
+        ))
@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.banks import READERS, BankError, QuizBankImporter
+
+
+class Command(BaseCommand):
+    help = 'Import a JSON Lines or CSV question bank, streaming it in validated batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Bank file to read ('-' for stdin).")
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='Defaults to the file extension (.jsonl or .csv).')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Questions validated and inserted per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate without writing anything.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        bank_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if bank_format not in READERS:
+            raise CommandError('Cannot infer the bank format; pass --format jsonl or --format csv')
+
+        def progress(result):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'{result.questions} questions in {result.quizzes} quizzes')
+
+        importer = QuizBankImporter(
+            batch_size=options['batch_size'], dry_run=options['dry_run'], on_flush=progress,
+        )
+        start = time.perf_counter()
+        fh = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            result = importer.run(READERS[bank_format](fh))
+        except BankError as exc:
+            written = importer.result.questions
+            if written and not options['dry_run']:
+                raise CommandError(f'{exc} ({written} questions from earlier batches were imported)')
+            raise CommandError(str(exc))
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+        elapsed = time.perf_counter() - start
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        rate = result.questions / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.questions} questions in {result.quizzes} quizzes '
+            f'in {elapsed:.2f}s ({rate:.0f} questions/s)'
+        ))
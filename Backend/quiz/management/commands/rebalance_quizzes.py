@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from quiz.attempts import AttemptSpool, drain
+from quiz.models import Quiz
+from quiz.sharding import hash_shard, move_quiz, pin_existing_quizzes, sharding_enabled
+
+
+class Command(BaseCommand):
+    help = 'Move quizzes to another shard while they keep serving traffic.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help='Quizzes to move (default: all).')
+        parser.add_argument('--to', metavar='ALIAS',
+                            help="Target database alias (default: each quiz's hash shard over QUIZ_SHARDS).")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows copied and deleted per query.')
+        parser.add_argument('--freeze-grace', type=float, default=settings.QUIZ_SHARD_FREEZE_GRACE,
+                            help='Seconds to wait for in-flight writes after freezing a quiz '
+                                 '(on top of QUIZ_SHARD_LOOKUP_TIMEOUT).')
+        parser.add_argument('--pin-existing', action='store_true',
+                            help="Only record 'default' as the shard of quizzes without one "
+                                 "(run once before enabling sharding on an existing database).")
+
+    def handle(self, *args, **options):
+        if options['pin_existing']:
+            pinned = pin_existing_quizzes()
+            self.stdout.write(self.style.SUCCESS(f'Pinned {pinned} quizzes to the default database'))
+            return
+        if not sharding_enabled():
+            raise CommandError('Sharding is disabled; set DATABASE_SHARD_URLS or QUIZ_SHARDS')
+        if options['to'] and options['to'] not in connections:
+            raise CommandError(f'Unknown database alias {options["to"]!r}')
+
+        drain_spool = None
+        if settings.QUIZ_ATTEMPT_WRITE_BEHIND:
+            spool = AttemptSpool(settings.QUIZ_ATTEMPT_SPOOL_PATH)
+
+            def drain_spool():
+                # Spooled attempts of a frozen quiz must reach its old shard before the copy
+                drain(spool, settings.QUIZ_ATTEMPT_BATCH_SIZE)
+
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+        quiz_ids = list(quizzes.values_list('id', flat=True))
+        moved = attempts = 0
+        for quiz_id in quiz_ids:
+            result = move_quiz(
+                quiz_id, options['to'] or hash_shard(quiz_id),
+                batch_size=options['batch_size'],
+                freeze_grace=options['freeze_grace'],
+                drain_spool=drain_spool,
+            )
+            if result.source == result.target:
+                continue
+            moved += 1
+            attempts += result.attempts
+            self.stdout.write(
+                f'Quiz {quiz_id}: {result.source} -> {result.target}, {result.attempts} attempts, '
+                f'writes paused {result.frozen_seconds:.2f}s'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} of {len(quiz_ids)} quizzes ({attempts} attempts)'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from quiz.leaderboard import rebuild_leaderboard
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Recompute leaderboard score buckets from QuizAttempt history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help='Quizzes to rebuild (default: all).')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+        quiz_ids = list(quizzes.values_list('id', flat=True))
+        for quiz_id in quiz_ids:
+            rebuild_leaderboard(quiz_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboards for {len(quiz_ids)} quizzes'))
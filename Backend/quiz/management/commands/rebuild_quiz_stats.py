@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import Quiz
+from quiz.stats import rebuild_quiz_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute QuizStats/QuestionStats counters from QuizAttempt history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help='Quizzes to rebuild (default: all).')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+        quiz_ids = list(quizzes.values_list('id', flat=True))
+        count = 0
+        for quiz_id in quiz_ids:
+            rebuild_quiz_stats(quiz_id, chunk_size=options['chunk_size'])
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} quizzes'))
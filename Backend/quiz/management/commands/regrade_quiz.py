@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quiz.attempts import AttemptSpool, drain
+from quiz.models import Quiz
+from quiz.regrade import regrade_quiz
+
+
+class Command(BaseCommand):
+    help = 'Regrade stored attempts against the current answer keys and correct stats and leaderboards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+                            help='Quizzes to regrade (default: all).')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Attempts loaded and graded per query.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes sharing each quiz (useful for very large quizzes).')
+
+    def handle(self, *args, **options):
+        if settings.QUIZ_ATTEMPT_WRITE_BEHIND:
+            # Spooled attempts were graded with the old key too
+            drain(AttemptSpool(settings.QUIZ_ATTEMPT_SPOOL_PATH), settings.QUIZ_ATTEMPT_BATCH_SIZE)
+
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(pk__in=options['quiz_ids'])
+        quiz_ids = list(quizzes.values_list('id', flat=True))
+        attempts = changed = 0
+        for quiz_id in quiz_ids:
+            result = regrade_quiz(quiz_id, chunk_size=options['chunk_size'], workers=options['workers'])
+            attempts += result.attempts
+            changed += result.changed
+        self.stdout.write(self.style.SUCCESS(
+            f'Regraded {attempts} attempts of {len(quiz_ids)} quizzes ({changed} scores changed)'
+        ))
@@ -0,0 +1,114 @@
+"""
+In-process request metrics.
+
+PerformanceMiddleware records per-URL-name and method histograms here and code can
+attribute time to named spans (e.g. ``serializer``) with ``span()``. The
+registry renders itself in the Prometheus text exposition format. Metrics
+are per process: with several gunicorn workers each scrape sees one worker.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+METRICS = {
+    # name: (help text, buckets)
+    'quiz_request_duration_seconds': ('Wall time per request', DURATION_BUCKETS),
+    'quiz_request_db_queries': ('Database queries per request', QUERY_BUCKETS),
+    'quiz_request_db_duration_seconds': ('Database time per request', DURATION_BUCKETS),
+    'quiz_request_serializer_duration_seconds': ('Serializer time per request', DURATION_BUCKETS),
+    'quiz_response_size_bytes': ('Response body size', SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram compatible with Prometheus semantics."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms keyed by (metric name, view name, HTTP method)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, method, values):
+        """Record a {metric name: value} mapping for one request."""
+        with self._lock:
+            for name, value in values.items():
+                key = (name, view, method)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(METRICS[name][1])
+                histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Return all histograms in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view, method), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'view="{view}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Span timings (seconds by name) of the request being measured in this context
+_spans = ContextVar('quiz_metrics_spans', default=None)
+
+
+@contextmanager
+def collect_spans():
+    """Collect span() timings for the duration of the block."""
+    spans = {}
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Attribute the time spent in the block to ``name`` on the current request."""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - start
@@ -0,0 +1,97 @@
+"""
+Middleware for per-request performance instrumentation.
+"""
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .metrics import collect_spans, registry
+
+
+class PerformanceMiddleware:
+    """
+    Record wall time, DB query count and time, serializer time and response
+    size per URL name for a sampled fraction of requests.
+
+    Sampled requests get a Server-Timing header and feed the in-process
+    histograms served by the metrics endpoint. Controlled by
+    QUIZ_METRICS_SAMPLE_RATE (0 disables) and QUIZ_METRICS_SERVER_TIMING.
+    Works under both WSGI and ASGI without forcing async views onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        with self.measure() as measurement:
+            response = self.get_response(request)
+        return self.record(request, response, measurement)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        with self.measure() as measurement:
+            response = await self.get_response(request)
+        return self.record(request, response, measurement)
+
+    def sampled(self):
+        sample_rate = settings.QUIZ_METRICS_SAMPLE_RATE
+        return sample_rate > 0 and (sample_rate >= 1 or random.random() < sample_rate)
+
+    @contextmanager
+    def measure(self):
+        """Time the block and count the queries and spans it runs."""
+        measurement = {'queries': 0, 'db_seconds': 0.0, 'spans': None, 'elapsed': 0.0}
+
+        def db_timer(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                measurement['queries'] += 1
+                measurement['db_seconds'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            measurement['spans'] = stack.enter_context(collect_spans())
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(db_timer))
+            yield measurement
+        measurement['elapsed'] = time.perf_counter() - start
+
+    def record(self, request, response, measurement):
+        elapsed = measurement['elapsed']
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name if match else None) or 'unmatched'
+        size = len(response.content) if not response.streaming else 0
+        serializer_seconds = measurement['spans'].get('serializer', 0.0)
+
+        registry.observe(view, request.method, {
+            'quiz_request_duration_seconds': elapsed,
+            'quiz_request_db_queries': measurement['queries'],
+            'quiz_request_db_duration_seconds': measurement['db_seconds'],
+            'quiz_request_serializer_duration_seconds': serializer_seconds,
+            'quiz_response_size_bytes': size,
+        })
+
+        if settings.QUIZ_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={elapsed * 1000:.2f}',
+                f'db;dur={measurement["db_seconds"] * 1000:.2f};desc="{measurement["queries"]} queries"',
+                f'serializer;dur={serializer_seconds * 1000:.2f}',
+            ])
+        return response
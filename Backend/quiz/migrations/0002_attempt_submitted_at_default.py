@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0002_attempt_submitted_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStats',
+            fields=[
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.quiz')),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.PositiveBigIntegerField(default=0)),
+                ('total_possible', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'quiz stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.question')),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('incorrect_count', models.PositiveIntegerField(default=0)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='quiz.quiz')),
+            ],
+            options={
+                'verbose_name_plural': 'question stats',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_quiz_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'order'], name='question_quiz_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'submitted_at'], name='attempt_quiz_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', '-score', 'submitted_at'], include=('total_questions',), name='attempt_leaderboard_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['-created_at', '-id'], name='quiz_created_idx'),
+        ),
+    ]
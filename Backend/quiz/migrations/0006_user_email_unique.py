@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Fail with the offending addresses instead of a bare IntegrityError."""
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .exclude(email='')
+        .values('email')
+        .annotate(accounts=Count('id'))
+        .filter(accounts__gt=1)
+        .order_by('email')
+        .values_list('email', 'accounts')
+    )
+    if duplicates:
+        listed = '\n'.join(f'  {email}: {accounts} accounts' for email, accounts in duplicates[:50])
+        more = f'\n  ... and {len(duplicates) - 50} more' if len(duplicates) > 50 else ''
+        raise RuntimeError(
+            f'Cannot make auth_user emails unique; these addresses are shared by several '
+            f'accounts ({len(duplicates)} in total). Change or clear the email of all but one '
+            f'account for each, then run migrate again.\n{listed}{more}'
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Enforce unique non-empty emails on auth_user so SignupView can rely on the
+    database instead of checking with a separate query first. Blank emails
+    (e.g. superusers created without one) are left unconstrained.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('quiz', '0005_quiz_listing_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql="CREATE UNIQUE INDEX auth_user_email_uniq ON auth_user (email) WHERE email <> ''",
+            reverse_sql='DROP INDEX auth_user_email_uniq',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import quiz.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='questions_per_attempt',
+            field=models.PositiveIntegerField(blank=True, help_text='Draw this many questions from the bank per attempt (blank: all).', null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='shuffle_options',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='shuffle_questions',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='seed',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='AttemptSeed',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('seed', models.BigIntegerField(default=quiz.models.new_seed, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_seeds', to='quiz.quiz')),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_score_buckets(apps, schema_editor):
+    """Count existing attempts per (quiz, score) in one aggregate query."""
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    ScoreBucket = apps.get_model('quiz', 'ScoreBucket')
+    rows = QuizAttempt.objects.values('quiz_id', 'score').annotate(n=models.Count('id')).order_by()
+    ScoreBucket.objects.bulk_create(
+        (ScoreBucket(quiz_id=row['quiz_id'], score=row['score'], count=row['n']) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz', '0007_attempt_shuffle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quiz_attempts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'quiz', '-score', 'submitted_at'], name='attempt_user_best_idx'),
+        ),
+        migrations.AddField(
+            model_name='scorebucket',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='quiz.quiz'),
+        ),
+        migrations.AddConstraint(
+            model_name='scorebucket',
+            constraint=models.UniqueConstraint(fields=('quiz', 'score'), name='score_bucket_quiz_score_uniq'),
+        ),
+        migrations.RunPython(fill_score_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptDraft',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='draft', serialize=False, to='quiz.attemptseed')),
+                ('answers', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,221 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:22
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+
+# The encoder and converter are copied from quiz.packing as of this migration,
+# so later changes to the app code cannot break migrating older databases.
+FORMAT_VERSION = 1
+NO_ANSWER = 0
+LITERAL = 255
+MAX_OPTIONS = LITERAL - 1
+
+
+def write_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def write_text(out, text):
+    encoded = text.encode('utf-8')
+    write_varint(out, len(encoded))
+    out += encoded
+
+
+def read_text(data, pos):
+    length, pos = read_varint(data, pos)
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+
+class Layout:
+    """Encoder/decoder for one AnswerLayout row."""
+
+    def __init__(self, layout):
+        self.id = layout.pk
+        self.keys = [str(question_id) for question_id in layout.question_ids]
+        self.positions = {key: index for index, key in enumerate(self.keys)}
+        self.correct_answers = list(layout.correct_answers)
+        self.symbols = [[None] + list(question_options[:MAX_OPTIONS]) for question_options in layout.options]
+        self.codes = [
+            {option: code for code, option in enumerate(symbols) if code}
+            for symbols in self.symbols
+        ]
+        self.bitmap_size = (len(self.keys) + 7) // 8
+
+    def encode(self, answers):
+        bits = 0
+        codes = bytearray(len(self.keys))
+        literals = bytearray()
+        for index, (key, correct_answer, codebook) in enumerate(zip(self.keys, self.correct_answers, self.codes)):
+            answer = answers.get(key)
+            if (answer if answer is not None else '') == correct_answer:
+                bits |= 1 << index
+            if answer is None:
+                continue
+            if not isinstance(answer, str):
+                raise ValueError(f'Cannot pack non-string answer for question {key}')
+            code = codebook.get(answer)
+            if code is None:
+                codes[index] = LITERAL
+                write_text(literals, answer)
+            else:
+                codes[index] = code
+
+        extras = [(key, answer) for key, answer in answers.items() if key not in self.positions]
+        out = bytearray([FORMAT_VERSION])
+        out += bits.to_bytes(self.bitmap_size, 'little')
+        out += codes
+        out += literals
+        write_varint(out, len(extras))
+        for key, answer in extras:
+            if not isinstance(key, str) or not isinstance(answer, str):
+                raise ValueError(f'Cannot pack non-string answer for question {key}')
+            write_text(out, key)
+            write_text(out, answer)
+        return bytes(out)
+
+    def decode(self, packed):
+        packed = bytes(packed)
+        if packed[0] != FORMAT_VERSION:
+            raise ValueError(f'Unknown packed answers format {packed[0]}')
+        pos = 1 + self.bitmap_size
+        codes = packed[pos:pos + len(self.keys)]
+        pos += len(self.keys)
+        answers = {}
+        for key, code, symbols in zip(self.keys, codes, self.symbols):
+            if code == NO_ANSWER:
+                continue
+            if code == LITERAL:
+                answers[key], pos = read_text(packed, pos)
+            else:
+                answers[key] = symbols[code]
+        count, pos = read_varint(packed, pos)
+        for _ in range(count):
+            key, pos = read_text(packed, pos)
+            answers[key], pos = read_text(packed, pos)
+        return answers
+
+
+def save_layout(layouts, questions, quiz_id):
+    """Return the layout row for a quiz's current content, creating it if new."""
+    rows = list(
+        questions.filter(quiz_id=quiz_id)
+        .order_by('order', 'id')
+        .values_list('id', 'options', 'correct_answer')
+    )
+    question_ids = [question_id for question_id, _, _ in rows]
+    options = [list(question_options or []) for _, question_options, _ in rows]
+    correct_answers = [correct_answer for _, _, correct_answer in rows]
+    digest = hashlib.sha256(
+        json.dumps([question_ids, options, correct_answers], separators=(',', ':')).encode()
+    ).hexdigest()
+    layout, _ = layouts.get_or_create(
+        quiz_id=quiz_id, digest=digest,
+        defaults={'question_ids': question_ids, 'options': options, 'correct_answers': correct_answers},
+    )
+    return layout
+
+
+def convert_attempts(apps, schema_editor, pack, batch_size=2000):
+    """Re-encode stored attempts in primary-key batches: JSON to packed, or back."""
+    alias = schema_editor.connection.alias
+    attempt_model = apps.get_model('quiz', 'QuizAttempt')
+    layouts = apps.get_model('quiz', 'AnswerLayout').objects.using(alias)
+    questions = apps.get_model('quiz', 'Question').objects.using(alias)
+    attempts = attempt_model.objects.using(alias).filter(packed__isnull=pack)
+    current = {}
+    decoders = {}
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1].pk
+        changed = []
+        for attempt in batch:
+            if pack:
+                if attempt.quiz_id not in current:
+                    current[attempt.quiz_id] = Layout(save_layout(layouts, questions, attempt.quiz_id))
+                layout = current[attempt.quiz_id]
+                try:
+                    attempt.packed = layout.encode(attempt.answers)
+                except ValueError:
+                    continue
+                attempt.layout_id = layout.id
+                attempt.answers = {}
+            else:
+                if attempt.layout_id not in decoders:
+                    decoders[attempt.layout_id] = Layout(layouts.get(pk=attempt.layout_id))
+                attempt.answers = decoders[attempt.layout_id].decode(attempt.packed)
+                attempt.layout_id = None
+                attempt.packed = None
+            changed.append(attempt)
+        with transaction.atomic(using=alias):
+            attempt_model.objects.using(alias).bulk_update(changed, ['answers', 'layout', 'packed'])
+
+
+def pack_existing_attempts(apps, schema_editor):
+    """Convert stored answers in batches when the packed encoding is enabled."""
+    if settings.QUIZ_ATTEMPT_ANSWER_ENCODING != 'packed':
+        return
+    convert_attempts(apps, schema_editor, pack=True)
+
+
+def unpack_attempts(apps, schema_editor):
+    """Restore JSON answers before the packed columns are dropped."""
+    convert_attempts(apps, schema_editor, pack=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_attempt_draft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='packed',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='AnswerLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64)),
+                ('question_ids', models.JSONField()),
+                ('options', models.JSONField()),
+                ('correct_answers', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_layouts', to='quiz.quiz')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='layout',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='quiz.answerlayout'),
+        ),
+        migrations.AddConstraint(
+            model_name='answerlayout',
+            constraint=models.UniqueConstraint(fields=('quiz', 'digest'), name='answer_layout_quiz_digest_uniq'),
+        ),
+        migrations.RunPython(pack_existing_attempts, unpack_attempts),
+    ]
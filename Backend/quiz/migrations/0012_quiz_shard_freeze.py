@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_quiz_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizshard',
+            name='frozen_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_quiz_shard_freeze'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attemptseed',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:12
+
+from django.db import migrations, models
+import quiz.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_attempt_submitted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='version',
+            field=models.CharField(default=quiz.models.new_version, editable=False, max_length=32),
+        ),
+    ]
@@ -1,13 +1,40 @@
+import secrets
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .sharding import QuizScopedManager
+
+
+def new_seed():
+    return secrets.randbits(63)
+
+
+def new_version():
+    return uuid.uuid4().hex
 
 
 class Quiz(models.Model):
     """Stores quiz metadata including title and creation timestamp."""
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Opt-in per-attempt randomization (see quiz.shuffle)
+    questions_per_attempt = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Draw this many questions from the bank per attempt (blank: all)."
+    )
+    shuffle_questions = models.BooleanField(default=False)
+    shuffle_options = models.BooleanField(default=False)
+    # Token of the quiz's current content; derived caches are keyed by it (see quiz.cache)
+    version = models.CharField(max_length=32, default=new_version, editable=False)
 
     class Meta:
         verbose_name_plural = "quizzes"
+        indexes = [
+            # Keyset pagination of quiz listings, newest first
+            models.Index(fields=['-created_at', '-id'], name='quiz_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -29,6 +56,9 @@ class Question(models.Model):
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['quiz', 'order'], name='question_quiz_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.quiz.title} - Q{self.order + 1}: {self.question_text[:50]}"
@@ -40,7 +70,165 @@ class QuizAttempt(models.Model):
     answers = models.JSONField(default=dict)  # {question_id: user_answer}
     score = models.PositiveIntegerField()
     total_questions = models.PositiveIntegerField()
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Set explicitly (not auto_now_add) so write-behind inserts keep the grading time
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Seed of a shuffled attempt; the question subset is recomputed from it
+    seed = models.BigIntegerField(null=True, blank=True, editable=False)
+    # Submitter, when authenticated (anonymous attempts stay anonymous).
+    # No database constraint: with sharding, attempts and users live apart.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='quiz_attempts', null=True, blank=True,
+        on_delete=models.SET_NULL, db_index=False, db_constraint=False,
+    )
+    # Compact encoding (QUIZ_ATTEMPT_ANSWER_ENCODING = 'packed'): answers is
+    # left empty and packed holds option indices against layout (see quiz.packing)
+    layout = models.ForeignKey(
+        'AnswerLayout', related_name='attempts', null=True, blank=True,
+        on_delete=models.CASCADE, db_index=False, editable=False,
+    )
+    packed = models.BinaryField(null=True, blank=True, editable=False)
+
+    objects = QuizScopedManager()
+
+    class Meta:
+        indexes = [
+            # Admin/analytics filtering by quiz and time range
+            models.Index(fields=['quiz', 'submitted_at'], name='attempt_quiz_submitted_idx'),
+            # Leaderboards: best score first, earliest submission breaks ties.
+            # total_questions is included so PostgreSQL can answer from the index.
+            models.Index(
+                fields=['quiz', '-score', 'submitted_at'],
+                include=['total_questions'],
+                name='attempt_leaderboard_idx',
+            ),
+            # A user's best attempt per quiz (also serves the user FK)
+            models.Index(fields=['user', 'quiz', '-score', 'submitted_at'], name='attempt_user_best_idx'),
+        ]
 
     def __str__(self):
         return f"{self.quiz.title} - Score: {self.score}/{self.total_questions}"
+
+
+class AnswerLayout(models.Model):
+    """
+    Immutable snapshot of a quiz's questions, options and correct answers that
+    packed attempts are encoded against. A new layout is created whenever the
+    quiz content changes, so old attempts keep decoding to what was submitted.
+    """
+    quiz = models.ForeignKey(Quiz, related_name='answer_layouts', on_delete=models.CASCADE)
+    digest = models.CharField(max_length=64)
+    question_ids = models.JSONField()
+    options = models.JSONField()
+    correct_answers = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = QuizScopedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'digest'], name='answer_layout_quiz_digest_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz_id} - Layout {self.pk}"
+
+
+class AttemptSeed(models.Model):
+    """
+    Seed issued when a student starts a shuffled attempt.
+    Question subset and option order are derived from it, never stored.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    quiz = models.ForeignKey(Quiz, related_name='attempt_seeds', on_delete=models.CASCADE)
+    seed = models.BigIntegerField(default=new_seed, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the attempt is submitted; a second submit is rejected
+    submitted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = QuizScopedManager()
+
+    def __str__(self):
+        return f"{self.quiz_id} - Seed {self.seed}"
+
+
+class AttemptDraft(models.Model):
+    """
+    Answers saved so far for a started attempt, written by the periodic draft
+    flush rather than on every save. Deleted when the attempt is submitted.
+    """
+    attempt = models.OneToOneField(AttemptSeed, primary_key=True, related_name='draft', on_delete=models.CASCADE)
+    answers = models.JSONField(default=dict)
+    updated_at = models.DateTimeField()
+
+    objects = QuizScopedManager(quiz_lookup='attempt__quiz_id')
+
+    def __str__(self):
+        return f"Draft {self.attempt_id}"
+
+
+class ScoreBucket(models.Model):
+    """
+    Number of attempts of a quiz with a given score, maintained at submit time.
+    A score's leaderboard rank is 1 + the attempts in higher buckets, so ranks
+    cost O(distinct scores) instead of a count over all attempts.
+    """
+    quiz = models.ForeignKey(Quiz, related_name='score_buckets', on_delete=models.CASCADE)
+    score = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    objects = QuizScopedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'score'], name='score_bucket_quiz_score_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz_id} - Score {self.score}: {self.count}"
+
+
+class QuizStats(models.Model):
+    """Running totals over all attempts of a quiz, maintained at submit time."""
+    quiz = models.OneToOneField(Quiz, related_name='stats', on_delete=models.CASCADE, primary_key=True)
+    attempt_count = models.PositiveIntegerField(default=0)
+    total_score = models.PositiveBigIntegerField(default=0)
+    total_possible = models.PositiveBigIntegerField(default=0)
+
+    objects = QuizScopedManager()
+
+    class Meta:
+        verbose_name_plural = "quiz stats"
+
+    def __str__(self):
+        return f"{self.quiz_id} - Attempts: {self.attempt_count}"
+
+
+class QuestionStats(models.Model):
+    """Per-question correct/incorrect counters, maintained at submit time."""
+    question = models.OneToOneField(Question, related_name='stats', on_delete=models.CASCADE, primary_key=True)
+    quiz = models.ForeignKey(Quiz, related_name='question_stats', on_delete=models.CASCADE)
+    correct_count = models.PositiveIntegerField(default=0)
+    incorrect_count = models.PositiveIntegerField(default=0)
+
+    objects = QuizScopedManager()
+
+    class Meta:
+        verbose_name_plural = "question stats"
+
+    def __str__(self):
+        return f"{self.question_id} - {self.correct_count}/{self.correct_count + self.incorrect_count}"
+
+
+class QuizShard(models.Model):
+    """
+    Lookup row naming the database that holds a quiz's attempts and other
+    per-quiz rows (see quiz.sharding). Kept in the default database.
+    """
+    quiz = models.OneToOneField(Quiz, related_name='shard', on_delete=models.CASCADE, primary_key=True)
+    alias = models.CharField(max_length=64)
+    # Set while move_quiz switches the quiz to another shard: writes are rejected
+    frozen_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quiz_id} - {self.alias}"
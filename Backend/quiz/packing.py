@@ -0,0 +1,284 @@
+"""
+Compact storage of QuizAttempt answers.
+
+With QUIZ_ATTEMPT_ANSWER_ENCODING = 'packed' new attempts leave the
+``answers`` JSON empty and store a few bytes in ``packed`` instead, encoded
+against an AnswerLayout (an immutable snapshot of the quiz's question ids,
+options and correct answers, shared by every attempt made while the quiz had
+that content):
+
+    version (1 byte) | correctness bitmap | one code byte per layout question
+    | literal answers | answers to question ids outside the layout
+
+A code is 0 for unanswered, i + 1 for option i, or 255 for an answer that is
+not one of the options (stored as a length-prefixed UTF-8 literal). Bit i of
+the bitmap says whether question i was answered correctly per the layout's
+key. The encoding is lossless, so ``stored_answers()`` decodes every attempt
+to the usual {question_id: answer} dict, and analytics that only need
+correctness can read the bitmap without decoding at all.
+"""
+import hashlib
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import LRUCache, VersionedQuizCache
+from .models import AnswerLayout, Question
+
+
+FORMAT_VERSION = 1
+NO_ANSWER = 0
+LITERAL = 255
+MAX_OPTIONS = LITERAL - 1
+
+# QuizAttempt columns needed to read answers in either encoding
+ANSWER_COLUMNS = ('answers', 'layout_id', 'packed')
+
+
+def write_varint(out, value):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def write_text(out, text):
+    encoded = text.encode('utf-8')
+    write_varint(out, len(encoded))
+    out += encoded
+
+
+def read_text(data, pos):
+    length, pos = read_varint(data, pos)
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+
+class Layout:
+    """Encoder/decoder for one AnswerLayout."""
+
+    def __init__(self, layout_id, question_ids, options, correct_answers):
+        self.id = layout_id
+        self.question_ids = list(question_ids)
+        self.keys = [str(question_id) for question_id in self.question_ids]
+        self.positions = {key: index for index, key in enumerate(self.keys)}
+        self.correct_answers = list(correct_answers)
+        self.symbols = [[None] + list(question_options[:MAX_OPTIONS]) for question_options in options]
+        self.codes = [
+            {option: code for code, option in enumerate(symbols) if code}
+            for symbols in self.symbols
+        ]
+        self.bitmap_size = (len(self.keys) + 7) // 8
+
+    @classmethod
+    def from_model(cls, layout):
+        return cls(layout.pk, layout.question_ids, layout.options, layout.correct_answers)
+
+    def encode(self, answers):
+        """
+        Pack a {question_id: answer} dict. Raises ValueError for answers that
+        aren't strings (they are kept as JSON instead).
+        """
+        bits = 0
+        codes = bytearray(len(self.keys))
+        literals = bytearray()
+        for index, (key, correct_answer, codebook) in enumerate(zip(self.keys, self.correct_answers, self.codes)):
+            answer = answers.get(key)
+            # Same rule as grading and the stats: unanswered counts as ''
+            if (answer if answer is not None else '') == correct_answer:
+                bits |= 1 << index
+            if answer is None:
+                continue
+            if not isinstance(answer, str):
+                raise ValueError(f'Cannot pack non-string answer for question {key}')
+            code = codebook.get(answer)
+            if code is None:
+                codes[index] = LITERAL
+                write_text(literals, answer)
+            else:
+                codes[index] = code
+
+        extras = [(key, answer) for key, answer in answers.items() if key not in self.positions]
+        out = bytearray([FORMAT_VERSION])
+        out += bits.to_bytes(self.bitmap_size, 'little')
+        out += codes
+        out += literals
+        write_varint(out, len(extras))
+        for key, answer in extras:
+            if not isinstance(key, str) or not isinstance(answer, str):
+                raise ValueError(f'Cannot pack non-string answer for question {key}')
+            write_text(out, key)
+            write_text(out, answer)
+        return bytes(out)
+
+    def decode(self, packed):
+        """Unpack to the {question_id: answer} dict that was encoded."""
+        packed = bytes(packed)
+        if packed[0] != FORMAT_VERSION:
+            raise ValueError(f'Unknown packed answers format {packed[0]}')
+        pos = 1 + self.bitmap_size
+        codes = packed[pos:pos + len(self.keys)]
+        pos += len(self.keys)
+        answers = {}
+        for key, code, symbols in zip(self.keys, codes, self.symbols):
+            if code == NO_ANSWER:
+                continue
+            if code == LITERAL:
+                answers[key], pos = read_text(packed, pos)
+            else:
+                answers[key] = symbols[code]
+        count, pos = read_varint(packed, pos)
+        for _ in range(count):
+            key, pos = read_text(packed, pos)
+            answers[key], pos = read_text(packed, pos)
+        return answers
+
+    def bitmap(self, packed):
+        return bytes(packed[1:1 + self.bitmap_size])
+
+    def agrees_with(self, correct_answers):
+        """
+        True when the bitmap is exact for a current {question_id: correct
+        answer} key: every current question is in this layout with the same
+        correct answer.
+        """
+        layout_key = dict(zip(self.question_ids, self.correct_answers))
+        return all(
+            question_id in layout_key and layout_key[question_id] == correct_answer
+            for question_id, correct_answer in correct_answers.items()
+        )
+
+    def count_correct(self, byte_counts):
+        """
+        Expand a Counter of (byte position, bitmap byte) -> attempts into
+        question_id -> attempts answering it correctly.
+        """
+        correct = Counter()
+        for (position, byte), count in byte_counts.items():
+            for bit in range(8):
+                if byte >> bit & 1:
+                    correct[self.question_ids[position * 8 + bit]] += count
+        return correct
+
+
+def layout_fields(questions):
+    """AnswerLayout field values for (id, options, correct_answer) rows in quiz order."""
+    question_ids = [question_id for question_id, _, _ in questions]
+    options = [list(question_options or []) for _, question_options, _ in questions]
+    correct_answers = [correct_answer for _, _, correct_answer in questions]
+    digest = hashlib.sha256(
+        json.dumps([question_ids, options, correct_answers], separators=(',', ':')).encode()
+    ).hexdigest()
+    return {'digest': digest, 'question_ids': question_ids, 'options': options, 'correct_answers': correct_answers}
+
+
+def save_layout(layout_model, question_model, quiz_id):
+    """Return the layout row for a quiz's current content, creating it if new."""
+    questions = (
+        question_model.objects.filter(quiz_id=quiz_id)
+        .order_by('order', 'id')
+        .values_list('id', 'options', 'correct_answer')
+    )
+    fields = layout_fields(list(questions))
+    layout, _ = layout_model.objects.get_or_create(
+        quiz_id=quiz_id, digest=fields.pop('digest'), defaults=fields
+    )
+    return layout
+
+
+def build_current_layout(quiz_id):
+    return Layout.from_model(save_layout(AnswerLayout, Question, quiz_id))
+
+
+# Layout of each quiz's current content, rebuilt when the quiz version is bumped
+current_layouts = VersionedQuizCache(
+    'answer-layout',
+    build_current_layout,
+    maxsize=getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_SIZE', 256),
+    timeout=getattr(settings, 'QUIZ_CACHE_TIMEOUT', 3600),
+)
+
+# Layouts never change once written, so they are cached by id without versioning
+layouts = LRUCache(maxsize=1024)
+
+
+def get_layout(layout_id):
+    layout = layouts.get(layout_id)
+    if layout is None:
+        layout = Layout.from_model(AnswerLayout.objects.get(pk=layout_id))
+        layouts.set(layout_id, layout)
+    return layout
+
+
+def attempt_answer_fields(quiz_id, answers):
+    """QuizAttempt field values storing ``answers`` in the configured encoding."""
+    if settings.QUIZ_ATTEMPT_ANSWER_ENCODING == 'packed':
+        layout = current_layouts.get(quiz_id)
+        try:
+            return {'answers': {}, 'layout_id': layout.id, 'packed': layout.encode(answers)}
+        except ValueError:
+            pass
+    return {'answers': answers, 'layout_id': None, 'packed': None}
+
+
+def stored_answers(answers, layout_id, packed):
+    """Decode the ANSWER_COLUMNS of an attempt to a {question_id: answer} dict."""
+    if packed is None:
+        return answers
+    return get_layout(layout_id).decode(packed)
+
+
+def convert_attempts(attempt_model, layout_model, question_model, pack=True, batch_size=2000, quiz_ids=None):
+    """
+    Re-encode stored attempts in primary-key batches: JSON to packed, or back
+    with ``pack=False``. Returns the number of attempts converted. Migration
+    0010 carries its own copy, so changes here do not affect it.
+    """
+    attempts = attempt_model.objects.filter(packed__isnull=pack)
+    if quiz_ids:
+        attempts = attempts.filter(quiz_id__in=quiz_ids)
+    current = {}
+    decoders = {}
+    converted = 0
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if not batch:
+            return converted
+        last_id = batch[-1].pk
+        changed = []
+        for attempt in batch:
+            if pack:
+                if attempt.quiz_id not in current:
+                    current[attempt.quiz_id] = Layout.from_model(
+                        save_layout(layout_model, question_model, attempt.quiz_id)
+                    )
+                layout = current[attempt.quiz_id]
+                try:
+                    attempt.packed = layout.encode(attempt.answers)
+                except ValueError:
+                    continue
+                attempt.layout_id = layout.id
+                attempt.answers = {}
+            else:
+                if attempt.layout_id not in decoders:
+                    decoders[attempt.layout_id] = Layout.from_model(layout_model.objects.get(pk=attempt.layout_id))
+                attempt.answers = decoders[attempt.layout_id].decode(attempt.packed)
+                attempt.layout_id = None
+                attempt.packed = None
+            changed.append(attempt)
+        with transaction.atomic():
+            attempt_model.objects.bulk_update(changed, ['answers', 'layout', 'packed'])
+        converted += len(changed)
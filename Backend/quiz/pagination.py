@@ -0,0 +1,82 @@
+"""
+Keyset pagination for quiz listings.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pagination on (created_at, id).
+
+    The cursor holds the (created_at, id) of the last row of the previous page
+    and the next page is fetched with a ``WHERE (created_at, id) < cursor``
+    condition, so every page costs the same index range scan no matter how deep
+    it is (unlike OFFSET). Pagination is forward-only.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.QUIZ_LIST_PAGE_SIZE
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            created_at = None
+        if created_at is None:
+            raise NotFound('Invalid cursor')
+        return created_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # The redundant created_at <= bound lets the index seek straight to
+            # the cursor; the OR alone makes some planners scan from the top
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+
+        # Fetch one extra row to learn whether a next page exists
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
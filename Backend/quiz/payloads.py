@@ -0,0 +1,70 @@
+"""
+Pre-rendered quiz payloads for GET /api/quizzes/{id}/.
+
+Published quizzes rarely change, so the QuizSerializer output is rendered to
+JSON once per quiz version and served from cache with a strong ETag.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework.renderers import JSONRenderer
+
+from .cache import VersionedQuizCache
+from .metrics import span
+from .models import Quiz
+from .serializers import QuizSerializer
+
+
+@dataclass(frozen=True, slots=True)
+class QuizPayload:
+    """Rendered QuizSerializer output for one quiz version."""
+    data: dict
+    content: bytes
+    etag: str
+
+
+def render_quiz_payload(quiz_id):
+    """Serialize and render a quiz. Raises Http404 for unknown quizzes."""
+    quiz = get_object_or_404(Quiz.objects.prefetch_related('questions'), pk=quiz_id)
+    return build_quiz_payload(quiz)
+
+
+async def arender_quiz_payload(quiz_id):
+    """Async variant of render_quiz_payload() using the async ORM."""
+    try:
+        quiz = await Quiz.objects.prefetch_related('questions').aget(pk=quiz_id)
+    except Quiz.DoesNotExist:
+        raise Http404('No Quiz matches the given query.')
+    return build_quiz_payload(quiz)
+
+
+def build_quiz_payload(quiz):
+    """Render a quiz whose questions are already prefetched."""
+    with span('serializer'):
+        content = JSONRenderer().render(QuizSerializer(quiz).data)
+    etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+    # Keep a plain-dict copy for Response.data; it pickles cleanly into the cache
+    return QuizPayload(data=json.loads(content), content=content, etag=etag)
+
+
+quiz_payloads = VersionedQuizCache(
+    'payload',
+    render_quiz_payload,
+    maxsize=getattr(settings, 'QUIZ_PAYLOAD_CACHE_SIZE', 256),
+    timeout=getattr(settings, 'QUIZ_CACHE_TIMEOUT', 3600),
+    abuilder=arender_quiz_payload,
+)
+
+
+def get_quiz_payload(quiz_id):
+    """Return the cached QuizPayload for a quiz, rendering it on a miss."""
+    return quiz_payloads.get(quiz_id)
+
+
+async def aget_quiz_payload(quiz_id):
+    """Async variant of get_quiz_payload()."""
+    return await quiz_payloads.aget(quiz_id)
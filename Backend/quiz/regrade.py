@@ -0,0 +1,223 @@
+"""
+Bulk regrading of stored attempts against a quiz's current answer key.
+
+After an author corrects a ``Question.correct_answer`` the scores already
+stored in QuizAttempt are stale. ``regrade_quiz`` walks a quiz's attempts in
+primary-key chunks and grades each chunk as an answer matrix: one column per
+key question, built and compared against the correct answer with C-level
+``map(operator.eq, ...)`` calls, so there is no per-cell Python bytecode.
+Row sums are the new scores and column sums the per-question stats, so
+the counters are corrected without a second scan. Only rows whose grade
+changed are written, with one UPDATE per distinct (score, total_questions)
+pair per chunk. With ``workers`` > 1 the primary-key range is split across a
+process pool.
+
+Counters and score buckets are corrected with F() deltas rather than
+rewritten, so attempts stored while the regrade runs keep their increments.
+Score totals and buckets move by each row's new grade minus its old one. The
+per-question counters move by the regraded counts minus the counters read
+together with the id bound, since the per-question results an attempt was
+first counted with are not stored.
+
+Attempts of quizzes that draw ``questions_per_attempt`` questions are graded
+row by row on the subset their stored seed selects from the current question
+set, and count towards the stats of those questions only.
+"""
+import operator
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+
+from django.db import connections
+from django.db.models import Max, Min
+
+from .grading import compile_answer_key
+from .leaderboard import apply_scores
+from .models import QuestionStats, QuizAttempt, QuizStats
+from .packing import ANSWER_COLUMNS, stored_answers
+from .sharding import current_shard, on_quiz_shard, shard_atomic, use_shard
+from .stats import apply_stats, ensure_stats_rows
+
+
+@dataclass
+class RegradeResult:
+    attempts: int = 0
+    changed: int = 0
+    total_score: int = 0
+    total_possible: int = 0
+    # The same totals as stored before the regrade
+    old_score: int = 0
+    old_possible: int = 0
+    # question_id -> attempts answering it correctly / attempts shown it
+    correct: Counter = field(default_factory=Counter)
+    shown: Counter = field(default_factory=Counter)
+    # score -> change in the number of attempts with that score
+    moved: Counter = field(default_factory=Counter)
+
+    def add(self, other):
+        self.attempts += other.attempts
+        self.changed += other.changed
+        self.total_score += other.total_score
+        self.total_possible += other.total_possible
+        self.old_score += other.old_score
+        self.old_possible += other.old_possible
+        self.correct.update(other.correct)
+        self.shown.update(other.shown)
+        self.moved.update(other.moved)
+
+
+class Regrader:
+    """Grades attempts of one quiz with the key compiled from the database."""
+
+    def __init__(self, answer_key):
+        self.answer_key = answer_key
+        self.question_ids = [question_id for question_id, *_ in answer_key.entries]
+        self.keys = [str(question_id) for question_id in self.question_ids]
+        self.correct_answers = [correct_answer for _, _, correct_answer, _ in answer_key.entries]
+        # Only subset quizzes depend on the seed; shuffled order doesn't change scores
+        self.seeded = answer_key.questions_per_attempt is not None
+        self.result = RegradeResult()
+
+    def grade_seeded(self, answers, seed):
+        """Grade one attempt on the questions its seed selected, counting only those."""
+        entries = self.answer_key.for_seed(seed).entries if seed is not None else self.answer_key.entries
+        score = 0
+        for question_id, _, correct_answer, _ in entries:
+            is_correct = answers.get(str(question_id), '') == correct_answer
+            score += is_correct
+            self.result.correct[question_id] += is_correct
+            self.result.shown[question_id] += 1
+        return score, len(entries)
+
+    def grade_chunk(self, rows):
+        """
+        Grade (id, answers, seed, score, total_questions) rows and return
+        {(score, total_questions): [ids]} for the rows whose grade changed.
+        """
+        ids, answers, seeds, old_scores, old_totals = zip(*rows)
+        if self.seeded:
+            # Each attempt saw its own subset, so there is no shared answer matrix
+            grades = list(map(self.grade_seeded, answers, seeds))
+        else:
+            # The answer matrix, one column per key question: True where the attempt is correct
+            columns = [
+                list(map(operator.eq, map(dict.get, answers, repeat(key), repeat('')), repeat(correct_answer)))
+                for key, correct_answer in zip(self.keys, self.correct_answers)
+            ]
+            for question_id, column in zip(self.question_ids, columns):
+                self.result.correct[question_id] += sum(column)
+                self.result.shown[question_id] += len(rows)
+            scores = map(sum, zip(*columns)) if columns else repeat(0)
+            grades = zip(scores, repeat(len(columns)))
+
+        changed = defaultdict(list)
+        for attempt_id, old_score, old_total, (score, total) in zip(ids, old_scores, old_totals, grades):
+            self.result.total_score += score
+            self.result.total_possible += total
+            self.result.old_score += old_score
+            self.result.old_possible += old_total
+            if score != old_score or total != old_total:
+                changed[score, total].append(attempt_id)
+                self.result.moved[score] += 1
+                self.result.moved[old_score] -= 1
+        return changed
+
+    def regrade_range(self, start_id, end_id, chunk_size):
+        """Regrade attempts with start_id <= id <= end_id, ``chunk_size`` at a time."""
+        attempts = QuizAttempt.objects.filter(quiz_id=self.answer_key.quiz_id, id__lte=end_id)
+        last_id = start_id - 1
+        while True:
+            rows = list(
+                attempts.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'seed', 'score', 'total_questions', *ANSWER_COLUMNS)[:chunk_size]
+            )
+            if not rows:
+                return self.result
+            last_id = rows[-1][0]
+            rows = [
+                (attempt_id, stored_answers(*stored), seed, score, total_questions)
+                for attempt_id, seed, score, total_questions, *stored in rows
+            ]
+            changed = self.grade_chunk(rows)
+            with shard_atomic():
+                for (score, total_questions), ids in changed.items():
+                    QuizAttempt.objects.filter(pk__in=ids).update(score=score, total_questions=total_questions)
+            self.result.attempts += len(rows)
+            self.result.changed += sum(len(ids) for ids in changed.values())
+
+
+def split_range(start_id, end_id, parts):
+    """Split [start_id, end_id] into up to ``parts`` contiguous inclusive ranges."""
+    step = max(1, -(-(end_id - start_id + 1) // parts))
+    return [(low, min(low + step - 1, end_id)) for low in range(start_id, end_id + 1, step)]
+
+
+def _regrade_worker(answer_key, start_id, end_id, chunk_size, shard):
+    # Each process opens its own connections instead of sharing the parent's sockets
+    connections.close_all()
+    try:
+        with use_shard(shard):
+            return Regrader(answer_key).regrade_range(start_id, end_id, chunk_size)
+    finally:
+        connections.close_all()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+@on_quiz_shard
+def regrade_quiz(quiz_id, chunk_size=2000, workers=1):
+    """
+    Regrade every stored attempt of a quiz against its current answer key and
+    correct its stats and leaderboard. Returns a RegradeResult. Raises Http404
+    for unknown quizzes.
+    """
+    answer_key = compile_answer_key(quiz_id)
+    ensure_stats_rows(quiz_id)
+    with shard_atomic():
+        # Submits count attempts under this row lock before inserting them, so
+        # the counters read here cover exactly the attempts up to the bound
+        list(QuizStats.objects.select_for_update().filter(quiz_id=quiz_id))
+        bounds = QuizAttempt.objects.filter(quiz_id=quiz_id).aggregate(low=Min('id'), high=Max('id'))
+        counted = {
+            question_id: (correct, incorrect)
+            for question_id, correct, incorrect in QuestionStats.objects.filter(quiz_id=quiz_id)
+            .values_list('question_id', 'correct_count', 'incorrect_count')
+        }
+    result = RegradeResult()
+    if bounds['low'] is None:
+        return result
+
+    if workers > 1:
+        # Several ranges per worker keep the pool busy when ids are unevenly spread
+        ranges = split_range(bounds['low'], bounds['high'], workers * 4)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(_regrade_worker, answer_key, low, high, chunk_size, current_shard())
+                for low, high in ranges
+            ]
+            for future in futures:
+                result.add(future.result())
+    else:
+        result = Regrader(answer_key).regrade_range(bounds['low'], bounds['high'], chunk_size)
+
+    # The grading pass counted everything the stats need, so no second scan.
+    # Per-question counters can move even when no score does.
+    correct = Counter()
+    incorrect = Counter()
+    for question_id, *_ in answer_key.entries:
+        old_correct, old_incorrect = counted.get(question_id, (0, 0))
+        correct[question_id] = result.correct[question_id] - old_correct
+        incorrect[question_id] = result.shown[question_id] - result.correct[question_id] - old_incorrect
+    with shard_atomic():
+        apply_stats(
+            quiz_id, 0, result.total_score - result.old_score, result.total_possible - result.old_possible,
+            correct, incorrect,
+        )
+        apply_scores(quiz_id, result.moved)
+    return result
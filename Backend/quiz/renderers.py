@@ -0,0 +1,47 @@
+"""
+Additional renderers for the quiz API.
+"""
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render a list as newline-delimited JSON (one compact object per line)."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(encode_ndjson_line(item) for item in items)
+
+
+def encode_ndjson_line(item):
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode() + b'\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Render a dict or list of flat dicts as CSV.
+    Streaming exports bypass it; it is used for error responses and negotiation.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
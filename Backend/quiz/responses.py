@@ -0,0 +1,28 @@
+"""
+Response classes for payloads rendered ahead of time.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+class PrerenderedResponse(Response):
+    """
+    DRF Response that carries JSON bytes rendered ahead of time.
+
+    When content negotiation picks plain JSON the stored bytes are sent as-is;
+    other media types (e.g. the browsable API or ``indent=``) fall back to
+    rendering ``data`` as usual.
+    """
+
+    def __init__(self, data, content, **kwargs):
+        super().__init__(data, **kwargs)
+        self.prerendered_content = content
+
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, 'accepted_renderer', None)
+        accepted_media_type = getattr(self, 'accepted_media_type', None) or ''
+        if type(renderer) is JSONRenderer and 'indent' not in accepted_media_type:
+            self['Content-Type'] = self.content_type or renderer.media_type
+            return self.prerendered_content
+        return super().rendered_content
@@ -0,0 +1,151 @@
+"""
+Read-replica database routing.
+
+When DATABASE_REPLICA_URL adds a 'replica' alias to settings.DATABASES, GET
+and HEAD requests to views marked with ``replica_reads`` read from it (quiz
+detail, listing, stats and leaderboard). Everything else uses the primary:
+
+- every write goes to the primary, and once a request has written (or run a
+  get_or_create / select_for_update) its later reads go there too;
+- a response to a request that wrote sets a cookie that keeps the client's
+  reads on the primary for QUIZ_REPLICA_LAG_TOLERANCE seconds, so a client
+  sees its own writes (a started attempt, a created quiz) on the next request;
+- for QUIZ_REPLICA_LAG_TOLERANCE seconds after a quiz's content changes, its
+  versioned caches are rebuilt from the primary, so a lagging replica can't
+  store old questions under the new version token.
+
+Queries outside a request (management commands, the write-behind and draft
+flushers, tests using the ORM directly) always use the primary.
+"""
+import math
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA = 'replica'
+PIN_COOKIE = 'quiz_db_primary'
+WRITTEN_KEY = 'quiz:{quiz_id}:written'
+
+
+class RoutingState:
+    """Per-request routing decisions, shared by the threads serving the request."""
+
+    def __init__(self, pinned=False):
+        self.replica_reads = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing = ContextVar('quiz_db_routing', default=None)
+
+
+def replica_configured():
+    return REPLICA in connections
+
+
+def replica_reads(view):
+    """Mark a view function or class whose GET/HEAD reads may use the replica."""
+    view.replica_reads = True
+    return view
+
+
+def lag_tolerance():
+    # Whole seconds: cookie max-age and memcached timeouts are integers
+    return math.ceil(settings.QUIZ_REPLICA_LAG_TOLERANCE)
+
+
+def mark_quiz_written(quiz_id):
+    """Keep reads of a quiz's derived data on the primary until the replica catches up."""
+    if replica_configured() and lag_tolerance() > 0:
+        cache.set(WRITTEN_KEY.format(quiz_id=quiz_id), True, timeout=lag_tolerance())
+
+
+def pin_if_recently_written(quiz_id):
+    state = _routing.get()
+    if state is not None and state.replica_reads and not state.pinned:
+        if cache.get(WRITTEN_KEY.format(quiz_id=quiz_id)):
+            state.pinned = True
+
+
+async def apin_if_recently_written(quiz_id):
+    """Async variant of pin_if_recently_written()."""
+    state = _routing.get()
+    if state is not None and state.replica_reads and not state.pinned:
+        if await cache.aget(WRITTEN_KEY.format(quiz_id=quiz_id)):
+            state.pinned = True
+
+
+class ReplicaRouter:
+    """Routes reads of replica_reads views to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is not None and state.replica_reads and not state.pinned and replica_configured():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Read-after-write: the rest of the request stays on the primary
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Give each request its RoutingState: pinned to the primary if the client
+    wrote recently, reading from the replica if the view allows it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return None
+        # DRF views expose their class as .cls, Django class-based views as .view_class
+        view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+        if getattr(view, 'replica_reads', False):
+            state.replica_reads = True
+        return None
+
+    def finish(self, state, response):
+        if state.wrote and replica_configured() and lag_tolerance() > 0:
+            response.set_cookie(PIN_COOKIE, '1', max_age=lag_tolerance(), httponly=True, samesite='Lax')
+        return response
@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from .models import Quiz, Question, QuizAttempt
+from .cache import bump_quiz_version
+from .models import Quiz, Question, QuizAttempt, QuizStats, QuestionStats
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -37,6 +40,31 @@ class QuizSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class QuizSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializer for quiz listings.
+    Expects question_count to be annotated on the queryset; no nested questions.
+    """
+    question_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Quiz
+        fields = ['id', 'title', 'question_count', 'created_at']
+
+
+def validate_question_options(question, position):
+    """
+    Require at least 2 options for MCQ questions.
+    Shared by QuizCreateSerializer and the question bank importer.
+    """
+    if question.get('question_type') == 'mcq':
+        options = question.get('options', [])
+        if len(options) < 2:
+            raise serializers.ValidationError(
+                f"Question {position}: MCQ questions must have at least 2 options."
+            )
+
+
 class QuizCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating quiz with nested questions.
@@ -46,33 +74,50 @@ class QuizCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Quiz
-        fields = ['id', 'title', 'created_at', 'questions']
+        fields = [
+            'id', 'title', 'created_at', 'questions',
+            'questions_per_attempt', 'shuffle_questions', 'shuffle_options',
+        ]
         read_only_fields = ['id', 'created_at']
 
+    def validate(self, attrs):
+        """Validate that a per-attempt subset fits in the question bank."""
+        per_attempt = attrs.get('questions_per_attempt')
+        if per_attempt is not None and not 1 <= per_attempt <= len(attrs.get('questions', [])):
+            raise serializers.ValidationError({
+                'questions_per_attempt': 'Must be between 1 and the number of questions.'
+            })
+        return attrs
+
     def validate_questions(self, value):
         """Validate that at least one question exists and MCQ has minimum 2 options."""
         if not value:
             raise serializers.ValidationError("At least one question is required.")
         
         for i, question in enumerate(value):
-            if question.get('question_type') == 'mcq':
-                options = question.get('options', [])
-                if len(options) < 2:
-                    raise serializers.ValidationError(
-                        f"Question {i + 1}: MCQ questions must have at least 2 options."
-                    )
+            validate_question_options(question, i + 1)
         return value
 
     def create(self, validated_data):
-        """Create quiz with nested questions."""
+        """
+        Create quiz with nested questions.
+        Questions are inserted with bulk_create inside one transaction, so the
+        number of queries does not grow with the number of questions.
+        """
         questions_data = validated_data.pop('questions')
-        quiz = Quiz.objects.create(**validated_data)
-        
-        for order, question_data in enumerate(questions_data):
-            # Remove 'order' from question_data if present to avoid duplicate keyword argument
-            question_data.pop('order', None)
-            Question.objects.create(quiz=quiz, order=order, **question_data)
-        
+        batch_size = getattr(settings, 'QUIZ_QUESTION_BULK_BATCH_SIZE', None)
+
+        with transaction.atomic():
+            quiz = Quiz.objects.create(**validated_data)
+            questions = []
+            for order, question_data in enumerate(questions_data):
+                # Remove 'order' from question_data if present to avoid duplicate keyword argument
+                question_data.pop('order', None)
+                questions.append(Question(quiz=quiz, order=order, **question_data))
+            Question.objects.bulk_create(questions, batch_size=batch_size)
+            # bulk_create skips post_save signals, so invalidate explicitly
+            transaction.on_commit(lambda: bump_quiz_version(quiz.pk))
+
         return quiz
 
 
@@ -80,11 +125,14 @@ class AnswerSubmissionSerializer(serializers.Serializer):
     """
     Serializer to validate submitted answers.
     Expects answers as a dictionary: {question_id: user_answer}
+    and, for shuffled attempts, the attempt id.
     """
     answers = serializers.DictField(
         child=serializers.CharField(allow_blank=True),
         required=True
     )
+    # Returned by POST /api/quizzes/{id}/start/ for shuffled quizzes
+    attempt = serializers.UUIDField(required=False)
 
     def validate_answers(self, value):
         """Validate that answers is a dictionary with string keys."""
@@ -93,6 +141,41 @@ class AnswerSubmissionSerializer(serializers.Serializer):
         return value
 
 
+class AttemptSubmissionSerializer(AnswerSubmissionSerializer):
+    """
+    Serializer for single submissions.
+    Answers may be left out when an attempt is given: its saved draft is graded,
+    with any answers sent alongside taking precedence.
+    """
+    answers = serializers.DictField(
+        child=serializers.CharField(allow_blank=True),
+        required=False
+    )
+
+    def validate(self, attrs):
+        if 'answers' not in attrs and 'attempt' not in attrs:
+            raise serializers.ValidationError({'answers': [self.fields['answers'].error_messages['required']]})
+        return attrs
+
+
+class DraftSerializer(serializers.Serializer):
+    """
+    Serializer for draft saves: {question_id: user_answer} of the changed
+    answers only; null clears a saved answer.
+    """
+    answers = serializers.DictField(
+        child=serializers.CharField(allow_blank=True, allow_null=True),
+        required=True
+    )
+
+
+class ArchiveRangeSerializer(serializers.Serializer):
+    """Query parameters selecting archived attempts: since <= submitted_at < until."""
+    archived = serializers.BooleanField(default=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+
 class QuestionResultSerializer(serializers.Serializer):
     """Serializer for individual question results."""
     question_id = serializers.IntegerField()
@@ -111,3 +194,52 @@ class QuizResultSerializer(serializers.Serializer):
     total_questions = serializers.IntegerField()
     percentage = serializers.FloatField()
     results = QuestionResultSerializer(many=True)
+
+
+class QuestionStatsSerializer(serializers.ModelSerializer):
+    """Serializer for per-question correctness counters."""
+    question_id = serializers.IntegerField()
+    question_text = serializers.CharField(source='question.question_text')
+    order = serializers.IntegerField(source='question.order')
+
+    class Meta:
+        model = QuestionStats
+        fields = ['question_id', 'question_text', 'order', 'correct_count', 'incorrect_count']
+
+
+class QuizStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for aggregated quiz statistics.
+    Averages are derived from the running totals.
+    """
+    quiz_id = serializers.IntegerField()
+    average_score = serializers.SerializerMethodField()
+    average_percentage = serializers.SerializerMethodField()
+    questions = QuestionStatsSerializer(source='quiz.question_stats', many=True)
+
+    class Meta:
+        model = QuizStats
+        fields = ['quiz_id', 'attempt_count', 'average_score', 'average_percentage', 'questions']
+
+    def get_average_score(self, obj):
+        return obj.total_score / obj.attempt_count if obj.attempt_count else 0.0
+
+    def get_average_percentage(self, obj):
+        return obj.total_score / obj.total_possible * 100 if obj.total_possible else 0.0
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    """Serializer for one ranked attempt (username is null for anonymous attempts)."""
+    rank = serializers.IntegerField()
+    username = serializers.CharField(allow_null=True)
+    score = serializers.IntegerField()
+    total_questions = serializers.IntegerField()
+    submitted_at = serializers.DateTimeField()
+
+
+class LeaderboardSerializer(serializers.Serializer):
+    """Serializer for a quiz leaderboard with the requesting user's best entry."""
+    quiz_id = serializers.IntegerField()
+    attempt_count = serializers.IntegerField()
+    top = LeaderboardEntrySerializer(many=True)
+    me = LeaderboardEntrySerializer(allow_null=True)
@@ -0,0 +1,475 @@
+"""
+Sharding of per-quiz data by quiz id.
+
+With QUIZ_SHARDS set (DATABASE_SHARD_URLS adds the shard1..N aliases), the
+rows that grow with traffic -- attempts, attempt seeds and drafts, answer
+layouts, score buckets and stats counters (SHARDED_MODELS) -- live on one
+database per quiz. A quiz's shard is its QuizShard lookup row (written when
+the quiz is created or moved), else a stable crc32 hash of its id over
+QUIZ_SHARDS. The lookup row is cached in Django's cache for only
+QUIZ_SHARD_LOOKUP_TIMEOUT seconds, so every process sees a move shortly after
+it is recorded even when the cache is process-local.
+
+Quiz and Question rows stay in the default database, which remains the
+catalog (listing, id allocation, content caches). Each shard holds a mirror
+of its quizzes and questions, synced after every content change commits, so
+foreign keys, cascades and stats joins work within the shard.
+
+Queries are routed by ShardRouter: inside ``quiz_shard(quiz_id)`` (entered by
+ShardRoutingMiddleware for /api/quizzes/<pk>/... views, and by the per-quiz
+entry points such as record_attempts and rebuild_quiz_stats) sharded models
+use that quiz's shard. ``Model.objects.for_quiz(quiz_id)`` picks the shard
+explicitly for code that runs outside such a block (streamed exports).
+
+``move_quiz`` rebalances a quiz online: it copies the quiz's rows to the new
+shard while it stays writable, then rejects writes to it for a moment (503)
+while it copies the rest and flips the lookup row, and finally deletes the
+old copy in batches. The freeze is stored on the lookup row, and the move
+waits out the lookup cache timeout before relying on it. Each shard
+allocates ids above QUIZ_SHARD_ID_FLOORS so rows keep their ids when they
+move.
+"""
+import functools
+import logging
+import time
+import zlib
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEY = 'quiz:{quiz_id}:shard'
+# Upper bound on a move's write freeze, should the move die before lifting it
+FREEZE_TIMEOUT = 600
+
+# Per-quiz rows stored on the quiz's shard
+SHARDED_MODELS = {
+    'quiz.quizattempt', 'quiz.attemptseed', 'quiz.attemptdraft', 'quiz.answerlayout',
+    'quiz.scorebucket', 'quiz.quizstats', 'quiz.questionstats',
+}
+# Sharded tables with auto-increment ids (see reserve_id_range)
+ID_SEQUENCE_MODELS = ('quizattempt', 'answerlayout', 'scorebucket')
+
+
+def sharding_enabled():
+    return bool(settings.QUIZ_SHARDS)
+
+
+def hash_shard(quiz_id):
+    """Shard of a quiz without a lookup row: stable across processes and restarts."""
+    shards = settings.QUIZ_SHARDS
+    return shards[zlib.crc32(str(quiz_id).encode()) % len(shards)]
+
+
+def shard_placement(quiz_id):
+    """(alias, frozen_until) of a quiz's lookup row, cached for QUIZ_SHARD_LOOKUP_TIMEOUT."""
+    key = SHARD_KEY.format(quiz_id=quiz_id)
+    placement = cache.get(key)
+    if placement is None:
+        from .models import QuizShard
+
+        # Always the primary: a lagging replica could predate a move
+        placement = (
+            QuizShard.objects.using(DEFAULT_DB_ALIAS).filter(quiz_id=quiz_id)
+            .values_list('alias', 'frozen_until').first()
+        ) or (hash_shard(quiz_id), None)
+        cache.set(key, placement, settings.QUIZ_SHARD_LOOKUP_TIMEOUT)
+    return placement
+
+
+def shard_for_quiz(quiz_id):
+    """Database alias holding a quiz's sharded rows."""
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    return shard_placement(quiz_id)[0]
+
+
+_current_shard = ContextVar('quiz_shard', default=None)
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias):
+    """Route sharded models to ``alias`` inside the block."""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def quiz_shard(quiz_id):
+    """Route sharded models to ``quiz_id``'s shard inside the block."""
+    if not sharding_enabled():
+        return nullcontext(DEFAULT_DB_ALIAS)
+    return use_shard(shard_for_quiz(quiz_id))
+
+
+def on_quiz_shard(func):
+    """Run ``func(quiz_id, ...)`` inside quiz_shard(quiz_id)."""
+    @functools.wraps(func)
+    def wrapper(quiz_id, *args, **kwargs):
+        with quiz_shard(quiz_id):
+            return func(quiz_id, *args, **kwargs)
+    return wrapper
+
+
+def shard_atomic():
+    """transaction.atomic() on the database the current sharded writes go to."""
+    from .models import QuizAttempt
+
+    return transaction.atomic(using=router.db_for_write(QuizAttempt))
+
+
+class QuizScopedManager(models.Manager):
+    """Manager of a sharded model; ``for_quiz()`` reads one quiz's rows from its shard."""
+
+    def __init__(self, quiz_lookup='quiz_id'):
+        super().__init__()
+        self.quiz_lookup = quiz_lookup
+
+    def for_quiz(self, quiz_id):
+        queryset = self.db_manager(shard_for_quiz(quiz_id)) if sharding_enabled() else self
+        return queryset.filter(**{self.quiz_lookup: quiz_id})
+
+
+class ShardRouter:
+    """Routes SHARDED_MODELS to the current quiz's shard; defers everything else."""
+
+    def _route(self, model, hints):
+        if not sharding_enabled() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        alias = _current_shard.get()
+        if alias is not None:
+            return alias
+        instance = hints.get('instance')
+        if instance is not None:
+            # Rows loaded from a shard are saved back to it
+            if instance._state.db is not None:
+                return instance._state.db
+            quiz_id = getattr(instance, 'quiz_id', None)
+            if quiz_id is not None:
+                return shard_for_quiz(quiz_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Shards mirror the catalog rows their quizzes point to
+        return True if sharding_enabled() else None
+
+
+def is_frozen(quiz_id):
+    """Whether move_quiz is switching the quiz to another shard."""
+    if not sharding_enabled():
+        return False
+    frozen_until = shard_placement(quiz_id)[1]
+    return frozen_until is not None and frozen_until > timezone.now()
+
+
+class ShardRoutingMiddleware:
+    """
+    Run views that take a quiz ``pk`` inside quiz_shard(pk), and answer 503
+    to writes of a quiz that move_quiz is switching to another shard.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _current_shard.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_shard.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_shard.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_shard.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not sharding_enabled():
+            return None
+        view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+        if not getattr(view, 'quiz_sharded', False) or 'pk' not in view_kwargs:
+            return None
+        quiz_id = view_kwargs['pk']
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and is_frozen(quiz_id):
+            response = JsonResponse({'detail': 'This quiz is being moved; retry shortly.'}, status=503)
+            response['Retry-After'] = '1'
+            return response
+        _current_shard.set(shard_for_quiz(quiz_id))
+        return None
+
+
+def quiz_sharded(view):
+    """Mark a view function taking a quiz ``pk`` as running on that quiz's shard."""
+    view.quiz_sharded = True
+    return view
+
+
+# Catalog mirrors
+
+def _upsert(model, alias, objs):
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    model.objects.using(alias).bulk_create(
+        objs, update_conflicts=True, unique_fields=[model._meta.pk.name], update_fields=fields,
+    )
+
+
+def copy_quiz_content(quiz_id, alias):
+    """Make ``alias``'s mirror of a quiz and its questions match the catalog."""
+    from .models import Question, QuestionStats, Quiz
+
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    quiz = Quiz.objects.using(DEFAULT_DB_ALIAS).filter(pk=quiz_id).first()
+    with transaction.atomic(using=alias):
+        if quiz is None:
+            # Deleted from the catalog: the cascade removes the quiz's sharded rows too
+            Quiz.objects.using(alias).filter(pk=quiz_id).delete()
+            return
+        questions = list(Question.objects.using(DEFAULT_DB_ALIAS).filter(quiz_id=quiz_id))
+        _upsert(Quiz, alias, [quiz])
+        Question.objects.using(alias).filter(quiz_id=quiz_id).exclude(
+            pk__in=[question.pk for question in questions]
+        ).delete()
+        _upsert(Question, alias, questions)
+        # New questions get counters here (the post_save signal only covers unsharded setups)
+        QuestionStats.objects.using(alias).bulk_create(
+            [QuestionStats(question_id=question.pk, quiz_id=quiz_id) for question in questions],
+            ignore_conflicts=True,
+        )
+
+
+def place_quiz(quiz_id):
+    """Give a quiz a lookup row (its hash shard) unless it has one, and return its shard."""
+    from .models import QuizShard
+
+    shard, _ = QuizShard.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+        quiz_id=quiz_id, defaults={'alias': hash_shard(quiz_id)}
+    )
+    cache.set(SHARD_KEY.format(quiz_id=quiz_id), (shard.alias, shard.frozen_until),
+              settings.QUIZ_SHARD_LOOKUP_TIMEOUT)
+    return shard.alias
+
+
+def sync_quiz_content(quiz_id, alias=None):
+    """
+    Propagate a committed catalog change of a quiz to its shard. ``alias``
+    names the shard of a deleted quiz, whose lookup row is gone.
+    """
+    from .models import Quiz
+
+    if not sharding_enabled():
+        return
+    if Quiz.objects.using(DEFAULT_DB_ALIAS).filter(pk=quiz_id).exists():
+        alias = place_quiz(quiz_id)
+    else:
+        alias = alias or shard_for_quiz(quiz_id)
+        cache.delete(SHARD_KEY.format(quiz_id=quiz_id))
+    copy_quiz_content(quiz_id, alias)
+
+
+def schedule_content_sync(quiz_id, alias=None):
+    """Sync a quiz's shard mirror once the current catalog transaction commits."""
+    if sharding_enabled():
+        transaction.on_commit(lambda: sync_quiz_content(quiz_id, alias), using=DEFAULT_DB_ALIAS)
+
+
+def reserve_id_range(alias):
+    """Start a shard's id sequences at its QUIZ_SHARD_ID_FLOORS entry."""
+    from django.apps import apps
+
+    floor = settings.QUIZ_SHARD_ID_FLOORS.get(alias)
+    if not floor:
+        return
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model_name in ID_SEQUENCE_MODELS:
+            table = apps.get_model('quiz', model_name)._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [floor, table])
+                if not cursor.rowcount:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, floor])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))",
+                    [table, floor],
+                )
+            else:
+                logger.warning('Cannot reserve ids on %s databases; rows may collide when quizzes move',
+                               connection.vendor)
+                return
+
+
+# Rebalancing
+
+@dataclass
+class MoveResult:
+    source: str
+    target: str
+    attempts: int = 0
+    frozen_seconds: float = 0.0
+
+
+def _copy(model, source, target, queryset, batch_size, upsert=False):
+    """Copy the rows of ``queryset`` (on source) to target in primary-key batches."""
+    rows = queryset.using(source).order_by('pk')
+    copied = 0
+    last = None
+    while True:
+        page = rows if last is None else rows.filter(pk__gt=last)
+        batch = list(page[:batch_size])
+        if not batch:
+            return copied
+        last = batch[-1].pk
+        if upsert:
+            _upsert(model, target, batch)
+        else:
+            # Rows already copied by an earlier (interrupted) move are kept
+            model.objects.using(target).bulk_create(batch, ignore_conflicts=True)
+        copied += len(batch)
+
+
+def _replace(model, source, target, queryset):
+    """Replace target's rows of ``queryset`` with source's (small per-quiz tables)."""
+    rows = list(queryset.using(source))
+    queryset.using(target).delete()
+    model.objects.using(target).bulk_create(rows)
+
+
+def _delete(queryset, alias, batch_size):
+    rows = queryset.using(alias)
+    while True:
+        ids = list(rows.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        with transaction.atomic(using=alias):
+            rows.filter(pk__in=ids).delete()
+
+
+def move_quiz(quiz_id, target, batch_size=2000, freeze_grace=1.0, drain_spool=None):
+    """
+    Move a quiz's sharded rows to ``target`` while it keeps serving traffic.
+    The write freeze lasts at least QUIZ_SHARD_LOOKUP_TIMEOUT plus
+    ``freeze_grace`` seconds, so every process has seen it before the copy.
+    ``drain_spool`` is called during the freeze to flush spooled attempts.
+    Returns a MoveResult.
+    """
+    from .models import (
+        AnswerLayout, AttemptDraft, AttemptSeed, Question, QuestionStats, Quiz, QuizAttempt,
+        QuizShard, QuizStats, ScoreBucket,
+    )
+
+    if target not in connections:
+        raise ValueError(f'Unknown database alias {target!r}')
+    if not Quiz.objects.using(DEFAULT_DB_ALIAS).filter(pk=quiz_id).exists():
+        raise Quiz.DoesNotExist(f'Quiz {quiz_id} does not exist')
+    source = shard_for_quiz(quiz_id)
+    result = MoveResult(source, target)
+    if source == target:
+        return result
+
+    seeds = AttemptSeed.objects.filter(quiz_id=quiz_id)
+    layouts = AnswerLayout.objects.filter(quiz_id=quiz_id)
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id)
+    drafts = AttemptDraft.objects.filter(attempt__quiz_id=quiz_id)
+
+    # 1. Bulk copy while the quiz stays writable (parents before children)
+    copy_quiz_content(quiz_id, target)
+    _copy(AnswerLayout, source, target, layouts, batch_size)
+    _copy(AttemptSeed, source, target, seeds, batch_size)
+    last_id = attempts.using(source).aggregate(high=models.Max('id'))['high'] or 0
+    _copy(QuizAttempt, source, target, attempts.filter(id__lte=last_id), batch_size)
+
+    # 2. Freeze writes, copy what arrived meanwhile and flip the lookup row
+    lookup = QuizShard.objects.using(DEFAULT_DB_ALIAS).filter(quiz_id=quiz_id)
+    QuizShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        quiz_id=quiz_id,
+        defaults={'alias': source, 'frozen_until': timezone.now() + timedelta(seconds=FREEZE_TIMEOUT)},
+    )
+    cache.delete(SHARD_KEY.format(quiz_id=quiz_id))
+    started = time.perf_counter()
+    try:
+        # Let other processes' cached lookups expire, then the requests that
+        # passed the freeze check finish their writes
+        time.sleep(settings.QUIZ_SHARD_LOOKUP_TIMEOUT + freeze_grace)
+        if drain_spool is not None:
+            drain_spool()
+        copy_quiz_content(quiz_id, target)
+        _copy(AnswerLayout, source, target, layouts, batch_size)
+        # Upserted: attempts submitted since the first pass changed submitted_at
+        _copy(AttemptSeed, source, target, seeds, batch_size, upsert=True)
+        _copy(QuizAttempt, source, target, attempts.filter(id__gt=last_id), batch_size)
+        _copy(AttemptDraft, source, target, drafts, batch_size, upsert=True)
+        with transaction.atomic(using=target):
+            _replace(QuizStats, source, target, QuizStats.objects.filter(quiz_id=quiz_id))
+            _replace(QuestionStats, source, target, QuestionStats.objects.filter(quiz_id=quiz_id))
+            _replace(ScoreBucket, source, target, ScoreBucket.objects.filter(quiz_id=quiz_id))
+        # Lookups cached during the freeze still say frozen, so none writes to source
+        lookup.update(alias=target, frozen_until=None, updated_at=timezone.now())
+    finally:
+        lookup.filter(frozen_until__isnull=False).update(frozen_until=None, updated_at=timezone.now())
+        cache.delete(SHARD_KEY.format(quiz_id=quiz_id))
+        result.frozen_seconds = time.perf_counter() - started
+    result.attempts = attempts.using(target).count()
+
+    # 3. Drop the old copy (children before parents) once cached lookups that
+    # still point reads at it have expired
+    time.sleep(settings.QUIZ_SHARD_LOOKUP_TIMEOUT)
+    _delete(drafts, source, batch_size)
+    _delete(attempts, source, batch_size)
+    for queryset in (seeds, layouts, ScoreBucket.objects.filter(quiz_id=quiz_id),
+                     QuestionStats.objects.filter(quiz_id=quiz_id), QuizStats.objects.filter(quiz_id=quiz_id)):
+        _delete(queryset, source, batch_size)
+    if source != DEFAULT_DB_ALIAS:
+        # The default database keeps the catalog rows
+        _delete(Question.objects.filter(quiz_id=quiz_id), source, batch_size)
+        _delete(Quiz.objects.filter(pk=quiz_id), source, batch_size)
+    return result
+
+
+def pin_existing_quizzes():
+    """
+    Record 'default' as the shard of every quiz without a lookup row. Run it
+    before enabling sharding so existing quizzes keep finding their rows.
+    Returns the number of quizzes pinned.
+    """
+    from .models import Quiz, QuizShard
+
+    unplaced = Quiz.objects.using(DEFAULT_DB_ALIAS).filter(shard__isnull=True).values_list('id', flat=True)
+    rows = [QuizShard(quiz_id=quiz_id, alias=DEFAULT_DB_ALIAS) for quiz_id in unplaced.iterator()]
+    QuizShard.objects.using(DEFAULT_DB_ALIAS).bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    for row in rows:
+        cache.delete(SHARD_KEY.format(quiz_id=row.quiz_id))
+    return len(rows)
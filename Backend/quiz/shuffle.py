@@ -0,0 +1,153 @@
+"""
+Per-attempt randomization of quizzes.
+
+Quizzes can opt in to drawing ``questions_per_attempt`` questions from their
+bank and to shuffling question and/or option order. Everything is derived
+from a seed issued by POST /api/quizzes/{id}/start/ (an AttemptSeed row):
+orderings are ranks of ``blake2b(seed, question id)`` so the server can
+recompute the exact layout at grading time from the seed alone, independent
+of Python's ``random`` implementation. The cached payloads and answer keys
+are reused as-is; a shuffled request only adds the seed lookup. Each started
+attempt can be submitted once (AttemptSeed.submitted_at).
+"""
+import hashlib
+import uuid
+from contextlib import contextmanager
+
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import AttemptSeed
+
+
+ATTEMPT_REQUIRED = 'This quiz draws questions per attempt; start one and submit its attempt id.'
+ALREADY_SUBMITTED = 'This attempt has already been submitted.'
+
+
+def rank(seed, *parts):
+    """Stable pseudo-random sort key for ``parts`` under ``seed``."""
+    key = ':'.join(str(part) for part in (seed,) + parts).encode()
+    return hashlib.blake2b(key, digest_size=8).digest()
+
+
+def select_entries(entries, seed, count=None, shuffle=False):
+    """Return the answer key entries one attempt sees, in presentation order."""
+    ranked = sorted(entries, key=lambda entry: rank(seed, 'q', entry[0]))
+    if count is not None and count < len(entries):
+        chosen = ranked[:count]
+        if not shuffle:
+            positions = {entry[0]: index for index, entry in enumerate(entries)}
+            chosen.sort(key=lambda entry: positions[entry[0]])
+        return tuple(chosen)
+    return tuple(ranked) if shuffle else tuple(entries)
+
+
+def shuffle_options(options, seed, question_id):
+    return sorted(options, key=lambda option: rank(seed, 'o', question_id, option))
+
+
+def shuffle_quiz_data(data, answer_key):
+    """
+    Lay out a cached QuizSerializer payload for a seeded answer key: keep only
+    the selected questions, in its order, with options shuffled if enabled.
+    """
+    questions = {question['id']: question for question in data['questions']}
+    laid_out = []
+    for question_id, *_ in answer_key.entries:
+        question = questions[question_id]
+        if answer_key.shuffle_options:
+            question = dict(question, options=shuffle_options(question['options'], answer_key.seed, question_id))
+        laid_out.append(question)
+    return dict(data, questions=laid_out)
+
+
+def seeded_etag(etag, answer_key):
+    """
+    Strong ETag for a payload with ``etag`` laid out by a seeded answer key.
+    The key's question order and option shuffling are part of it because the
+    payload does not include the quiz's subset and shuffle settings.
+    """
+    layout = [entry[0] for entry in answer_key.entries]
+    key = f'{etag}:{answer_key.seed}:{layout}:{answer_key.shuffle_options}'
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _attempt_seeds(attempts, attempt_id):
+    try:
+        attempt_id = uuid.UUID(str(attempt_id))
+    except ValueError:
+        raise Http404('No attempt matches the given query.')
+    return attempts.filter(pk=attempt_id).values_list('seed', 'submitted_at')
+
+
+def get_attempt_seed(quiz_id, attempt_id, unsubmitted=False):
+    """
+    Return the seed of a started attempt (one query). Raises Http404, or
+    ValidationError with ``unsubmitted`` for attempts already submitted.
+    """
+    row = _attempt_seeds(AttemptSeed.objects.for_quiz(quiz_id), attempt_id).first()
+    if row is None:
+        raise Http404('No attempt matches the given query.')
+    if unsubmitted and row[1] is not None:
+        raise serializers.ValidationError({'attempt': [ALREADY_SUBMITTED]})
+    return row[0]
+
+
+async def aget_attempt_seed(quiz_id, attempt_id):
+    """Async variant of get_attempt_seed()."""
+    # for_quiz() may read the shard lookup table, so rely on ShardRoutingMiddleware here
+    row = await _attempt_seeds(AttemptSeed.objects.filter(quiz_id=quiz_id), attempt_id).afirst()
+    if row is None:
+        raise Http404('No attempt matches the given query.')
+    return row[0]
+
+
+def claim_attempts(quiz_id, attempt_ids):
+    """
+    Mark started attempts as submitted. Returns the ids claimed by this call;
+    attempts submitted before, or by a concurrent request, are left out.
+    """
+    if not attempt_ids:
+        return set()
+    now = timezone.now()
+    seeds = AttemptSeed.objects.for_quiz(quiz_id).filter(pk__in=attempt_ids)
+    seeds.filter(submitted_at__isnull=True).update(submitted_at=now)
+    return set(seeds.filter(submitted_at=now).values_list('pk', flat=True))
+
+
+def release_attempts(quiz_id, attempt_ids):
+    """Undo claim_attempts() for attempts whose submit failed."""
+    if attempt_ids:
+        AttemptSeed.objects.for_quiz(quiz_id).filter(pk__in=attempt_ids).update(submitted_at=None)
+
+
+@contextmanager
+def submitting(quiz_id, attempt_id):
+    """
+    Claim a started attempt for the submit in the block; released again if
+    the block raises. Raises ValidationError for attempts already submitted.
+    """
+    if attempt_id is None:
+        yield
+        return
+    seeds = AttemptSeed.objects.for_quiz(quiz_id).filter(pk=attempt_id, submitted_at__isnull=True)
+    if not seeds.update(submitted_at=timezone.now()):
+        raise serializers.ValidationError({'attempt': [ALREADY_SUBMITTED]})
+    try:
+        yield
+    except BaseException:
+        release_attempts(quiz_id, [attempt_id])
+        raise
+
+
+def answer_key_for_seed(answer_key, seed):
+    """
+    Return the answer key to grade with: seeded when a seed is given, the full
+    key otherwise. Quizzes that draw a subset require a seed.
+    """
+    if seed is not None:
+        return answer_key.for_seed(seed)
+    if answer_key.questions_per_attempt is not None:
+        raise serializers.ValidationError({'attempt': [ATTEMPT_REQUIRED]})
+    return answer_key
@@ -0,0 +1,67 @@
+"""
+Signal handlers that keep per-quiz caches coherent with the database.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_migrate, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_quiz_version, bump_version
+from .models import Quiz, Question, QuestionStats
+from .sharding import reserve_id_range, schedule_content_sync, shard_for_quiz, sharding_enabled
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_quiz_on_question_change(sender, instance, **kwargs):
+    """Bump the owning quiz's version whenever one of its questions changes."""
+    bump_quiz_version(instance.quiz_id)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_on_change(sender, instance, **kwargs):
+    """Bump the quiz version when its own fields change or it is deleted."""
+    bump_quiz_version(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+def create_question_stats(sender, instance, created, **kwargs):
+    """Give questions added to an existing quiz their own counters."""
+    # With sharding the counters live on the shard and come with the mirror sync
+    if created and not sharding_enabled():
+        QuestionStats.objects.bulk_create(
+            [QuestionStats(question=instance, quiz_id=instance.quiz_id)],
+            ignore_conflicts=True,
+        )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Quiz)
+def sync_shard_mirror(sender, instance, using, **kwargs):
+    """Copy catalog changes to the quiz's shard once they commit."""
+    if using == DEFAULT_DB_ALIAS:
+        schedule_content_sync(instance.quiz_id if sender is Question else instance.pk)
+
+
+@receiver(pre_delete, sender=Quiz)
+def drop_shard_mirror(sender, instance, using, **kwargs):
+    """Delete a quiz's shard copy once its catalog deletion commits."""
+    # Resolved now: the cascade removes the QuizShard lookup row
+    if using == DEFAULT_DB_ALIAS and sharding_enabled():
+        schedule_content_sync(instance.pk, shard_for_quiz(instance.pk))
+
+
+@receiver(post_migrate, sender=apps.get_app_config('quiz'))
+def reserve_shard_ids(sender, using, **kwargs):
+    """Move a freshly migrated shard's id sequences to its own range."""
+    reserve_id_range(using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_on_change(sender, instance, **kwargs):
+    """Drop cached JWT user resolutions when a user changes or is deactivated."""
+    bump_version('user', instance.pk)
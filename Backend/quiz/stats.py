@@ -0,0 +1,167 @@
+"""
+Incrementally maintained per-quiz statistics.
+
+QuizStats and QuestionStats rows are bumped with F() increments whenever
+attempts are stored, so dashboards read O(questions) rows instead of scanning
+every QuizAttempt. ``rebuild_quiz_stats`` recomputes them from history.
+"""
+from collections import Counter, defaultdict
+
+from django.db import router
+from django.db.models import Count, F, Sum
+
+from .grading import compile_answer_key
+from .models import Question, QuizAttempt, QuizStats, QuestionStats
+from .packing import ANSWER_COLUMNS, get_layout
+from .sharding import on_quiz_shard, shard_atomic
+
+
+@on_quiz_shard
+def ensure_stats_rows(quiz_id):
+    """Create missing stats rows for a quiz and its questions."""
+    # Questions as seen by the database holding the counters (a shard's mirror)
+    questions = Question.objects.using(router.db_for_write(QuestionStats)).filter(quiz_id=quiz_id)
+    QuizStats.objects.bulk_create([QuizStats(quiz_id=quiz_id)], ignore_conflicts=True)
+    QuestionStats.objects.bulk_create(
+        [
+            QuestionStats(question_id=question_id, quiz_id=quiz_id)
+            for question_id in questions.values_list('id', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _increment_questions(field, counts):
+    # Group questions by increment so a batch needs one UPDATE per distinct value
+    by_increment = defaultdict(list)
+    for question_id, count in counts.items():
+        if count:
+            by_increment[count].append(question_id)
+    for count, question_ids in by_increment.items():
+        QuestionStats.objects.filter(question_id__in=question_ids).update(**{field: F(field) + count})
+
+
+@on_quiz_shard
+def apply_stats(quiz_id, attempt_count, total_score, total_possible, correct, incorrect):
+    """
+    Add a batch of graded attempts to a quiz's counters (negative values take
+    them out). ``correct``/``incorrect`` are Counters of question_id -> number
+    of attempts.
+    """
+    with shard_atomic():
+        increments = {
+            'attempt_count': F('attempt_count') + attempt_count,
+            'total_score': F('total_score') + total_score,
+            'total_possible': F('total_possible') + total_possible,
+        }
+        if not QuizStats.objects.filter(quiz_id=quiz_id).update(**increments):
+            # First attempt for this quiz: create the rows, then count it
+            ensure_stats_rows(quiz_id)
+            QuizStats.objects.filter(quiz_id=quiz_id).update(**increments)
+        _increment_questions('correct_count', correct)
+        _increment_questions('incorrect_count', incorrect)
+
+
+def record_result_stats(quiz_id, results):
+    """Add graded QuizResults for one quiz to its counters."""
+    correct = Counter()
+    incorrect = Counter()
+    total_score = 0
+    total_possible = 0
+    for result in results:
+        total_score += result.score
+        total_possible += result.total_questions
+        for question_result in result.results:
+            if question_result.is_correct:
+                correct[question_result.question_id] += 1
+            else:
+                incorrect[question_result.question_id] += 1
+    apply_stats(quiz_id, len(results), total_score, total_possible, correct, incorrect)
+
+
+@on_quiz_shard
+def rebuild_quiz_stats(quiz_id, chunk_size=2000):
+    """
+    Recompute a quiz's counters from its QuizAttempt history.
+    Per-question correctness is judged against the current answer key, on the
+    questions each attempt was shown (its seed's subset for quizzes that draw
+    ``questions_per_attempt``). Raises Http404 for unknown quizzes.
+    """
+    answer_key = compile_answer_key(quiz_id)
+    correct_answers = {question_id: correct_answer for question_id, _, correct_answer, _ in answer_key.entries}
+    seeded = answer_key.questions_per_attempt is not None
+    correct = Counter()
+    incorrect = Counter()
+    # Packed attempts whose layout matches the current key are counted from
+    # their correctness bitmaps: layout id -> Counter((byte position, byte)).
+    # Bitmaps cover every question, so subset quizzes decode instead.
+    bitmaps = defaultdict(Counter)
+    layout_agrees = {}
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id).values_list('seed', *ANSWER_COLUMNS)
+    for seed, answers, layout_id, packed in attempts.iterator(chunk_size=chunk_size):
+        if packed is not None:
+            layout = get_layout(layout_id)
+            if not seeded:
+                if layout_id not in layout_agrees:
+                    layout_agrees[layout_id] = layout.agrees_with(correct_answers)
+                if layout_agrees[layout_id]:
+                    bitmaps[layout_id].update(enumerate(layout.bitmap(packed)))
+                    continue
+            answers = layout.decode(packed)
+        if seeded and seed is not None:
+            shown = {question_id: correct_answers[question_id]
+                     for question_id, *_ in answer_key.for_seed(seed).entries}
+        else:
+            # Unseeded attempts (submitted before the quiz drew subsets) saw every question
+            shown = correct_answers
+        for question_id, correct_answer in shown.items():
+            if answers.get(str(question_id), '') == correct_answer:
+                correct[question_id] += 1
+            else:
+                incorrect[question_id] += 1
+
+    for layout_id, byte_counts in bitmaps.items():
+        # Every attempt contributes one count per byte position; position 0 gives the total
+        attempt_count = sum(count for (position, _), count in byte_counts.items() if position == 0)
+        layout_correct = get_layout(layout_id).count_correct(byte_counts)
+        for question_id in correct_answers:
+            correct[question_id] += layout_correct[question_id]
+            incorrect[question_id] += attempt_count - layout_correct[question_id]
+
+    totals = QuizAttempt.objects.filter(quiz_id=quiz_id).aggregate(
+        attempt_count=Count('id'),
+        total_score=Sum('score'),
+        total_possible=Sum('total_questions'),
+    )
+    write_quiz_stats(
+        quiz_id,
+        correct_answers,
+        totals['attempt_count'],
+        totals['total_score'] or 0,
+        totals['total_possible'] or 0,
+        correct,
+        incorrect,
+    )
+
+
+@on_quiz_shard
+def write_quiz_stats(quiz_id, question_ids, attempt_count, total_score, total_possible, correct, incorrect):
+    """Replace a quiz's counters with recomputed totals."""
+    with shard_atomic():
+        QuizStats.objects.filter(quiz_id=quiz_id).delete()
+        QuestionStats.objects.filter(quiz_id=quiz_id).delete()
+        QuizStats.objects.create(
+            quiz_id=quiz_id,
+            attempt_count=attempt_count,
+            total_score=total_score,
+            total_possible=total_possible,
+        )
+        QuestionStats.objects.bulk_create([
+            QuestionStats(
+                question_id=question_id,
+                quiz_id=quiz_id,
+                correct_count=correct[question_id],
+                incorrect_count=incorrect[question_id],
+            )
+            for question_id in question_ids
+        ])
@@ -2,11 +2,49 @@
 Integration tests for the Quiz Management System.
 Tests complete quiz creation flow, quiz taking flow, and error handling scenarios.
 """
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
-from .models import Quiz, Question, QuizAttempt
+from .models import (
+    AnswerLayout, AttemptDraft, AttemptSeed, Quiz, Question, QuestionStats, QuizAttempt, QuizShard, QuizStats,
+    ScoreBucket,
+)
+from . import archive, async_views
+from .archive import archive_quiz, iter_archived_attempts, quiz_dir, read_footer
+from .attempts import AttemptSpool, flush_batch
+from .authentication import user_cache
+from .banks import QuizBankImporter
+from .cache import bump_quiz_version
+from .drafts import DraftStore, get_drafts
+from .throttling import ip_limiter, username_limiter
+from .grading import answer_keys, get_answer_key
+from .metrics import registry
+from .packing import Layout, current_layouts, layouts, stored_answers
+from .payloads import quiz_payloads
+from .regrade import Regrader, regrade_quiz
+from .routers import PIN_COOKIE, WRITTEN_KEY
+from .serializers import QuizSerializer, QuizResultSerializer
+from .sharding import shard_for_quiz
+from .stats import rebuild_quiz_stats
 
 
 class QuizCreationFlowTests(APITestCase):
@@ -511,3 +549,2143 @@ class ErrorHandlingTests(APITestCase):
         # Verify questions are ordered correctly
         self.assertEqual(response.data['questions'][0]['order'], 0)
         self.assertEqual(response.data['questions'][1]['order'], 1)
+
+
+class AnswerKeyCacheTests(APITestCase):
+    """Test the compiled answer key cache used for grading"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        self.quiz = Quiz.objects.create(title="Cached Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="What is 2 + 2?",
+            question_type="mcq",
+            options=["3", "4"],
+            correct_answer="4",
+            order=0
+        )
+        self.q2 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="The sky is blue.",
+            question_type="tf",
+            options=["True", "False"],
+            correct_answer="True",
+            order=1
+        )
+        self.url = f'/api/quizzes/{self.quiz.id}/submit/'
+        self.data = {"answers": {str(self.q1.id): "4", str(self.q2.id): "False"}}
+
+    def test_warm_submit_issues_no_selects(self):
+        """Test that grading with a warm answer key only writes (attempt INSERT, stats UPDATEs)"""
+        self.client.post(self.url, self.data, format='json')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.data, format='json')
+        
+        statements = [q['sql'].split()[0].upper() for q in queries]
+        self.assertNotIn('SELECT', statements)
+        self.assertEqual(statements.count('INSERT'), 1)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['score'], 1)
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz).count(), 2)
+
+    def test_question_save_invalidates_answer_key(self):
+        """Test that changing a correct answer is picked up on the next submission"""
+        self.client.post(self.url, self.data, format='json')
+        
+        self.q2.correct_answer = "False"
+        self.q2.save()
+        response = self.client.post(self.url, self.data, format='json')
+        
+        self.assertEqual(response.data['score'], 2)
+
+    def test_question_delete_invalidates_answer_key(self):
+        """Test that deleting a question removes it from grading"""
+        self.client.post(self.url, self.data, format='json')
+        
+        self.q2.delete()
+        response = self.client.post(self.url, self.data, format='json')
+        
+        self.assertEqual(response.data['total_questions'], 1)
+        self.assertEqual(response.data['score'], 1)
+
+    def test_deleted_quiz_returns_404(self):
+        """Test that a cached answer key is not served after the quiz is deleted"""
+        self.client.post(self.url, self.data, format='json')
+        
+        self.quiz.delete()
+        response = self.client.post(self.url, self.data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(QUIZ_VERSION_CACHE_TIMEOUT=0)
+    def test_version_bumped_by_another_worker_invalidates_answer_key(self):
+        """Test that a version bump recorded only in the database reaches this worker's cache"""
+        self.client.post(self.url, self.data, format='json')
+        
+        # What another worker's bump leaves behind: new rows, untouched local cache
+        Question.objects.filter(pk=self.q2.pk).update(correct_answer="False")
+        Quiz.objects.filter(pk=self.quiz.pk).update(version="other-worker")
+        response = self.client.post(self.url, self.data, format='json')
+        
+        self.assertEqual(response.data['score'], 2)
+
+
+class BulkQuizCreationTests(APITestCase):
+    """Test that quiz creation query count does not grow with question count"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='author', password='secret123')
+        self.client.force_authenticate(user=user)
+
+    def build_payload(self, num_questions):
+        return {
+            "title": f"Quiz with {num_questions} questions",
+            "questions": [
+                {
+                    "question_text": f"Question {i}",
+                    "question_type": "mcq",
+                    "options": ["A", "B"],
+                    "correct_answer": "A"
+                }
+                for i in range(num_questions)
+            ]
+        }
+
+    def test_query_count_is_constant(self):
+        """Test that creating 1, 10 and 100 questions issues the same number of queries"""
+        counts = []
+        for size in (1, 10, 100):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/quizzes/', self.build_payload(size), format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(response.data['questions']), size)
+            counts.append(len(queries))
+        
+        self.assertEqual(len(set(counts)), 1)
+
+    def test_bulk_created_questions_keep_order(self):
+        """Test that bulk-created questions keep their submitted order"""
+        response = self.client.post('/api/quizzes/', self.build_payload(5), format='json')
+        
+        orders = [q['order'] for q in response.data['questions']]
+        texts = [q['question_text'] for q in response.data['questions']]
+        self.assertEqual(orders, [0, 1, 2, 3, 4])
+        self.assertEqual(texts, [f"Question {i}" for i in range(5)])
+
+    @override_settings(QUIZ_QUESTION_BULK_BATCH_SIZE=2)
+    def test_small_batch_size_creates_all_questions(self):
+        """Test that quizzes larger than the batch size are fully inserted"""
+        response = self.client.post('/api/quizzes/', self.build_payload(5), format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Question.objects.filter(quiz_id=response.data['id']).count(), 5)
+
+
+class QueryCountTests(APITestCase):
+    """Pin read path query counts so N+1 regressions are caught"""
+
+    def setUp(self):
+        cache.clear()
+        quiz_payloads.clear()
+
+    def create_quiz(self, num_questions, num_attempts=0):
+        quiz = Quiz.objects.create(title=f"Quiz {num_questions}")
+        Question.objects.bulk_create([
+            Question(
+                quiz=quiz,
+                question_text=f"Question {i}",
+                question_type="tf",
+                options=["True", "False"],
+                correct_answer="True",
+                order=i
+            )
+            for i in range(num_questions)
+        ])
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(quiz=quiz, answers={}, score=0, total_questions=num_questions)
+            for _ in range(num_attempts)
+        ])
+        return quiz
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_quiz_detail_query_count(self):
+        """Test that an uncached quiz detail issues three queries regardless of question count"""
+        small = self.create_quiz(1)
+        large = self.create_quiz(50)
+        
+        # Version token, quiz and prefetched questions
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/quizzes/{small.id}/')
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/quizzes/{large.id}/')
+        
+        self.assertEqual(len(response.data['questions']), 50)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_changelists_do_not_grow_with_rows(self):
+        """Test that question and attempt admin lists select the related quiz in one query"""
+        admin = User.objects.create_superuser(username='admin', password='secret123')
+        self.client.force_login(admin)
+        self.create_quiz(2, num_attempts=2)
+        
+        question_url = '/admin/quiz/question/'
+        attempt_url = '/admin/quiz/quizattempt/'
+        question_queries = self.count_queries(question_url)
+        attempt_queries = self.count_queries(attempt_url)
+        
+        for _ in range(5):
+            self.create_quiz(10, num_attempts=10)
+        
+        self.assertEqual(self.count_queries(question_url), question_queries)
+        self.assertEqual(self.count_queries(attempt_url), attempt_queries)
+
+
+class QuizPayloadCacheTests(APITestCase):
+    """Test pre-rendered quiz payloads and ETag handling on quiz detail"""
+
+    def setUp(self):
+        cache.clear()
+        quiz_payloads.clear()
+        self.quiz = Quiz.objects.create(title="ETag Quiz")
+        self.question = Question.objects.create(
+            quiz=self.quiz,
+            question_text="Is this cached?",
+            question_type="tf",
+            options=["True", "False"],
+            correct_answer="True",
+            order=0
+        )
+        self.url = f'/api/quizzes/{self.quiz.id}/'
+
+    def test_payload_matches_serializer_output(self):
+        """Test that the cached body is identical to rendering QuizSerializer"""
+        response = self.client.get(self.url)
+        
+        expected = JSONRenderer().render(QuizSerializer(self.quiz).data)
+        self.assertEqual(response.content, expected)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('ETag', response)
+        self.assertIn('Cache-Control', response)
+
+    def test_warm_fetch_issues_no_queries(self):
+        """Test that a cached quiz is served without touching the database"""
+        self.client.get(self.url)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_matching_if_none_match_returns_304(self):
+        """Test that a matching ETag returns 304 Not Modified with no body"""
+        etag = self.client.get(self.url)['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_question_change_invalidates_payload(self):
+        """Test that editing a question changes the payload and its ETag"""
+        etag = self.client.get(self.url)['ETag']
+        
+        self.question.question_text = "Was this cached?"
+        self.question.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['questions'][0]['question_text'], "Was this cached?")
+
+    def test_quiz_title_change_invalidates_payload(self):
+        """Test that renaming a quiz is reflected on the next fetch"""
+        self.client.get(self.url)
+        
+        self.quiz.title = "Renamed Quiz"
+        self.quiz.save()
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.data['title'], "Renamed Quiz")
+
+    @override_settings(QUIZ_VERSION_CACHE_TIMEOUT=0)
+    def test_version_bumped_by_another_worker_invalidates_etag(self):
+        """Test that a version bump recorded only in the database changes the served ETag"""
+        etag = self.client.get(self.url)['ETag']
+        
+        Quiz.objects.filter(pk=self.quiz.pk).update(title="Renamed Elsewhere", version="other-worker")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['title'], "Renamed Elsewhere")
+
+
+class TrustedResultRenderingTests(APITestCase):
+    """Test that server-built results render exactly like QuizResultSerializer output"""
+
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Rendering Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="Quelle est la capitale de la France ? «Paris»",
+            question_type="mcq",
+            options=["Paris", "Lyon"],
+            correct_answer="Paris",
+            order=0
+        )
+        self.q2 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="1/3 as a percentage?",
+            question_type="mcq",
+            options=["33.3", "50"],
+            correct_answer="33.3",
+            order=1
+        )
+        self.q3 = Question.objects.create(
+            quiz=self.quiz,
+            # Imported text may carry surrounding whitespace
+            question_text="  Unanswered\n",
+            question_type="tf",
+            options=["True", "False"],
+            correct_answer="True ",
+            order=2
+        )
+
+    def test_rendered_bytes_match_serializer_path(self):
+        """Test byte-for-byte parity with the validated serializer path"""
+        url = f'/api/quizzes/{self.quiz.id}/submit/'
+        data = {"answers": {str(self.q1.id): "Paris", str(self.q2.id): "50"}}
+        
+        response = self.client.post(url, data, format='json')
+        
+        # Built the way the submit view did before results skipped validation
+        results = []
+        for question in self.quiz.questions.order_by('order', 'id'):
+            user_answer = data['answers'].get(str(question.id), '')
+            results.append({
+                'question_id': question.id,
+                'question_text': question.question_text,
+                'user_answer': user_answer if user_answer else None,
+                'correct_answer': question.correct_answer,
+                'is_correct': user_answer == question.correct_answer,
+            })
+        score = sum(result['is_correct'] for result in results)
+        serializer = QuizResultSerializer(data={
+            'score': score,
+            'total_questions': len(results),
+            'percentage': score / len(results) * 100,
+            'results': results,
+        })
+        serializer.is_valid(raise_exception=True)
+        self.assertEqual(response.content, JSONRenderer().render(serializer.data))
+        self.assertIsNone(response.data['results'][2]['user_answer'])
+
+
+class WriteBehindAttemptTests(APITestCase):
+    """Test the opt-in write-behind spool for quiz attempts"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.spool_path = os.path.join(tmpdir.name, 'spool.sqlite3')
+        overrides = self.settings(
+            QUIZ_ATTEMPT_WRITE_BEHIND=True,
+            QUIZ_ATTEMPT_SPOOL_PATH=self.spool_path,
+            QUIZ_ATTEMPT_FLUSH_INTERVAL=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        
+        self.quiz = Quiz.objects.create(title="Write Behind Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="What is 2 + 2?",
+            question_type="mcq",
+            options=["3", "4"],
+            correct_answer="4",
+            order=0
+        )
+        self.url = f'/api/quizzes/{self.quiz.id}/submit/'
+
+    def test_submit_grades_synchronously_and_defers_insert(self):
+        """Test that results are returned while the attempt waits in the spool"""
+        response = self.client.post(self.url, {"answers": {str(self.q1.id): "4"}}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['score'], 1)
+        self.assertFalse(QuizAttempt.objects.filter(quiz=self.quiz).exists())
+        self.assertEqual(len(AttemptSpool(self.spool_path)), 1)
+
+    def test_drain_command_inserts_spooled_attempts(self):
+        """Test that draining bulk-inserts attempts and empties the spool"""
+        for answer in ("4", "3", "4"):
+            self.client.post(self.url, {"answers": {str(self.q1.id): answer}}, format='json')
+        
+        call_command('drain_attempt_queue', batch_size=2, stdout=io.StringIO())
+        
+        attempts = QuizAttempt.objects.filter(quiz=self.quiz).order_by('id')
+        self.assertEqual([a.score for a in attempts], [1, 0, 1])
+        self.assertEqual(attempts[0].answers, {str(self.q1.id): "4"})
+        self.assertEqual(len(AttemptSpool(self.spool_path)), 0)
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).attempt_count, 3)
+
+    def test_drain_skips_attempts_for_deleted_quiz(self):
+        """Test that attempts for quizzes deleted in the meantime do not block the spool"""
+        self.client.post(self.url, {"answers": {str(self.q1.id): "4"}}, format='json')
+        self.quiz.delete()
+        
+        call_command('drain_attempt_queue', stdout=io.StringIO())
+        
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+        self.assertEqual(len(AttemptSpool(self.spool_path)), 0)
+
+    def test_concurrent_flushers_claim_disjoint_batches(self):
+        """Test that two flushers sharing a spool never insert the same attempt"""
+        for answer in ("4", "3", "4"):
+            self.client.post(self.url, {"answers": {str(self.q1.id): answer}}, format='json')
+        first = AttemptSpool(self.spool_path)
+        second = AttemptSpool(self.spool_path)
+        
+        claimed = first.claim(2)
+        
+        self.assertEqual(flush_batch(second, 10), 1)
+        self.assertEqual(flush_batch(second, 10), 0)
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).attempt_count, 1)
+        
+        # An expired claim (its flusher died) is taken over
+        with mock.patch.object(AttemptSpool, 'claim_timeout', -1):
+            self.assertEqual(flush_batch(second, 10), len(claimed))
+        self.assertEqual(QuizAttempt.objects.count(), 3)
+        self.assertEqual(len(first), 0)
+
+
+class QuizStatsTests(APITestCase):
+    """Test the incrementally maintained quiz statistics"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='analyst', password='secret123')
+        self.client.force_authenticate(user=user)
+        self.quiz = Quiz.objects.create(title="Stats Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="What is 2 + 2?",
+            question_type="mcq",
+            options=["3", "4"],
+            correct_answer="4",
+            order=0
+        )
+        self.q2 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="The sky is blue.",
+            question_type="tf",
+            options=["True", "False"],
+            correct_answer="True",
+            order=1
+        )
+        self.submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+        self.stats_url = f'/api/quizzes/{self.quiz.id}/stats/'
+
+    def submit(self, a1, a2):
+        self.client.post(
+            self.submit_url,
+            {"answers": {str(self.q1.id): a1, str(self.q2.id): a2}},
+            format='json'
+        )
+
+    def test_stats_are_updated_on_submit(self):
+        """Test that attempt totals and per-question counters follow submissions"""
+        self.submit("4", "True")
+        self.submit("4", "False")
+        self.submit("3", "False")
+        
+        response = self.client.get(self.stats_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['attempt_count'], 3)
+        self.assertAlmostEqual(response.data['average_score'], 1.0)
+        self.assertAlmostEqual(response.data['average_percentage'], 50.0)
+        questions = response.data['questions']
+        self.assertEqual([q['question_id'] for q in questions], [self.q1.id, self.q2.id])
+        self.assertEqual((questions[0]['correct_count'], questions[0]['incorrect_count']), (2, 1))
+        self.assertEqual((questions[1]['correct_count'], questions[1]['incorrect_count']), (1, 2))
+
+    def test_stats_for_quiz_without_attempts(self):
+        """Test that a quiz with no attempts reports zeroed counters"""
+        response = self.client.get(self.stats_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['attempt_count'], 0)
+        self.assertEqual(len(response.data['questions']), 2)
+
+    def test_stats_read_does_not_scan_attempts(self):
+        """Test that the stats endpoint query count does not depend on attempt count"""
+        self.submit("4", "True")
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.stats_url)
+        for _ in range(10):
+            self.submit("4", "False")
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.stats_url)
+        
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(any('quiz_quizattempt' in q['sql'] for q in many))
+
+    def test_rebuild_command_recomputes_from_history(self):
+        """Test that rebuilding from QuizAttempt rows matches the live counters"""
+        self.submit("4", "True")
+        self.submit("3", "True")
+        live = self.client.get(self.stats_url).data
+        QuizStats.objects.all().delete()
+        
+        call_command('rebuild_quiz_stats', self.quiz.id, stdout=io.StringIO())
+        
+        self.assertEqual(self.client.get(self.stats_url).data, live)
+
+    def test_stats_require_authentication(self):
+        """Test that anonymous users cannot read stats"""
+        self.client.force_authenticate(user=None)
+        
+        response = self.client.get(self.stats_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_for_nonexistent_quiz_returns_404(self):
+        """Test that stats for a non-existent quiz return 404"""
+        response = self.client.get('/api/quizzes/99999/stats/')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    """Test request instrumentation headers and the metrics endpoint"""
+
+    def setUp(self):
+        registry.clear()
+        self.quiz = Quiz.objects.create(title="Metrics Quiz")
+        Question.objects.create(
+            quiz=self.quiz,
+            question_text="Measured?",
+            question_type="tf",
+            options=["True", "False"],
+            correct_answer="True",
+            order=0
+        )
+
+    @override_settings(QUIZ_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Test that sampled responses carry a Server-Timing header"""
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/')
+        
+        self.assertIn('Server-Timing', response)
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_server_timing_off_by_default(self):
+        """Test that clients are not sent database timings unless enabled"""
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/')
+        
+        self.assertNotIn('Server-Timing', response)
+
+    def test_metrics_not_served_without_token(self):
+        """Test that the metrics endpoint is off until a token is configured"""
+        response = self.client.get('/api/metrics/')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(QUIZ_METRICS_TOKEN='s3cret')
+    def test_metrics_endpoint_reports_histograms_per_view(self):
+        """Test that the metrics endpoint exposes Prometheus histograms by URL name"""
+        self.client.get(f'/api/quizzes/{self.quiz.id}/')
+        
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer s3cret')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('# TYPE quiz_request_duration_seconds histogram', body)
+        self.assertIn('quiz_request_duration_seconds_count{view="quiz-detail",method="GET"} 1', body)
+        self.assertIn('quiz_request_db_queries_bucket{view="quiz-detail",method="GET",le="+Inf"} 1', body)
+
+    def test_metrics_label_list_and_create_separately(self):
+        """Test that listing and creating quizzes share a route but not a metric series"""
+        self.client.get(reverse('quiz-list'))
+        self.client.post(reverse('quiz-create'), {"title": "New", "questions": []}, format='json')
+        
+        body = registry.render()
+        
+        self.assertIn('quiz_request_duration_seconds_count{view="quiz-list",method="GET"} 1', body)
+        self.assertIn('quiz_request_duration_seconds_count{view="quiz-list",method="POST"} 1', body)
+
+    @override_settings(QUIZ_METRICS_SAMPLE_RATE=0, QUIZ_METRICS_SERVER_TIMING=True)
+    def test_unsampled_requests_are_not_measured(self):
+        """Test that a zero sampling rate disables instrumentation"""
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/')
+        
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('view="quiz-detail"', registry.render())
+
+    @override_settings(QUIZ_METRICS_TOKEN='s3cret')
+    def test_metrics_token_required(self):
+        """Test that the metrics endpoint checks the configured token"""
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer s3cret')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BatchSubmissionTests(APITestCase):
+    """Test bulk submission for offline test centres"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='proctor', password='secret123')
+        self.client.force_authenticate(user=user)
+        self.quiz = Quiz.objects.create(title="Batch Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz,
+            question_text="What is 2 + 2?",
+            question_type="mcq",
+            options=["3", "4"],
+            correct_answer="4",
+            order=0
+        )
+        self.url = f'/api/quizzes/{self.quiz.id}/submit/batch/'
+
+    def test_batch_grades_and_stores_every_valid_item(self):
+        """Test that valid items are graded and stored while invalid ones are reported"""
+        data = [
+            {"answers": {str(self.q1.id): "4"}},
+            {"wrong": "shape"},
+            {"answers": {str(self.q1.id): "3"}},
+        ]
+        
+        response = self.client.post(self.url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual(response.data['rejected'], 1)
+        results = response.data['results']
+        self.assertEqual(results[0]['result']['score'], 1)
+        self.assertEqual(results[1]['status'], 400)
+        self.assertIn('answers', results[1]['errors'])
+        self.assertEqual(results[2]['result']['score'], 0)
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz).count(), 2)
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).attempt_count, 2)
+
+    def test_batch_inserts_attempts_in_one_statement(self):
+        """Test that a batch issues a single INSERT for all attempts"""
+        data = [{"answers": {str(self.q1.id): "4"}} for _ in range(20)]
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, data, format='json')
+        
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "quiz_quizattempt"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_batch_streams_ndjson(self):
+        """Test that results stream as NDJSON when requested"""
+        data = [{"answers": {str(self.q1.id): "4"}}, {"answers": "nope"}]
+        
+        response = self.client.post(self.url, data, format='json', HTTP_ACCEPT='application/x-ndjson')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['result']['score'], 1)
+        self.assertEqual(json.loads(lines[1])['status'], 400)
+
+    def test_non_list_body_returns_400(self):
+        """Test that a non-array body is rejected"""
+        response = self.client.post(self.url, {"answers": {}}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_for_nonexistent_quiz_returns_404(self):
+        """Test that batches for a non-existent quiz return 404"""
+        response = self.client.post('/api/quizzes/99999/submit/batch/', [], format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class QuizListingTests(APITestCase):
+    """Test the keyset-paginated quiz listing"""
+
+    def setUp(self):
+        self.quizzes = []
+        for i in range(5):
+            quiz = Quiz.objects.create(title=f"Listed Quiz {i}")
+            Question.objects.bulk_create([
+                Question(quiz=quiz, question_text=f"Q{j}", question_type="tf",
+                         options=["True", "False"], correct_answer="True", order=j)
+                for j in range(i)
+            ])
+            self.quizzes.append(quiz)
+
+    def test_list_returns_summaries_newest_first(self):
+        """Test that the listing returns summaries with annotated question counts"""
+        response = self.client.get('/api/quizzes/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [q.id for q in reversed(self.quizzes)])
+        self.assertEqual([r['question_count'] for r in results], [4, 3, 2, 1, 0])
+        self.assertNotIn('questions', results[0])
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_pages_cover_every_quiz_once(self):
+        """Test that following next links visits each quiz exactly once"""
+        # Identical timestamps force the id tie-breaker to be used
+        Quiz.objects.update(created_at=self.quizzes[0].created_at)
+        seen = []
+        url = '/api/quizzes/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(r['id'] for r in response.data['results'])
+            url = response.data['next']
+        
+        self.assertEqual(seen, sorted((q.id for q in self.quizzes), reverse=True))
+
+    def test_page_query_count_is_constant(self):
+        """Test that each page is a single query regardless of position"""
+        first = self.client.get('/api/quizzes/?page_size=2')
+        
+        with self.assertNumQueries(1):
+            self.client.get(first.data['next'])
+
+    def test_invalid_cursor_returns_404(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get('/api/quizzes/?cursor=not-a-cursor')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_still_requires_authentication(self):
+        """Test that listing is public but creation still requires a user"""
+        response = self.client.post('/api/quizzes/', {"title": "x", "questions": []}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AttemptExportTests(APITestCase):
+    """Test streaming exports of attempt history"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='exporter', password='secret123')
+        self.client.force_authenticate(user=user)
+        self.quiz = Quiz.objects.create(title="Export Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz, question_text="Q1", question_type="tf",
+            options=["True", "False"], correct_answer="True", order=0
+        )
+        self.q2 = Question.objects.create(
+            quiz=self.quiz, question_text="Q2", question_type="tf",
+            options=["True", "False"], correct_answer="False", order=1
+        )
+        submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+        self.client.post(submit_url, {"answers": {str(self.q1.id): "True", str(self.q2.id): "True"}}, format='json')
+        self.client.post(submit_url, {"answers": {str(self.q2.id): "False"}}, format='json')
+        self.url = f'/api/quizzes/{self.quiz.id}/attempts/export/'
+
+    def test_csv_export_flattens_answers(self):
+        """Test that CSV has one column per question and one row per attempt"""
+        response = self.client.get(self.url + '?format=csv')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['attempt_id', 'submitted_at', 'score', 'total_questions',
+                                   f'q_{self.q1.id}', f'q_{self.q2.id}'])
+        self.assertEqual(rows[1][2:], ['1', '2', 'True', 'True'])
+        self.assertEqual(rows[2][2:], ['1', '2', '', 'False'])
+
+    def test_ndjson_export(self):
+        """Test that NDJSON rows share the flat schema with nulls for unanswered questions"""
+        response = self.client.get(self.url + '?format=ndjson')
+        
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 2)
+        self.assertIsNone(rows[1][f'q_{self.q1.id}'])
+        self.assertEqual(rows[1][f'q_{self.q2.id}'], 'False')
+
+    def test_export_command_writes_file(self):
+        """Test that the management command streams the same export to a file"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'attempts.csv')
+            call_command('export_attempts', self.quiz.id, output=path)
+            with open(path, newline='') as fh:
+                rows = list(csv.reader(fh))
+        
+        self.assertEqual(len(rows), 3)
+
+    def test_export_requires_authentication(self):
+        """Test that anonymous users cannot export attempts"""
+        self.client.force_authenticate(user=None)
+        
+        response = self.client.get(self.url + '?format=csv')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    """Test JWT user resolution through the in-process user cache"""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='cached', password='secret123')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.quiz = Quiz.objects.create(title="Auth Quiz")
+        self.url = f'/api/quizzes/{self.quiz.id}/stats/'
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q for q in queries if 'auth_user' in q['sql']]
+
+    def test_warm_cache_issues_no_auth_queries(self):
+        """Test that a cached user is resolved without touching auth_user"""
+        self.assertEqual(len(self.auth_queries()), 1)
+        
+        self.assertEqual(self.auth_queries(), [])
+
+    def test_deactivation_invalidates_cached_user(self):
+        """Test that deactivating a user takes effect on the next request"""
+        self.auth_queries()
+        
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(QUIZ_JWT_USER_RESOLUTION='stateless')
+    def test_stateless_mode_never_queries_users(self):
+        """Test that stateless resolution trusts the signed claims"""
+        self.assertEqual(self.auth_queries(), [])
+
+    @override_settings(QUIZ_JWT_USER_RESOLUTION='db')
+    def test_db_mode_queries_every_request(self):
+        """Test that db resolution keeps simplejwt's per-request lookup"""
+        self.auth_queries()
+        
+        self.assertEqual(len(self.auth_queries()), 1)
+
+
+class SignupUniquenessTests(APITestCase):
+    """Test that signup relies on database constraints for uniqueness"""
+
+    def setUp(self):
+        User.objects.create_user(username='taken', email='taken@example.com', password='secret123')
+
+    def signup(self, username, email):
+        return self.client.post('/api/auth/signup/', {
+            'username': username, 'email': email, 'password': 'secret123',
+        }, format='json')
+
+    def test_signup_checks_nothing_before_insert(self):
+        """Test that a successful signup issues no uniqueness SELECTs"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.signup('fresh', 'fresh@example.com')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT')])
+
+    def test_duplicate_username_rejected(self):
+        """Test that an existing username is reported"""
+        response = self.signup('taken', 'other@example.com')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], {'username': 'Username already exists'})
+
+    def test_duplicate_email_rejected(self):
+        """Test that an existing email is reported via the unique index"""
+        response = self.signup('other', 'taken@example.com')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], {'email': 'Email already exists'})
+        self.assertEqual(User.objects.filter(email='taken@example.com').count(), 1)
+
+
+class LoginThrottleTests(APITestCase):
+    """Test token-bucket throttling and hasher upgrades on login"""
+
+    def setUp(self):
+        ip_limiter.clear()
+        username_limiter.clear()
+        self.url = '/api/auth/login/'
+
+    def login(self, username, password='wrong'):
+        return self.client.post(self.url, {'username': username, 'password': password}, format='json')
+
+    @override_settings(QUIZ_LOGIN_USERNAME_BURST=2, QUIZ_LOGIN_USERNAME_RATE=0.01)
+    def test_username_bucket_exhausted(self):
+        """Test that repeated logins for one username are rejected with 429"""
+        self.assertEqual(self.login('victim').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('victim').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = self.login('victim')
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('someone-else').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(QUIZ_LOGIN_IP_BURST=2, QUIZ_LOGIN_IP_RATE=0.01, QUIZ_LOGIN_USERNAME_BURST=0)
+    def test_ip_bucket_exhausted(self):
+        """Test that one client cycling through usernames is rejected with 429"""
+        self.login('a')
+        self.login('b')
+        
+        self.assertEqual(self.login('c').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(QUIZ_LOGIN_IP_BURST=2, QUIZ_LOGIN_IP_RATE=0.01, QUIZ_LOGIN_USERNAME_BURST=0)
+    def test_spoofed_forwarded_for_does_not_reset_ip_bucket(self):
+        """Test that rotating X-Forwarded-For does not give a client a fresh bucket"""
+        for number in range(2):
+            self.client.post(self.url, {'username': 'a', 'password': 'wrong'}, format='json',
+                             HTTP_X_FORWARDED_FOR=f'10.0.0.{number}')
+        
+        response = self.client.post(self.url, {'username': 'a', 'password': 'wrong'}, format='json',
+                                    HTTP_X_FORWARDED_FOR='10.0.0.99')
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(QUIZ_LOGIN_USERNAME_BURST=1, QUIZ_LOGIN_USERNAME_RATE=0.01)
+    def test_username_bucket_is_per_client(self):
+        """Test that failed logins from one client do not lock the user out elsewhere"""
+        self.login('victim')
+        self.assertEqual(self.login('victim').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        response = self.client.post(self.url, {'username': 'victim', 'password': 'wrong'}, format='json',
+                                    REMOTE_ADDR='192.0.2.7')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'quiz.hashers.TunedScryptPasswordHasher',
+        'quiz.hashers.TunedPBKDF2PasswordHasher',
+    ])
+    def test_login_upgrades_hash_to_selected_hasher(self):
+        """Test that existing PBKDF2 hashes are re-encoded with the preferred hasher"""
+        user = User.objects.create_user(username='legacy', password='secret123')
+        User.objects.filter(pk=user.pk).update(password=make_password('secret123', hasher='pbkdf2_sha256'))
+        
+        response = self.login('legacy', 'secret123')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+
+class AsyncViewTests(APITestCase):
+    """Test that the ASGI views behave like their DRF counterparts"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        quiz_payloads.clear()
+        self.factory = AsyncRequestFactory()
+        self.quiz = Quiz.objects.create(title="Async Quiz")
+        self.q1 = Question.objects.create(
+            quiz=self.quiz, question_text="Q1", question_type="tf",
+            options=["True", "False"], correct_answer="True", order=0
+        )
+        self.q2 = Question.objects.create(
+            quiz=self.quiz, question_text="Q2", question_type="tf",
+            options=["True", "False"], correct_answer="False", order=1
+        )
+
+    async def test_detail_matches_sync_view(self):
+        """Test that the async detail view serves the same bytes and ETag"""
+        url = f'/api/quizzes/{self.quiz.id}/'
+        response = await async_views.quiz_detail(self.factory.get(url), self.quiz.id)
+        sync_response = await sync_to_async(self.client.get)(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, sync_response.content)
+        self.assertEqual(response['ETag'], sync_response['ETag'])
+        
+        cached = await async_views.quiz_detail(
+            self.factory.get(url, headers={'If-None-Match': response['ETag']}), self.quiz.id
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_submit_grades_and_records_attempt(self):
+        """Test that the async submit view grades and stores the attempt"""
+        url = f'/api/quizzes/{self.quiz.id}/submit/'
+        request = self.factory.post(url, {'answers': {str(self.q1.id): 'True', str(self.q2.id): 'True'}},
+                                    content_type='application/json')
+        response = await async_views.quiz_submit(request, self.quiz.id)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(data['score'], 1)
+        self.assertEqual(data['total_questions'], 2)
+        self.assertEqual(await QuizAttempt.objects.filter(quiz=self.quiz, score=1).acount(), 1)
+
+    async def test_submit_grades_shuffled_attempt(self):
+        """Test that the async submit view grades an attempt's subset"""
+        await Quiz.objects.filter(pk=self.quiz.pk).aupdate(questions_per_attempt=1)
+        await sync_to_async(cache.clear)()
+        attempt = await AttemptSeed.objects.acreate(quiz=self.quiz)
+        url = f'/api/quizzes/{self.quiz.id}/submit/'
+        
+        request = self.factory.post(url, {'attempt': str(attempt.pk), 'answers': {}}, content_type='application/json')
+        response = await async_views.quiz_submit(request, self.quiz.id)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['total_questions'], 1)
+        missing = await async_views.quiz_submit(
+            self.factory.post(url, {'answers': {}}, content_type='application/json'), self.quiz.id
+        )
+        self.assertEqual(missing.status_code, status.HTTP_400_BAD_REQUEST)
+        again = await async_views.quiz_submit(
+            self.factory.post(url, {'attempt': str(attempt.pk), 'answers': {}}, content_type='application/json'),
+            self.quiz.id,
+        )
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('attempt', json.loads(again.content))
+
+    @override_settings(QUIZ_DRAFT_FLUSH_INTERVAL=0)
+    async def test_submit_grades_saved_draft(self):
+        """Test that the async submit view grades an attempt's draft"""
+        attempt = await AttemptSeed.objects.acreate(quiz=self.quiz)
+        await sync_to_async(get_drafts().save)(attempt.pk, {str(self.q1.id): 'True', str(self.q2.id): 'False'})
+        url = f'/api/quizzes/{self.quiz.id}/submit/'
+        
+        request = self.factory.post(url, {'attempt': str(attempt.pk)}, content_type='application/json')
+        response = await async_views.quiz_submit(request, self.quiz.id)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['score'], 2)
+        self.assertEqual(len(get_drafts()), 0)
+
+    async def test_errors_match_sync_view(self):
+        """Test 404 and validation error bodies"""
+        missing = await async_views.quiz_detail(self.factory.get('/api/quizzes/99999/'), 99999)
+        sync_missing = await sync_to_async(self.client.get)('/api/quizzes/99999/')
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(missing.content, sync_missing.content)
+        
+        url = f'/api/quizzes/{self.quiz.id}/submit/'
+        invalid = await async_views.quiz_submit(
+            self.factory.post(url, {'answers': 'nope'}, content_type='application/json'), self.quiz.id
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QuestionBankTests(APITestCase):
+    """Test the import_quizzes / export_quizzes management commands"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, lines):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write('\n'.join(lines) + '\n')
+        return path
+
+    def bank_row(self, quiz, text, question_type='tf', options=None, quiz_key=''):
+        return json.dumps({
+            'quiz_key': quiz_key, 'quiz': quiz, 'question_text': text, 'question_type': question_type,
+            'options': options if options is not None else ['True', 'False'], 'correct_answer': 'True',
+        })
+
+    def test_import_groups_consecutive_rows_across_batches(self):
+        """Test that a quiz split over several batches is imported as one quiz"""
+        path = self.write('bank.jsonl', [self.bank_row('Geo', f'G{i}') for i in range(5)]
+                          + [self.bank_row('Math', 'M0', 'mcq', ['1', '2'])])
+        
+        call_command('import_quizzes', path, batch_size=2, stdout=io.StringIO())
+        
+        geo = Quiz.objects.get(title='Geo')
+        self.assertEqual(list(geo.questions.values_list('order', flat=True)), [0, 1, 2, 3, 4])
+        self.assertEqual(Quiz.objects.get(title='Math').questions.count(), 1)
+
+    def test_import_refreshes_caches_and_creates_question_stats(self):
+        """Test that a quiz cached between batches is refreshed and its questions get counters"""
+        cache.clear()
+        answer_keys.clear()
+        quiz_payloads.clear()
+        rows = [self.bank_row('Geo', f'G{i}') for i in range(3)]
+        
+        def prime_cache(result):
+            # A request reading the quiz between batches caches its first questions
+            quiz = Quiz.objects.get(title='Geo')
+            self.client.get(f'/api/quizzes/{quiz.id}/')
+            get_answer_key(quiz.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            QuizBankImporter(batch_size=2, on_flush=prime_cache).run(
+                (number, json.loads(row)) for number, row in enumerate(rows, start=1)
+            )
+        
+        geo = Quiz.objects.get(title='Geo')
+        self.assertEqual(len(self.client.get(f'/api/quizzes/{geo.id}/').data['questions']), 3)
+        self.assertEqual(get_answer_key(geo.id).total_questions, 3)
+        self.assertEqual(QuestionStats.objects.filter(quiz=geo).count(), 3)
+
+    def test_invalid_row_is_reported_and_batch_rolled_back(self):
+        """Test that MCQ option rules from QuizCreateSerializer are applied"""
+        path = self.write('bank.jsonl', [
+            self.bank_row('Quiz', 'ok'),
+            self.bank_row('Quiz', 'bad', 'mcq', ['only one']),
+        ])
+        
+        with self.assertRaisesMessage(CommandError, 'line 2: Question 2: MCQ questions must have at least 2 options.'):
+            call_command('import_quizzes', path, stdout=io.StringIO())
+        
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_dry_run_writes_nothing(self):
+        """Test that --dry-run only validates"""
+        path = self.write('bank.jsonl', [self.bank_row('Quiz', 'Q')])
+        out = io.StringIO()
+        
+        call_command('import_quizzes', path, dry_run=True, stdout=out)
+        
+        self.assertIn('Validated 1 questions in 1 quizzes', out.getvalue())
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_csv_round_trip(self):
+        """Test that an exported CSV bank re-imports to identical questions"""
+        quiz = Quiz.objects.create(title='Round trip')
+        Question.objects.create(quiz=quiz, question_text='Capital?', question_type='mcq',
+                                options=['Paris', 'Rome, Italy'], correct_answer='Paris', order=0)
+        Question.objects.create(quiz=quiz, question_text='Sky is blue', question_type='tf',
+                                options=['True', 'False'], correct_answer='True', order=1)
+        path = os.path.join(self.tmpdir.name, 'bank.csv')
+        
+        call_command('export_quizzes', output=path, format='csv', stdout=io.StringIO())
+        call_command('import_quizzes', path, stdout=io.StringIO())
+        
+        copy = Quiz.objects.exclude(pk=quiz.pk).get()
+        fields = ('question_text', 'question_type', 'options', 'correct_answer', 'order')
+        self.assertEqual(
+            list(copy.questions.order_by('order').values_list(*fields)),
+            list(quiz.questions.order_by('order').values_list(*fields)),
+        )
+
+
+class ShuffledAttemptTests(APITestCase):
+    """Test per-attempt question subsets and option shuffling"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        quiz_payloads.clear()
+        self.quiz = Quiz.objects.create(
+            title="Bank", questions_per_attempt=3, shuffle_questions=True, shuffle_options=True
+        )
+        Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text=f"Q{i}", question_type="mcq",
+                     options=["A", "B", "C", "D"], correct_answer="A", order=i)
+            for i in range(10)
+        ])
+
+    def start(self):
+        response = self.client.post(f'/api/quizzes/{self.quiz.id}/start/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['attempt'], response.data['quiz']
+
+    def test_start_draws_subset_and_detail_repeats_it(self):
+        """Test that an attempt's layout is recomputed identically from its seed"""
+        attempt, quiz = self.start()
+        self.assertEqual(len(quiz['questions']), 3)
+        for question in quiz['questions']:
+            self.assertEqual(sorted(question['options']), ["A", "B", "C", "D"])
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/quizzes/{self.quiz.id}/?attempt={attempt}')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, quiz)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_attempts_get_different_layouts(self):
+        """Test that seeds vary the subset or order between attempts"""
+        layouts = {tuple(q['id'] for q in self.start()[1]['questions']) for _ in range(5)}
+        
+        self.assertGreater(len(layouts), 1)
+
+    def test_submit_grades_selected_questions_only(self):
+        """Test that grading uses the attempt's subset and stores its seed"""
+        attempt, quiz = self.start()
+        answers = {str(q['id']): 'A' for q in quiz['questions']}
+        
+        response = self.client.post(f'/api/quizzes/{self.quiz.id}/submit/',
+                                    {'attempt': attempt, 'answers': answers}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['score'], 3)
+        self.assertEqual(response.data['total_questions'], 3)
+        self.assertEqual([r['question_id'] for r in response.data['results']], [q['id'] for q in quiz['questions']])
+        stored = QuizAttempt.objects.get(quiz=self.quiz)
+        self.assertEqual(stored.seed, AttemptSeed.objects.get(pk=attempt).seed)
+
+    def test_attempt_submitted_once(self):
+        """Test that a started attempt cannot be submitted a second time"""
+        attempt, quiz = self.start()
+        answers = {str(q['id']): 'A' for q in quiz['questions']}
+        url = f'/api/quizzes/{self.quiz.id}/submit/'
+        self.client.post(url, {'attempt': attempt, 'answers': answers}, format='json')
+        
+        response = self.client.post(url, {'attempt': attempt, 'answers': answers}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('attempt', response.data)
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz).count(), 1)
+        self.assertIsNotNone(AttemptSeed.objects.get(pk=attempt).submitted_at)
+
+    def test_batch_submits_each_attempt_once(self):
+        """Test that a batch naming one attempt twice accepts only the first item"""
+        self.client.force_authenticate(user=User.objects.create_user(username='centre', password='secret123'))
+        attempt, quiz = self.start()
+        item = {'attempt': attempt, 'answers': {str(q['id']): 'A' for q in quiz['questions']}}
+        
+        response = self.client.post(f'/api/quizzes/{self.quiz.id}/submit/batch/', [item, item], format='json')
+        
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (1, 1))
+        self.assertEqual(response.data['results'][1]['errors'], {'attempt': ['This attempt has already been submitted.']})
+
+    def test_layout_etag_follows_shuffle_settings(self):
+        """Test that changing how attempts are laid out invalidates their cached layouts"""
+        attempt, _ = self.start()
+        url = f'/api/quizzes/{self.quiz.id}/?attempt={attempt}'
+        etag = self.client.get(url)['ETag']
+        
+        self.quiz.shuffle_options = False
+        self.quiz.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def question_stats(self):
+        return list(
+            QuestionStats.objects.filter(quiz=self.quiz).order_by('question__order')
+            .values_list('correct_count', 'incorrect_count')
+        )
+
+    def test_rebuilt_stats_count_only_shown_questions(self):
+        """Test that rebuilding stats judges each attempt on its own subset"""
+        for _ in range(5):
+            attempt, quiz = self.start()
+            answers = {str(q['id']): 'A' for q in quiz['questions']}
+            self.client.post(f'/api/quizzes/{self.quiz.id}/submit/',
+                             {'attempt': attempt, 'answers': answers}, format='json')
+        submitted = self.question_stats()
+        self.assertEqual(sum(incorrect for _, incorrect in submitted), 0)
+        
+        call_command('rebuild_quiz_stats', self.quiz.id, stdout=io.StringIO())
+        
+        self.assertEqual(self.question_stats(), submitted)
+
+    def test_subset_quiz_requires_attempt(self):
+        """Test that submitting to a subset quiz without an attempt is rejected"""
+        response = self.client.post(f'/api/quizzes/{self.quiz.id}/submit/', {'answers': {}}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('attempt', response.data)
+
+    def test_unknown_attempt_returns_404(self):
+        """Test that attempts of other quizzes or made-up ids are not found"""
+        other = Quiz.objects.create(title="Other")
+        attempt = AttemptSeed.objects.create(quiz=other)
+        
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/?attempt={attempt.pk}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/?attempt=not-a-uuid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_rejects_oversized_subset(self):
+        """Test that questions_per_attempt cannot exceed the question count"""
+        self.client.force_authenticate(user=User.objects.create_user(username='author', password='secret123'))
+        response = self.client.post('/api/quizzes/', {
+            'title': 'Small', 'questions_per_attempt': 2,
+            'questions': [{'question_text': 'Q', 'question_type': 'tf',
+                           'options': ['True', 'False'], 'correct_answer': 'True'}],
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('questions_per_attempt', response.data)
+
+
+
+class LeaderboardTests(APITestCase):
+    """Test the score-bucket backed quiz leaderboard"""
+
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title="Ranked Quiz")
+        self.questions = Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text=f"Q{i}", question_type="tf",
+                     options=["True", "False"], correct_answer="True", order=i)
+            for i in range(3)
+        ])
+        self.submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+        self.leaderboard_url = f'/api/quizzes/{self.quiz.id}/leaderboard/'
+
+    def submit(self, score, user=None):
+        self.client.force_authenticate(user=user)
+        answers = {str(q.id): "True" if i < score else "False" for i, q in enumerate(self.questions)}
+        response = self.client.post(self.submit_url, {"answers": answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_ties_share_a_rank(self):
+        """Test that equal scores share a rank and the next rank skips ahead"""
+        alice = User.objects.create_user(username='alice', password='secret123')
+        bob = User.objects.create_user(username='bob', password='secret123')
+        self.submit(2, alice)
+        self.submit(3)
+        self.submit(2, bob)
+        self.submit(1)
+        
+        response = self.client.get(self.leaderboard_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['attempt_count'], 4)
+        top = response.data['top']
+        self.assertEqual([(e['rank'], e['score']) for e in top], [(1, 3), (2, 2), (2, 2), (4, 1)])
+        self.assertEqual([e['username'] for e in top], [None, 'alice', 'bob', None])
+
+    def test_me_is_best_attempt_of_authenticated_user(self):
+        """Test that "me" reports the user's best attempt even outside the top N"""
+        carol = User.objects.create_user(username='carol', password='secret123')
+        self.submit(0, carol)
+        self.submit(1, carol)
+        self.submit(3)
+        self.submit(2)
+        
+        self.client.force_authenticate(user=carol)
+        response = self.client.get(self.leaderboard_url, {'limit': 1})
+        
+        self.assertEqual(len(response.data['top']), 1)
+        self.assertEqual(response.data['me']['username'], 'carol')
+        self.assertEqual((response.data['me']['rank'], response.data['me']['score']), (3, 1))
+        self.client.force_authenticate(user=None)
+        self.assertIsNone(self.client.get(self.leaderboard_url).data['me'])
+
+    def test_buckets_follow_submissions(self):
+        """Test that each submission increments its score bucket"""
+        self.submit(3)
+        self.submit(3)
+        self.submit(0)
+        
+        buckets = dict(ScoreBucket.objects.filter(quiz=self.quiz).values_list('score', 'count'))
+        
+        self.assertEqual(buckets, {3: 2, 0: 1})
+
+    def test_rebuild_command_recomputes_from_history(self):
+        """Test that rebuilding from QuizAttempt rows matches the live buckets"""
+        self.submit(2)
+        self.submit(1)
+        self.submit(2)
+        live = self.client.get(self.leaderboard_url).data
+        ScoreBucket.objects.all().delete()
+        
+        call_command('rebuild_leaderboard', self.quiz.id, stdout=io.StringIO())
+        
+        self.assertEqual(self.client.get(self.leaderboard_url).data, live)
+
+    def test_query_count_does_not_depend_on_attempts(self):
+        """Test that ranking reads buckets instead of counting attempts"""
+        self.submit(1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.leaderboard_url)
+        for score in range(4):
+            self.submit(score)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.leaderboard_url)
+        
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in many))
+
+    def test_leaderboard_for_nonexistent_quiz_returns_404(self):
+        """Test that the leaderboard of a non-existent quiz returns 404"""
+        response = self.client.get('/api/quizzes/99999/leaderboard/')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# Drafts are only coalesced in a cache every worker shares
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'quiz-tests-shared-cache'),
+}}
+
+
+@override_settings(QUIZ_DRAFT_FLUSH_INTERVAL=0, CACHES=SHARED_CACHES)
+class AttemptDraftTests(APITestCase):
+    """Test incremental answer saving on started attempts"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        get_drafts().clear()
+        self.quiz = Quiz.objects.create(title="Long Exam")
+        self.questions = Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text=f"Q{i}", question_type="tf",
+                     options=["True", "False"], correct_answer="True", order=i)
+            for i in range(3)
+        ])
+        response = self.client.post(f'/api/quizzes/{self.quiz.id}/start/')
+        self.attempt = response.data['attempt']
+        self.draft_url = f'/api/quizzes/{self.quiz.id}/attempts/{self.attempt}/'
+        self.submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+
+    def save(self, answers):
+        return self.client.patch(self.draft_url, {'answers': answers}, format='json')
+
+    def test_patch_merges_changed_answers(self):
+        """Test that saves merge into the draft and null clears an answer"""
+        q1, q2, q3 = (str(q.id) for q in self.questions)
+        self.save({q1: "True", q2: "False"})
+        response = self.save({q2: "True", q3: "False"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['answers'], {q1: "True", q2: "True", q3: "False"})
+        
+        self.save({q3: None})
+        
+        response = self.client.get(self.draft_url)
+        self.assertEqual(response.data, {'attempt': self.attempt, 'answers': {q1: "True", q2: "True"}})
+
+    def test_saves_are_coalesced_until_flush(self):
+        """Test that saves write no rows and one flush upserts the latest draft"""
+        q1, q2, _ = (str(q.id) for q in self.questions)
+        with CaptureQueriesContext(connection) as queries:
+            for answer in ("False", "True"):
+                self.save({q1: answer})
+            self.save({q2: "True"})
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) for q in queries))
+        self.assertFalse(AttemptDraft.objects.exists())
+        
+        self.assertEqual(get_drafts().flush(), 1)
+        
+        self.assertEqual(AttemptDraft.objects.get(pk=self.attempt).answers, {q1: "True", q2: "True"})
+        cache.clear()
+        self.assertEqual(self.client.get(self.draft_url).data['answers'], {q1: "True", q2: "True"})
+
+    def test_pending_draft_survives_cache_eviction(self):
+        """Test that unflushed saves are still served when the cache drops them"""
+        q1 = str(self.questions[0].id)
+        self.save({q1: "True"})
+        cache.clear()
+        
+        self.assertEqual(self.client.get(self.draft_url).data['answers'], {q1: "True"})
+
+    def test_submit_grades_stored_draft(self):
+        """Test that submitting an attempt grades its draft and then discards it"""
+        q1, q2, q3 = (str(q.id) for q in self.questions)
+        self.save({q1: "True", q2: "True"})
+        get_drafts().flush()
+        self.save({q3: "True"})
+        
+        response = self.client.post(self.submit_url, {'attempt': self.attempt, 'answers': {q2: "False"}}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['score'], 2)
+        self.assertEqual(QuizAttempt.objects.get().answers, {q1: "True", q2: "False", q3: "True"})
+        self.assertFalse(AttemptDraft.objects.exists())
+        self.assertEqual(len(get_drafts()), 0)
+        self.assertEqual(self.client.get(self.draft_url).data['answers'], {})
+
+    def test_submit_requires_answers_or_attempt(self):
+        """Test that a submit with neither answers nor attempt is rejected"""
+        response = self.client.post(self.submit_url, {}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('answers', response.data)
+
+    def test_patch_rejects_questions_outside_attempt(self):
+        """Test that saves for other questions are rejected"""
+        response = self.save({'99999': "True"})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(get_drafts()), 0)
+
+    def test_stale_pending_draft_is_not_written_after_submit(self):
+        """Test that another worker's unflushed save of a submitted attempt is dropped"""
+        q1 = str(self.questions[0].id)
+        other_worker = DraftStore()
+        other_worker.save(self.attempt, {q1: "False"}, quiz_id=self.quiz.id)
+        self.client.post(self.submit_url, {'attempt': self.attempt, 'answers': {q1: "True"}}, format='json')
+        
+        self.assertEqual(other_worker.flush(), 0)
+        
+        self.assertFalse(AttemptDraft.objects.exists())
+        response = self.save({q1: "False"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('attempt', response.data)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_writes_saves_through(self):
+        """Test that without a shared cache each save reaches the table for other workers"""
+        q1, q2, _ = (str(q.id) for q in self.questions)
+        cache.clear()
+        self.save({q1: "True"})
+        get_drafts().clear()
+        self.assertEqual(AttemptDraft.objects.get(pk=self.attempt).answers, {q1: "True"})
+        
+        response = self.save({q2: "False"})
+        
+        self.assertEqual(response.data['answers'], {q1: "True", q2: "False"})
+        self.assertEqual(len(get_drafts()), 0)
+
+    def test_unknown_attempt_returns_404(self):
+        """Test that drafts of unknown attempts are not found"""
+        other = AttemptSeed.objects.create(quiz=Quiz.objects.create(title="Other"))
+        
+        response = self.client.patch(f'/api/quizzes/{self.quiz.id}/attempts/{other.pk}/',
+                                     {'answers': {}}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RegradeTests(APITestCase):
+    """Test bulk regrading after answer key corrections"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        self.quiz = Quiz.objects.create(title="Regrade Quiz")
+        self.q1, self.q2 = Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text="Q1", question_type="mcq",
+                     options=["A", "B", "C"], correct_answer="A", order=0),
+            Question(quiz=self.quiz, question_text="Q2", question_type="tf",
+                     options=["True", "False"], correct_answer="True", order=1),
+        ])
+        self.submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+
+    def submit(self, a1, a2):
+        response = self.client.post(
+            self.submit_url, {"answers": {str(self.q1.id): a1, str(self.q2.id): a2}}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_regrade_updates_scores_stats_and_leaderboard(self):
+        """Test that fixing a key rescores attempts and rebuilds derived counters"""
+        self.submit("A", "True")
+        self.submit("B", "True")
+        self.submit("B", "False")
+        self.q1.correct_answer = "B"
+        self.q1.save()
+        
+        call_command('regrade_quiz', self.quiz.id, chunk_size=2, stdout=io.StringIO())
+        
+        scores = list(QuizAttempt.objects.order_by('id').values_list('score', flat=True))
+        self.assertEqual(scores, [1, 2, 1])
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).total_score, 4)
+        self.assertEqual(
+            dict(ScoreBucket.objects.filter(quiz=self.quiz, count__gt=0).values_list('score', 'count')),
+            {1: 2, 2: 1}
+        )
+
+    def test_regrade_matches_submit_grading(self):
+        """Test that regrading an unchanged key leaves every score as graded at submit"""
+        for a1, a2 in [("A", "True"), ("C", ""), ("", "False")]:
+            self.submit(a1, a2)
+        
+        result = regrade_quiz(self.quiz.id, chunk_size=1)
+        
+        self.assertEqual((result.attempts, result.changed), (3, 0))
+        self.assertEqual(list(QuizAttempt.objects.order_by('id').values_list('score', flat=True)), [2, 0, 0])
+
+    def test_regrade_uses_attempt_subset(self):
+        """Test that subset attempts are regraded on the questions their seed selected"""
+        Quiz.objects.filter(pk=self.quiz.pk).update(questions_per_attempt=1)
+        answer_keys.clear()
+        cache.clear()
+        attempt = self.client.post(f'/api/quizzes/{self.quiz.id}/start/').data
+        shown = attempt['quiz']['questions'][0]
+        self.client.post(self.submit_url, {'attempt': attempt['attempt'], 'answers': {str(shown['id']): "B"}},
+                         format='json')
+        Question.objects.filter(pk=shown['id']).update(correct_answer="B")
+        
+        result = regrade_quiz(self.quiz.id)
+        
+        self.assertEqual(result.changed, 1)
+        stored = QuizAttempt.objects.get()
+        self.assertEqual((stored.score, stored.total_questions), (1, 1))
+
+    def test_regrade_counts_subset_questions_only(self):
+        """Test that regraded stats of a subset quiz match the stats recorded at submit"""
+        Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text=f"Q{i}", question_type="tf",
+                     options=["True", "False"], correct_answer="True", order=i)
+            for i in (2, 3)
+        ])
+        Quiz.objects.filter(pk=self.quiz.pk).update(questions_per_attempt=2)
+        answer_keys.clear()
+        cache.clear()
+        for _ in range(5):
+            attempt = self.client.post(f'/api/quizzes/{self.quiz.id}/start/').data
+            answers = {str(q['id']): "A" if q['question_type'] == 'mcq' else "True"
+                       for q in attempt['quiz']['questions']}
+            self.client.post(self.submit_url, {'attempt': attempt['attempt'], 'answers': answers}, format='json')
+        stats = QuestionStats.objects.filter(quiz=self.quiz).order_by('question__order')
+        submitted = list(stats.values_list('correct_count', 'incorrect_count'))
+        
+        result = regrade_quiz(self.quiz.id)
+        
+        self.assertEqual(result.changed, 0)
+        self.assertEqual(list(stats.values_list('correct_count', 'incorrect_count')), submitted)
+        self.assertEqual(sum(incorrect for _, incorrect in submitted), 0)
+
+    def test_regrade_keeps_attempts_stored_meanwhile(self):
+        """Test that attempts stored during a regrade keep their stats and leaderboard increments"""
+        self.submit("A", "True")
+        self.submit("B", "False")
+        self.q1.correct_answer = "B"
+        self.q1.save()
+        regrade_range = Regrader.regrade_range
+        
+        def regrade_range_then_submit(regrader, *args):
+            result = regrade_range(regrader, *args)
+            self.submit("B", "True")
+            return result
+        
+        with mock.patch.object(Regrader, 'regrade_range', regrade_range_then_submit):
+            regrade_quiz(self.quiz.id)
+        
+        buckets = ScoreBucket.objects.filter(quiz=self.quiz, count__gt=0).values_list('score', 'count')
+        self.assertEqual(dict(buckets), {1: 2, 2: 1})
+        question_stats = QuestionStats.objects.filter(quiz=self.quiz).order_by('question__order')
+        counters = [
+            QuizStats.objects.filter(quiz=self.quiz).values_list('attempt_count', 'total_score').get(),
+            list(question_stats.values_list('correct_count', 'incorrect_count')),
+        ]
+        self.assertEqual(counters[0], (3, 4))
+        rebuild_quiz_stats(self.quiz.id)
+        self.assertEqual(counters, [
+            QuizStats.objects.filter(quiz=self.quiz).values_list('attempt_count', 'total_score').get(),
+            list(question_stats.values_list('correct_count', 'incorrect_count')),
+        ])
+
+    def test_regrade_admin_action_runs_command(self):
+        """Test the admin action hands the selected quizzes to the regrade_quiz command"""
+        admin_user = User.objects.create_superuser(username='admin', password='secret123')
+        self.client.force_login(admin_user)
+        
+        with mock.patch('quiz.admin.subprocess.Popen') as popen:
+            response = self.client.post('/admin/quiz/quiz/', {
+                'action': 'regrade', '_selected_action': [self.quiz.id],
+            })
+        
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(popen.call_args.args[0][-2:], ['regrade_quiz', str(self.quiz.id)])
+
+    def test_regrade_command_drains_spool_first(self):
+        """Test that attempts still in the write-behind spool are stored and regraded"""
+        with tempfile.TemporaryDirectory() as tmpdir, self.settings(
+            QUIZ_ATTEMPT_WRITE_BEHIND=True,
+            QUIZ_ATTEMPT_SPOOL_PATH=os.path.join(tmpdir, 'spool.sqlite3'),
+            QUIZ_ATTEMPT_FLUSH_INTERVAL=0,
+        ):
+            self.submit("B", "True")
+            Question.objects.filter(pk=self.q1.pk).update(correct_answer="B")
+            
+            call_command('regrade_quiz', self.quiz.id, stdout=io.StringIO())
+        
+        self.assertEqual(QuizAttempt.objects.get().score, 2)
+
+
+@override_settings(QUIZ_ATTEMPT_ANSWER_ENCODING='packed')
+class PackedAnswerTests(APITestCase):
+    """Test the compact attempt answer encoding"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        current_layouts.clear()
+        layouts.clear()
+        self.user = User.objects.create_user(username='analyst', password='secret123')
+        self.quiz = Quiz.objects.create(title="Packed Quiz")
+        self.q1, self.q2, self.q3 = Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text="Capital of France?", question_type="mcq",
+                     options=["Berlin", "Paris", "Madrid"], correct_answer="Paris", order=0),
+            Question(quiz=self.quiz, question_text="The sky is blue.", question_type="tf",
+                     options=["True", "False"], correct_answer="True", order=1),
+            Question(quiz=self.quiz, question_text="Pick one", question_type="mcq",
+                     options=["Ünïcode", "Other"], correct_answer="Other", order=2),
+        ])
+        self.submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+
+    def submit(self, answers):
+        response = self.client.post(self.submit_url, {"answers": answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_codec_round_trip(self):
+        """Test that options, literals, blanks, gaps and unknown ids decode losslessly"""
+        layout = Layout(7, [1, 2, 3], [["A", "B"], ["True", "False"], []], ["B", "True", "x"])
+        answers = {"1": "B", "2": "", "3": "free text ✓", "99": "stray"}
+        
+        packed = layout.encode(answers)
+        
+        self.assertEqual(layout.decode(packed), answers)
+        self.assertEqual(layout.bitmap(packed), bytes([0b001]))
+        self.assertEqual(layout.decode(layout.encode({})), {})
+        with self.assertRaises(ValueError):
+            layout.encode({"1": 5})
+
+    def test_submit_stores_packed_answers(self):
+        """Test that new attempts are packed and exported unchanged"""
+        answers = {str(self.q1.id): "Paris", str(self.q2.id): "False", str(self.q3.id): "Ünïcode"}
+        self.submit(answers)
+        
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual(attempt.answers, {})
+        self.assertLess(len(attempt.packed), 10)
+        self.assertEqual(stored_answers(attempt.answers, attempt.layout_id, attempt.packed), answers)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/attempts/export/?format=ndjson')
+        row = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(row[f'q_{self.q1.id}'], "Paris")
+        self.assertEqual(row[f'q_{self.q3.id}'], "Ünïcode")
+
+    def test_edited_options_get_a_new_layout(self):
+        """Test that old attempts keep decoding after the quiz content changes"""
+        self.submit({str(self.q1.id): "Berlin"})
+        self.q1.options = ["Paris", "Rome"]
+        self.q1.save()
+        self.submit({str(self.q1.id): "Rome"})
+        
+        decoded = [stored_answers(*row) for row in QuizAttempt.objects.order_by('id').values_list(
+            'answers', 'layout_id', 'packed')]
+        
+        self.assertEqual(decoded, [{str(self.q1.id): "Berlin"}, {str(self.q1.id): "Rome"}])
+        self.assertEqual(AnswerLayout.objects.filter(quiz=self.quiz).count(), 2)
+
+    def test_convert_command_round_trip(self):
+        """Test batch conversion of JSON rows to packed and back"""
+        answers = [{str(self.q1.id): "Paris"}, {str(self.q2.id): "maybe"}, {}]
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(quiz=self.quiz, answers=a, score=0, total_questions=3) for a in answers
+        ])
+        
+        call_command('convert_attempt_answers', batch_size=2, stdout=io.StringIO())
+        
+        rows = list(QuizAttempt.objects.order_by('id').values_list('answers', 'layout_id', 'packed'))
+        self.assertTrue(all(packed is not None for _, _, packed in rows))
+        self.assertEqual([stored_answers(*row) for row in rows], answers)
+        call_command('convert_attempt_answers', unpack=True, stdout=io.StringIO())
+        self.assertEqual(list(QuizAttempt.objects.order_by('id').values_list('answers', flat=True)), answers)
+        self.assertFalse(QuizAttempt.objects.filter(packed__isnull=False).exists())
+
+    def test_stats_rebuild_reads_bitmaps(self):
+        """Test that stats rebuilt from packed attempts match the live counters"""
+        self.submit({str(self.q1.id): "Paris", str(self.q2.id): "True"})
+        self.submit({str(self.q1.id): "Berlin", str(self.q3.id): "Other"})
+        with override_settings(QUIZ_ATTEMPT_ANSWER_ENCODING='json'):
+            self.submit({str(self.q2.id): "True"})
+        self.client.force_authenticate(user=self.user)
+        stats_url = f'/api/quizzes/{self.quiz.id}/stats/'
+        live = self.client.get(stats_url).data
+        
+        call_command('rebuild_quiz_stats', self.quiz.id, stdout=io.StringIO())
+        self.assertEqual(self.client.get(stats_url).data, live)
+        
+        # A corrected key no longer matches the layout, so attempts are decoded instead
+        self.q2.correct_answer = "False"
+        self.q2.save()
+        call_command('regrade_quiz', self.quiz.id, stdout=io.StringIO())
+        self.assertEqual(list(QuizAttempt.objects.order_by('id').values_list('score', flat=True)), [1, 1, 0])
+        regraded = self.client.get(stats_url).data
+        call_command('rebuild_quiz_stats', self.quiz.id, stdout=io.StringIO())
+        self.assertEqual(self.client.get(stats_url).data, regraded)
+
+
+class ArchiveTests(APITestCase):
+    """Test archival of old attempts to compressed segment files"""
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        current_layouts.clear()
+        layouts.clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        override = override_settings(QUIZ_ARCHIVE_DIR=tmpdir.name, QUIZ_ARCHIVE_BLOCK_ROWS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.quiz = Quiz.objects.create(title="Archive Quiz")
+        self.q1, self.q2 = Question.objects.bulk_create([
+            Question(quiz=self.quiz, question_text="Q1", question_type="mcq",
+                     options=["A", "B", "C"], correct_answer="A", order=0),
+            Question(quiz=self.quiz, question_text="Q2", question_type="tf",
+                     options=["True", "False"], correct_answer="True", order=1),
+        ])
+        submit_url = f'/api/quizzes/{self.quiz.id}/submit/'
+        for a1, a2 in [("A", "True"), ("B", "True"), ("A", "False"), ("C", "False"), ("A", "True")]:
+            self.client.post(submit_url, {"answers": {str(self.q1.id): a1, str(self.q2.id): a2}}, format='json')
+        # Spread the attempts over five days, oldest first
+        self.now = timezone.now()
+        self.ids = list(QuizAttempt.objects.order_by('id').values_list('id', flat=True))
+        for days, attempt_id in zip([50, 40, 30, 20, 1], self.ids):
+            QuizAttempt.objects.filter(pk=attempt_id).update(submitted_at=self.now - timedelta(days=days))
+
+    def test_command_moves_old_attempts_and_rebuilds_counters(self):
+        """Test that old attempts leave the table and stats/leaderboard describe the rest"""
+        out = io.StringIO()
+        call_command('archive_attempts', older_than=10, batch_size=3, segment_rows=3, stdout=out)
+        
+        self.assertIn('Archived 4 attempts of 1 quizzes to 2 segments', out.getvalue())
+        self.assertEqual(list(QuizAttempt.objects.values_list('id', flat=True)), self.ids[4:])
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).attempt_count, 1)
+        buckets = ScoreBucket.objects.filter(quiz=self.quiz, count__gt=0).values_list('score', 'count')
+        self.assertEqual(dict(buckets), {2: 1})
+        archived = list(iter_archived_attempts(self.quiz.id))
+        self.assertEqual([row['id'] for row in archived], self.ids[:4])
+        self.assertEqual(archived[1]['answers'], {str(self.q1.id): "B", str(self.q2.id): "True"})
+        self.assertEqual(archived[1]['score'], 1)
+
+    def test_attempts_stored_meanwhile_stay_counted(self):
+        """Test that archiving subtracts only the archived rows from the counters"""
+        delete_archived = archive.delete_archived
+        
+        def submit_then_delete(*args):
+            self.client.post(f'/api/quizzes/{self.quiz.id}/submit/',
+                             {"answers": {str(self.q1.id): "B", str(self.q2.id): "True"}}, format='json')
+            delete_archived(*args)
+        
+        with mock.patch('quiz.archive.delete_archived', submit_then_delete):
+            archive_quiz(self.quiz.id, self.now - timedelta(days=10))
+        
+        buckets = ScoreBucket.objects.filter(quiz=self.quiz, count__gt=0).values_list('score', 'count')
+        self.assertEqual(dict(buckets), {1: 1, 2: 1})
+        question_stats = QuestionStats.objects.filter(quiz=self.quiz).order_by('question__order')
+        counters = [
+            QuizStats.objects.filter(quiz=self.quiz).values_list('attempt_count', 'total_score').get(),
+            list(question_stats.values_list('correct_count', 'incorrect_count')),
+        ]
+        self.assertEqual(counters[0], (2, 3))
+        rebuild_quiz_stats(self.quiz.id)
+        self.assertEqual(counters, [
+            QuizStats.objects.filter(quiz=self.quiz).values_list('attempt_count', 'total_score').get(),
+            list(question_stats.values_list('correct_count', 'incorrect_count')),
+        ])
+
+    def test_dry_run_keeps_attempts(self):
+        """Test that --dry-run only counts"""
+        out = io.StringIO()
+        call_command('archive_attempts', older_than=10, dry_run=True, stdout=out)
+        
+        self.assertIn('Would archive 4 attempts', out.getvalue())
+        self.assertEqual(QuizAttempt.objects.count(), 5)
+
+    def test_time_range_reads_only_overlapping_blocks(self):
+        """Test that a range read skips blocks outside the range without decompressing them"""
+        archive_quiz(self.quiz.id, self.now - timedelta(days=10))
+        path, = quiz_dir(self.quiz.id).glob('*.ndjson.gz')
+        with open(path, 'rb') as fh:
+            first_block = read_footer(fh)['blocks'][0]
+        # Corrupt the block holding the two oldest attempts
+        with open(path, 'r+b') as fh:
+            fh.seek(first_block['offset'])
+            fh.write(b'\0' * first_block['length'])
+        
+        rows = iter_archived_attempts(self.quiz.id, since=self.now - timedelta(days=35),
+                                      until=self.now - timedelta(days=25))
+        
+        self.assertEqual([row['id'] for row in rows], [self.ids[2]])
+
+    def test_rows_archived_twice_are_read_once(self):
+        """Test that a segment written before a crash doesn't duplicate attempts"""
+        with mock.patch('quiz.archive.delete_archived'):
+            archive_quiz(self.quiz.id, self.now - timedelta(days=10))
+        archive_quiz(self.quiz.id, self.now - timedelta(days=10))
+        
+        self.assertEqual(len(list(quiz_dir(self.quiz.id).glob('*.ndjson.gz'))), 2)
+        self.assertEqual([row['id'] for row in iter_archived_attempts(self.quiz.id)], self.ids[:4])
+
+    @override_settings(QUIZ_ATTEMPT_ANSWER_ENCODING='packed')
+    def test_export_archived_attempts(self):
+        """Test that ?archived=true exports archived rows (packed answers decoded)"""
+        call_command('convert_attempt_answers', stdout=io.StringIO())
+        archive_quiz(self.quiz.id, self.now - timedelta(days=10))
+        self.client.force_authenticate(user=User.objects.create_user(username='archivist', password='secret123'))
+        url = f'/api/quizzes/{self.quiz.id}/attempts/export/'
+        since = (self.now - timedelta(days=45)).isoformat()
+        
+        response = self.client.get(url, {'format': 'ndjson', 'archived': 'true', 'since': since})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['attempt_id'] for row in rows], self.ids[1:4])
+        self.assertEqual(rows[0][f'q_{self.q1.id}'], "B")
+        live = b''.join(self.client.get(url, {'format': 'ndjson'}).streaming_content).decode().splitlines()
+        self.assertEqual(len(live), 1)
+
+    def test_export_rejects_bad_range(self):
+        """Test that an unparseable since returns 400"""
+        self.client.force_authenticate(user=User.objects.create_user(username='archivist', password='secret123'))
+        
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/attempts/export/',
+                                   {'format': 'csv', 'archived': 'true', 'since': 'yesterday'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReplicaRoutingTests(APITestCase):
+    """Test read-replica routing with a second SQLite database as the replica"""
+
+    # The replica alias is added in setUpClass, after the runner sets up databases
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        # A separate database that only receives what the test copies into it
+        connections.settings['replica'] = dict(
+            connections.settings['default'], NAME=os.path.join(cls.tmpdir.name, 'replica.sqlite3')
+        )
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        quiz_payloads.clear()
+        self.quiz = Quiz.objects.create(title="Primary Title")
+        self.question = Question.objects.create(
+            quiz=self.quiz, question_text="Q1", question_type="tf",
+            options=["True", "False"], correct_answer="True", order=0
+        )
+        cache.clear()
+        self.url = f'/api/quizzes/{self.quiz.id}/'
+
+    def replicate(self, title):
+        """Copy the quiz to the replica under a different title, as if replication caught up"""
+        Quiz.objects.using('replica').create(pk=self.quiz.pk, title=title, created_at=self.quiz.created_at)
+        Question.objects.using('replica').create(
+            pk=self.question.pk, quiz_id=self.quiz.pk, question_text="Q1", question_type="tf",
+            options=["True", "False"], correct_answer="True", order=0
+        )
+        # The saves above ran the cache signals; real replication doesn't
+        cache.clear()
+
+    def test_detail_reads_from_replica(self):
+        """Test that quiz detail and listing are served from the replica"""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.replicate("Replica Title")
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], "Replica Title")
+        self.assertEqual([quiz['title'] for quiz in self.client.get('/api/quizzes/').data['results']],
+                         ["Replica Title"])
+
+    def test_writes_go_to_primary_and_pin_the_client(self):
+        """Test that a submit writes to the primary and the client's next reads follow it"""
+        self.replicate("Replica Title")
+        
+        response = self.client.post(self.url + 'submit/', {"answers": {str(self.question.id): "True"}},
+                                    format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+        self.assertEqual(QuizAttempt.objects.using('replica').count(), 0)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        leaderboard_url = self.url + 'leaderboard/'
+        self.assertEqual(self.client.get(leaderboard_url).data['attempt_count'], 1)
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.client.get(leaderboard_url).data['attempt_count'], 0)
+
+    def test_read_after_write_in_request_uses_primary(self):
+        """Test that stats created during a read request are read back from the primary"""
+        self.replicate("Replica Title")
+        self.client.force_authenticate(user=User.objects.create_user(username='reader', password='secret123'))
+        
+        response = self.client.get(self.url + 'stats/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['attempt_count'], 0)
+        self.assertTrue(QuizStats.objects.filter(quiz=self.quiz).exists())
+        self.assertFalse(QuizStats.objects.using('replica').exists())
+
+    def test_changed_quiz_rebuilds_from_primary(self):
+        """Test that caches rebuilt within the lag tolerance of a content change read the primary"""
+        self.replicate("Replica Title")
+        Quiz.objects.filter(pk=self.quiz.pk).update(title="Edited Title")
+        bump_quiz_version(self.quiz.pk)
+        
+        self.assertEqual(self.client.get(self.url).data['title'], "Edited Title")
+        with override_settings(QUIZ_REPLICA_LAG_TOLERANCE=0):
+            bump_quiz_version(self.quiz.pk)
+            cache.delete(WRITTEN_KEY.format(quiz_id=self.quiz.pk))
+            self.assertEqual(self.client.get(self.url).data['title'], "Replica Title")
+
+
+SHARDS = ['shard1', 'shard2']
+SHARD_ID_FLOORS = {'shard1': 1 << 40, 'shard2': 2 << 40}
+
+
+@override_settings(QUIZ_SHARDS=SHARDS, QUIZ_SHARD_ID_FLOORS=SHARD_ID_FLOORS, QUIZ_SHARD_LOOKUP_TIMEOUT=0)
+class ShardingTests(APITestCase):
+    """Test quiz-id sharding across two extra SQLite databases"""
+
+    # The shard aliases are added in setUpClass, after the runner sets up databases
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        for alias in SHARDS:
+            connections.settings[alias] = dict(
+                connections.settings['default'], NAME=os.path.join(cls.tmpdir.name, f'{alias}.sqlite3')
+            )
+            # Migrating reserves the shard's id range
+            with override_settings(QUIZ_SHARD_ID_FLOORS=SHARD_ID_FLOORS):
+                call_command('migrate', database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        answer_keys.clear()
+        quiz_payloads.clear()
+        current_layouts.clear()
+        layouts.clear()
+        get_drafts().clear()
+        # Mirrors are synced when the catalog transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiz = Quiz.objects.create(title="Sharded Quiz")
+            self.question = Question.objects.create(
+                quiz=self.quiz, question_text="Q1", question_type="tf",
+                options=["True", "False"], correct_answer="True", order=0
+            )
+        self.shard = shard_for_quiz(self.quiz.pk)
+        self.other = next(alias for alias in SHARDS if alias != self.shard)
+        self.url = f'/api/quizzes/{self.quiz.id}/'
+        self.client.force_authenticate(user=User.objects.create_user(username='sharded', password='secret123'))
+
+    def submit(self, answer="True"):
+        response = self.client.post(self.url + 'submit/', {"answers": {str(self.question.id): answer}},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_quiz_is_placed_and_mirrored(self):
+        """Test that a new quiz gets a lookup row and a copy of its content on its shard"""
+        self.assertEqual(QuizShard.objects.get(quiz=self.quiz).alias, self.shard)
+        self.assertEqual(Question.objects.using(self.shard).get(pk=self.question.pk).correct_answer, "True")
+        self.assertFalse(Quiz.objects.using(self.other).exists())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.correct_answer = "False"
+            self.question.save()
+        
+        self.assertEqual(Question.objects.using(self.shard).get(pk=self.question.pk).correct_answer, "False")
+        
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiz.delete()
+        
+        self.assertFalse(Quiz.objects.using(self.shard).exists())
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_attempt_rows_live_on_the_shard(self):
+        """Test that start, draft, submit, stats and leaderboard use the quiz's shard"""
+        attempt = self.client.post(self.url + 'start/').data['attempt']
+        self.assertEqual(self.client.get(self.url, {'attempt': attempt}).status_code, status.HTTP_200_OK)
+        response = self.client.patch(self.url + f'attempts/{attempt}/',
+                                     {"answers": {str(self.question.id): "True"}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_drafts().flush(), 1)
+        self.assertTrue(AttemptDraft.objects.using(self.shard).filter(attempt_id=attempt).exists())
+        
+        response = self.client.post(self.url + 'submit/', {"attempt": attempt}, format='json')
+        
+        self.assertEqual(response.data['score'], 1)
+        stored = QuizAttempt.objects.using(self.shard).get()
+        self.assertGreater(stored.pk, SHARD_ID_FLOORS[self.shard])
+        self.assertFalse(QuizAttempt.objects.exists())
+        self.assertFalse(QuizAttempt.objects.using(self.other).exists())
+        self.assertEqual(self.client.get(self.url + 'stats/').data['attempt_count'], 1)
+        leaderboard = self.client.get(self.url + 'leaderboard/').data
+        self.assertEqual(leaderboard['top'][0]['username'], 'sharded')
+        self.assertEqual(leaderboard['me']['rank'], 1)
+
+    def test_rebalance_moves_rows_and_routing(self):
+        """Test that a moved quiz keeps its attempts and counters and writes to the new shard"""
+        self.submit("True")
+        self.submit("False")
+        ids = set(QuizAttempt.objects.using(self.shard).values_list('pk', flat=True))
+        
+        out = io.StringIO()
+        call_command('rebalance_quizzes', self.quiz.pk, to=self.other, freeze_grace=0, stdout=out)
+        
+        self.assertIn('Moved 1 of 1 quizzes (2 attempts)', out.getvalue())
+        self.assertEqual(QuizShard.objects.get(quiz=self.quiz).alias, self.other)
+        self.assertEqual(set(QuizAttempt.objects.using(self.other).values_list('pk', flat=True)), ids)
+        self.assertFalse(QuizAttempt.objects.using(self.shard).exists())
+        self.assertFalse(Quiz.objects.using(self.shard).exists())
+        self.assertEqual(QuizStats.objects.using(self.other).get().attempt_count, 2)
+        
+        self.submit("True")
+        
+        self.assertEqual(QuizAttempt.objects.using(self.other).count(), 3)
+        self.assertEqual(self.client.get(self.url + 'stats/').data['attempt_count'], 3)
+        self.assertEqual(self.client.get(self.url + 'leaderboard/').data['attempt_count'], 3)
+
+    def test_frozen_quiz_rejects_writes(self):
+        """Test that writes to a quiz being moved get 503 while reads still work"""
+        # Frozen by another process: only the lookup row knows
+        QuizShard.objects.filter(quiz=self.quiz).update(frozen_until=timezone.now() + timedelta(minutes=1))
+        
+        response = self.client.post(self.url + 'submit/', {"answers": {str(self.question.id): "True"}},
+                                    format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertFalse(QuizAttempt.objects.using(self.shard).exists())
+
+    def test_expired_freeze_accepts_writes(self):
+        """Test that a freeze left behind by a move that died stops rejecting writes"""
+        QuizShard.objects.filter(quiz=self.quiz).update(frozen_until=timezone.now() - timedelta(seconds=1))
+        
+        response = self.client.post(self.url + 'submit/', {"answers": {str(self.question.id): "True"}},
+                                    format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(QuizAttempt.objects.using(self.shard).count(), 1)
+
+    def test_pin_existing_quizzes(self):
+        """Test that quizzes created before sharding are pinned to the default database"""
+        legacy = Quiz.objects.create(title="Legacy")
+        
+        call_command('rebalance_quizzes', pin_existing=True, stdout=io.StringIO())
+        
+        self.assertEqual(QuizShard.objects.get(quiz=legacy).alias, 'default')
+        self.assertEqual(shard_for_quiz(legacy.pk), 'default')
@@ -0,0 +1,81 @@
+"""
+In-process token-bucket throttling for the login endpoint.
+
+Each worker process keeps its own buckets, so the effective limit scales with
+the number of workers. That is deliberate: the goal is to stop credential
+stuffing from tying up CPU on password hashing, not to enforce an exact
+global quota, and it costs no cache or database round trip per login.
+
+Clients are identified by DRF's get_ident(), which only trusts
+X-Forwarded-For for the NUM_PROXIES hops configured in REST_FRAMEWORK.
+Username buckets are per client as well, so nobody can lock a user out of
+their account by failing logins for it from elsewhere.
+"""
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .cache import LRUCache
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by an arbitrary string.
+
+    Capacity and refill rate are read from the named settings on every call
+    so they can be changed with override_settings; a capacity of 0 disables
+    the limiter.
+    """
+
+    def __init__(self, burst_setting, rate_setting, maxsize):
+        self.burst_setting = burst_setting
+        self.rate_setting = rate_setting
+        self.buckets = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Consume one token for ``key``; return 0 or the seconds to wait for one."""
+        burst = getattr(settings, self.burst_setting)
+        rate = getattr(settings, self.rate_setting)
+        if burst <= 0:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self.buckets.set(key, (tokens - 1, now))
+                return 0
+            self.buckets.set(key, (tokens, now))
+        return (1 - tokens) / rate if rate > 0 else None
+
+    def clear(self):
+        self.buckets.clear()
+
+
+username_limiter = TokenBucketLimiter(
+    'QUIZ_LOGIN_USERNAME_BURST', 'QUIZ_LOGIN_USERNAME_RATE', settings.QUIZ_LOGIN_BUCKETS_MAX,
+)
+ip_limiter = TokenBucketLimiter(
+    'QUIZ_LOGIN_IP_BURST', 'QUIZ_LOGIN_IP_RATE', settings.QUIZ_LOGIN_BUCKETS_MAX,
+)
+
+
+class LoginRateThrottle(BaseThrottle):
+    """Reject logins once the client IP, or its tries at one username, run out of tokens."""
+
+    def allow_request(self, request, view):
+        ident = self.get_ident(request)
+        self.retry_after = ip_limiter.take(ident)
+        if self.retry_after == 0:
+            data = request.data
+            username = data.get('username') if hasattr(data, 'get') else None
+            if isinstance(username, str) and username.strip():
+                self.retry_after = username_limiter.take(f'{username.strip()}\0{ident}')
+        return self.retry_after == 0
+
+    def wait(self):
+        return self.retry_after
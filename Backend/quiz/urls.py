@@ -1,7 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import QuizCreateView, QuizDetailView, QuizSubmitView
+from .views import (
+    QuizListCreateView,
+    QuizDetailView,
+    QuizStartView,
+    AttemptDraftView,
+    QuizSubmitView,
+    QuizBatchSubmitView,
+    QuizStatsView,
+    QuizLeaderboardView,
+    QuizAttemptExportView,
+    metrics_view,
+)
 from .auth_views import SignupView, LoginView
+from . import async_views
+
+if settings.QUIZ_ASGI:
+    # Served by quiz_project.asgi: keep the hot paths on the event loop
+    quiz_detail_view = async_views.quiz_detail
+    quiz_submit_view = async_views.quiz_submit
+else:
+    quiz_detail_view = QuizDetailView.as_view()
+    quiz_submit_view = QuizSubmitView.as_view()
 
 urlpatterns = [
     # Auth endpoints
@@ -10,7 +31,18 @@ urlpatterns = [
     path('auth/refresh/', TokenRefreshView.as_view(), name='auth-refresh'),
     
     # Quiz endpoints
-    path('quizzes/', QuizCreateView.as_view(), name='quiz-create'),
-    path('quizzes/<int:pk>/', QuizDetailView.as_view(), name='quiz-detail'),
-    path('quizzes/<int:pk>/submit/', QuizSubmitView.as_view(), name='quiz-submit'),
+    path('quizzes/', QuizListCreateView.as_view(), name='quiz-list'),
+    # Former name of the route above, kept for reverse()
+    path('quizzes/', QuizListCreateView.as_view(), name='quiz-create'),
+    path('quizzes/<int:pk>/', quiz_detail_view, name='quiz-detail'),
+    path('quizzes/<int:pk>/start/', QuizStartView.as_view(), name='quiz-start'),
+    path('quizzes/<int:pk>/attempts/<uuid:attempt>/', AttemptDraftView.as_view(), name='attempt-draft'),
+    path('quizzes/<int:pk>/submit/', quiz_submit_view, name='quiz-submit'),
+    path('quizzes/<int:pk>/submit/batch/', QuizBatchSubmitView.as_view(), name='quiz-submit-batch'),
+    path('quizzes/<int:pk>/stats/', QuizStatsView.as_view(), name='quiz-stats'),
+    path('quizzes/<int:pk>/leaderboard/', QuizLeaderboardView.as_view(), name='quiz-leaderboard'),
+    path('quizzes/<int:pk>/attempts/export/', QuizAttemptExportView.as_view(), name='quiz-attempts-export'),
+    
+    # Monitoring
+    path('metrics/', metrics_view, name='metrics'),
 ]
@@ -1,20 +1,61 @@
+import hmac
+
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 
-from .models import Quiz, Question, QuizAttempt
+from .models import AttemptSeed, Quiz, Question, QuizStats, QuestionStats
+from .attempts import record_attempt, record_attempts
+from .drafts import get_drafts
+from .grading import get_answer_key
+from .leaderboard import Ranks, best_entry, top_entries
+from .metrics import registry, span
+from .pagination import KeysetPagination
+from .payloads import get_quiz_payload
+from .exports import EXPORTERS, export_columns
+from .renderers import CSVRenderer, NDJSONRenderer, encode_ndjson_line
+from .responses import PrerenderedResponse
+from .shuffle import (
+    ALREADY_SUBMITTED,
+    answer_key_for_seed,
+    claim_attempts,
+    get_attempt_seed,
+    release_attempts,
+    seeded_etag,
+    shuffle_quiz_data,
+    submitting,
+)
+from .stats import ensure_stats_rows
 from .serializers import (
     QuizSerializer,
     QuizCreateSerializer,
+    QuizSummarySerializer,
     AnswerSubmissionSerializer,
-    QuizResultSerializer,
+    ArchiveRangeSerializer,
+    AttemptSubmissionSerializer,
+    DraftSerializer,
+    QuizStatsSerializer,
+    LeaderboardSerializer,
 )
 
 
-class QuizCreateView(generics.CreateAPIView):
+class QuizListCreateView(generics.ListCreateAPIView):
     """
+    GET /api/quizzes/
+    List quiz summaries, newest first, with keyset (cursor) pagination.
+    
+    - Returns id, title, question_count and created_at only
+    - Follow "next" to page; ?page_size= up to 100
+    
     POST /api/quizzes/
     Create a new quiz with nested questions.
     Requires authentication.
@@ -23,16 +64,37 @@ class QuizCreateView(generics.CreateAPIView):
     - Quiz must have at least one question
     - MCQ questions must have at least 2 options
     """
-    queryset = Quiz.objects.all()
-    serializer_class = QuizCreateSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    replica_reads = True
+
+    def get_queryset(self):
+        # Correlated subquery: counted only for the rows on the page
+        question_count = (
+            Question.objects.filter(quiz=OuterRef('pk'))
+            .order_by()
+            .values('quiz')
+            .annotate(count=Count('*'))
+            .values('count')
+        )
+        return Quiz.objects.only('id', 'title', 'created_at').annotate(
+            question_count=Coalesce(Subquery(question_count), 0)
+        )
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return QuizCreateSerializer
+        return QuizSummarySerializer
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        with span('serializer'):
+            serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        with span('serializer'):
+            data = serializer.data
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
 
 
 class QuizDetailView(generics.RetrieveAPIView):
@@ -43,10 +105,96 @@ class QuizDetailView(generics.RetrieveAPIView):
     - Returns quiz with all questions
     - Does NOT expose correct_answer (uses QuizSerializer)
     - Returns 404 for non-existent quiz
+    - Serves pre-rendered JSON with a strong ETag; 304 on matching If-None-Match
     """
-    queryset = Quiz.objects.all()
+    queryset = Quiz.objects.prefetch_related('questions')
     serializer_class = QuizSerializer
     lookup_field = 'pk'
+    replica_reads = True
+    quiz_sharded = True
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        payload = get_quiz_payload(pk)
+        attempt = request.query_params.get('attempt')
+        if attempt:
+            # Shuffled layout of a started attempt: one seed lookup, rest cached
+            answer_key = get_answer_key(pk).for_seed(get_attempt_seed(pk, attempt))
+            etag = seeded_etag(payload.etag, answer_key)
+            cache_control = 'private, no-cache'
+        else:
+            etag = payload.etag
+            cache_control = settings.QUIZ_DETAIL_CACHE_CONTROL
+        headers = {
+            'ETag': etag,
+            'Cache-Control': cache_control,
+        }
+        
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        if attempt:
+            return Response(shuffle_quiz_data(payload.data, answer_key), headers=headers)
+        return PrerenderedResponse(payload.data, payload.content, headers=headers)
+
+
+class QuizStartView(APIView):
+    """
+    POST /api/quizzes/{id}/start/
+    Start an attempt and return its layout.
+    
+    - Issues a per-attempt seed; for quizzes with questions_per_attempt or
+      shuffling enabled it decides the question subset and order
+    - Returns {"attempt": id, "quiz": {...}}; re-fetch the same layout with
+      GET /api/quizzes/{id}/?attempt=<id> and submit with "attempt": <id>
+    - Returns 404 for non-existent quiz
+    """
+    quiz_sharded = True
+
+    def post(self, request, pk):
+        answer_key = get_answer_key(pk)
+        payload = get_quiz_payload(pk)
+        attempt = AttemptSeed.objects.create(quiz_id=pk)
+        
+        quiz = shuffle_quiz_data(payload.data, answer_key.for_seed(attempt.seed))
+        return Response({'attempt': str(attempt.pk), 'quiz': quiz}, status=status.HTTP_201_CREATED)
+
+
+class AttemptDraftView(APIView):
+    """
+    GET/PATCH /api/quizzes/{id}/attempts/{attempt}/
+    Answers saved so far for an attempt started with POST .../start/.
+    
+    - PATCH {"answers": {question_id: user_answer}} merges only the changed
+      answers (null clears one) and returns the whole draft
+    - Saves are coalesced in the cache and written to the database
+      periodically; submit with {"attempt": <id>} to grade the draft
+    - Returns 400 for questions outside the attempt or submitted attempts
+    - Returns 404 for non-existent quiz or attempt
+    """
+    quiz_sharded = True
+
+    def get(self, request, pk, attempt):
+        get_attempt_seed(pk, attempt)
+        return Response({'attempt': str(attempt), 'answers': get_drafts().load(attempt)})
+
+    def patch(self, request, pk, attempt):
+        answer_key = get_answer_key(pk).for_seed(get_attempt_seed(pk, attempt, unsubmitted=True))
+        
+        serializer = DraftSerializer(data=request.data)
+        with span('serializer'):
+            serializer.is_valid(raise_exception=True)
+        changes = serializer.validated_data['answers']
+        
+        unknown = changes.keys() - {str(question_id) for question_id, *_ in answer_key.entries}
+        if unknown:
+            raise ValidationError({'answers': [f'Unknown question ids: {", ".join(sorted(unknown))}']})
+        
+        answers = get_drafts().save(attempt, changes, quiz_id=pk)
+        return Response({'attempt': str(attempt), 'answers': answers})
 
 
 class QuizSubmitView(APIView):
@@ -58,60 +206,248 @@ class QuizSubmitView(APIView):
     - Creates QuizAttempt record
     - Returns detailed results with score
     - Unanswered questions are treated as incorrect
+    - With "attempt" the attempt's saved draft is graded too ("answers" may
+      then be omitted) and discarded afterwards
     """
+    quiz_sharded = True
 
     def post(self, request, pk):
-        # Get the quiz or return 404
-        quiz = get_object_or_404(Quiz, pk=pk)
+        # Load the compiled answer key (404 for unknown quizzes). Cached per
+        # quiz version, so the common case touches no database rows.
+        answer_key = get_answer_key(pk)
         
         # Validate the submitted answers
-        serializer = AnswerSubmissionSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        serializer = AttemptSubmissionSerializer(data=request.data)
+        with span('serializer'):
+            serializer.is_valid(raise_exception=True)
         
-        user_answers = serializer.validated_data['answers']
-        questions = quiz.questions.all()
+        user_answers = serializer.validated_data.get('answers', {})
         
-        # Calculate score and build results
-        score = 0
-        total_questions = questions.count()
-        results = []
+        # Shuffled attempts are graded on the questions their seed selected
+        attempt = serializer.validated_data.get('attempt')
+        seed = get_attempt_seed(pk, attempt) if attempt else None
+        answer_key = answer_key_for_seed(answer_key, seed)
         
-        for question in questions:
-            question_id_str = str(question.id)
-            user_answer = user_answers.get(question_id_str, '')
-            is_correct = user_answer == question.correct_answer
+        # An attempt is submitted once; the claim is released if recording fails
+        with submitting(pk, attempt):
+            # Answers sent with the submit take precedence over the saved draft
+            if attempt:
+                user_answers = {**get_drafts().load(attempt), **user_answers}
             
-            if is_correct:
-                score += 1
+            # Calculate score and build results
+            result = answer_key.grade(user_answers)
             
-            results.append({
-                'question_id': question.id,
-                'question_text': question.question_text,
-                'user_answer': user_answer if user_answer else None,
-                'correct_answer': question.correct_answer,
-                'is_correct': is_correct,
-            })
-        
-        # Calculate percentage
-        percentage = (score / total_questions * 100) if total_questions > 0 else 0
-        
-        # Create QuizAttempt record
-        QuizAttempt.objects.create(
-            quiz=quiz,
-            answers=user_answers,
-            score=score,
-            total_questions=total_questions,
-        )
+            # Create QuizAttempt record and update stats (possibly deferred to the write-behind spool)
+            user_id = request.user.id if request.user.is_authenticated else None
+            record_attempt(pk, user_answers, result, user_id)
+        if attempt:
+            get_drafts().discard(attempt)
         
-        # Build and return response
-        response_data = {
-            'score': score,
-            'total_questions': total_questions,
-            'percentage': percentage,
-            'results': results,
-        }
+        # Results are built server-side, so skip QuizResultSerializer validation
+        return Response(result.to_representation(), status=status.HTTP_200_OK)
+
+
+class QuizBatchSubmitView(APIView):
+    """
+    POST /api/quizzes/{id}/submit/batch/
+    Submit many answer sets at once (e.g. offline test centres).
+    Requires authentication.
+    
+    - Body is a JSON array of {"answers": {question_id: user_answer}} objects
+    - Loads the answer key once and stores all attempts in one transaction
+    - Invalid items are reported per item and do not fail the batch
+    - Streams one JSON object per line when Accept is application/x-ndjson
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+    quiz_sharded = True
+
+    def post(self, request, pk):
+        answer_key = get_answer_key(pk)
+        
+        submissions = request.data
+        if not isinstance(submissions, list):
+            return Response(
+                {'error': 'Expected a list of submissions'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(submissions) > settings.QUIZ_SUBMIT_BATCH_MAX:
+            return Response(
+                {'error': f'At most {settings.QUIZ_SUBMIT_BATCH_MAX} submissions per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validate every item; keep failures as per-item errors
+        checked = []
+        for submission in submissions:
+            serializer = AnswerSubmissionSerializer(data=submission)
+            with span('serializer'):
+                serializer.is_valid()
+            checked.append(serializer)
+        
+        # Resolve the seeds of all shuffled attempts with one query
+        attempt_ids = {s.validated_data['attempt'] for s in checked if 'attempt' in s.validated_data}
+        seeds = dict(
+            AttemptSeed.objects.for_quiz(pk).filter(pk__in=attempt_ids).values_list('pk', 'seed')
+        ) if attempt_ids else {}
+        # Each attempt is submitted once, by the first item that names it
+        claimed = claim_attempts(pk, attempt_ids)
+        unused = set(claimed)
+        
+        # Grade every valid item
+        items = []
+        graded = []
+        for index, serializer in enumerate(checked):
+            errors = serializer.errors
+            attempt = serializer.validated_data.get('attempt') if not errors else None
+            if attempt and attempt not in seeds:
+                errors = {'attempt': ['No attempt matches the given query.']}
+            elif attempt and attempt not in unused:
+                errors = {'attempt': [ALREADY_SUBMITTED]}
+            elif attempt:
+                unused.discard(attempt)
+            if not errors:
+                try:
+                    item_key = answer_key_for_seed(answer_key, seeds.get(attempt))
+                except ValidationError as exc:
+                    errors = exc.detail
+            if errors:
+                items.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors})
+                continue
+            user_answers = serializer.validated_data['answers']
+            result = item_key.grade(user_answers)
+            graded.append((user_answers, result))
+            items.append({'index': index, 'status': status.HTTP_200_OK, 'result': result.to_representation()})
+        
+        try:
+            record_attempts(pk, graded)
+        except BaseException:
+            release_attempts(pk, claimed)
+            raise
         
-        result_serializer = QuizResultSerializer(data=response_data)
-        result_serializer.is_valid(raise_exception=True)
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            lines = (encode_ndjson_line(item) for item in items)
+            return StreamingHttpResponse(lines, content_type=NDJSONRenderer.media_type)
         
-        return Response(result_serializer.data, status=status.HTTP_200_OK)
+        return Response({
+            'accepted': len(graded),
+            'rejected': len(items) - len(graded),
+            'results': items,
+        }, status=status.HTTP_200_OK)
+
+
+class QuizAttemptExportView(APIView):
+    """
+    GET /api/quizzes/{id}/attempts/export/?format=csv|ndjson
+    Stream the full attempt history of a quiz.
+    Requires authentication.
+    
+    - One row per attempt with a q_<question_id> column per question
+    - Rows are streamed from a database iterator, so memory stays constant
+    - ?archived=true[&since=&until=] streams archived attempts from cold
+      storage instead, decompressing only the blocks in the time range
+    - Returns 404 for non-existent quiz
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    quiz_sharded = True
+
+    def get(self, request, pk):
+        columns = export_columns(pk)
+        export_format = request.accepted_renderer.format
+        params = ArchiveRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        archived = None
+        if params.validated_data['archived']:
+            archived = (params.validated_data.get('since'), params.validated_data.get('until'))
+        rows = EXPORTERS[export_format](pk, columns, archived=archived)
+        
+        response = StreamingHttpResponse(rows, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="quiz-{pk}-attempts.{export_format}"'
+        return response
+
+
+class QuizStatsView(APIView):
+    """
+    GET /api/quizzes/{id}/stats/
+    Aggregated attempt statistics for a quiz.
+    Requires authentication.
+    
+    - Reads the incrementally maintained QuizStats/QuestionStats rows,
+      so cost grows with the number of questions, not attempts
+    - Returns 404 for non-existent quiz
+    """
+    permission_classes = [IsAuthenticated]
+    replica_reads = True
+    quiz_sharded = True
+
+    def get_stats(self, pk):
+        question_stats = QuestionStats.objects.select_related('question').order_by('question__order')
+        return (
+            QuizStats.objects.select_related('quiz')
+            .prefetch_related(Prefetch('quiz__question_stats', queryset=question_stats))
+            .filter(quiz_id=pk)
+            .first()
+        )
+
+    def get(self, request, pk):
+        stats = self.get_stats(pk)
+        if stats is None:
+            # Quizzes without attempts have no counters yet
+            get_object_or_404(Quiz, pk=pk)
+            ensure_stats_rows(pk)
+            stats = self.get_stats(pk)
+        
+        with span('serializer'):
+            data = QuizStatsSerializer(stats).data
+        return Response(data)
+
+
+class QuizLeaderboardView(APIView):
+    """
+    GET /api/quizzes/{id}/leaderboard/?limit=10
+    Best attempts of a quiz, ranked by score.
+    
+    - Ties share a rank (1, 2, 2, 4); earlier submissions are listed first
+    - "me" is the authenticated user's best attempt and its rank, else null
+    - Ranks come from per-score counters, not a count over all attempts
+    - Returns 404 for non-existent quiz
+    """
+    max_limit = 100
+    replica_reads = True
+    quiz_sharded = True
+
+    def get(self, request, pk):
+        if not Quiz.objects.filter(pk=pk).exists():
+            raise Http404('No Quiz matches the given query.')
+        try:
+            limit = int(request.query_params.get('limit', settings.QUIZ_LEADERBOARD_SIZE))
+        except ValueError:
+            limit = settings.QUIZ_LEADERBOARD_SIZE
+        limit = max(1, min(limit, self.max_limit))
+        
+        ranks = Ranks.load(pk)
+        me = best_entry(pk, request.user.id, ranks) if request.user.is_authenticated else None
+        with span('serializer'):
+            data = LeaderboardSerializer({
+                'quiz_id': pk,
+                'attempt_count': ranks.attempt_count,
+                'top': top_entries(pk, limit, ranks),
+                'me': me,
+            }).data
+        return Response(data)
+
+
+def metrics_view(request):
+    """
+    GET /api/metrics/
+    Prometheus text exposition of the per-view request histograms.
+    
+    - Requires "Authorization: Bearer <QUIZ_METRICS_TOKEN>"; 404 when no token is set
+    """
+    token = settings.QUIZ_METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
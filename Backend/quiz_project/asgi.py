@@ -0,0 +1,16 @@
+"""ASGI config for quiz_project project.
+
+Run under uvicorn workers, e.g.:
+
+    gunicorn quiz_project.asgi:application -k uvicorn.workers.UvicornWorker
+
+Importing this module enables QUIZ_ASGI (unless set explicitly), which routes
+the quiz detail and submit endpoints to their async views and disables
+persistent database connections, as Django requires under ASGI.
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_project.settings')
+os.environ.setdefault('QUIZ_ASGI', 'True')
+application = get_asgi_application()
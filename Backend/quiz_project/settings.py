@@ -31,6 +31,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz.middleware.PerformanceMiddleware',
+    'quiz.routers.ReplicaRoutingMiddleware',
+    'quiz.sharding.ShardRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -61,6 +64,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'quiz_project.wsgi.application'
+ASGI_APPLICATION = 'quiz_project.asgi.application'
+
+# Set by quiz_project.asgi: serve hot endpoints from quiz.async_views and
+# don't keep persistent DB connections (they leak across ASGI requests)
+QUIZ_ASGI = os.environ.get('QUIZ_ASGI', 'False') == 'True'
 
 # Database - Use PostgreSQL on Render, SQLite locally
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -68,7 +76,7 @@ if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
+            conn_max_age=0 if QUIZ_ASGI else 600,
             conn_health_checks=True,
         )
     }
@@ -81,6 +89,46 @@ else:
         }
     }
 
+# Optional read replica (e.g. sqlite:///replica.sqlite3 or a Postgres standby).
+# Quiz detail, listing, stats and leaderboard reads go to it; writes and
+# reads following a write stay on the primary (see quiz.routers).
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=0 if QUIZ_ASGI else 600,
+        conn_health_checks=True,
+        # Tests read the replica through the primary's test database
+        test_options={'MIRROR': 'default'},
+    )
+# Seconds the replica may lag the primary: clients that wrote, and quizzes
+# whose content changed, read from the primary for this long
+QUIZ_REPLICA_LAG_TOLERANCE = float(os.environ.get('QUIZ_REPLICA_LAG_TOLERANCE', 5.0))
+
+# Optional quiz shards: comma-separated database URLs added as shard1..N
+# (e.g. sqlite:///shard1.sqlite3,sqlite:///shard2.sqlite3). Attempts, seeds,
+# drafts, stats and leaderboard rows of each quiz live on one shard; quizzes
+# and questions stay in the default database (see quiz.sharding).
+DATABASE_SHARD_URLS = [url for url in os.environ.get('DATABASE_SHARD_URLS', '').split(',') if url.strip()]
+for number, url in enumerate(DATABASE_SHARD_URLS, start=1):
+    DATABASES[f'shard{number}'] = dj_database_url.parse(
+        url.strip(),
+        conn_max_age=0 if QUIZ_ASGI else 600,
+        conn_health_checks=True,
+    )
+# Shards new quizzes are hashed over (may include 'default'); empty disables sharding
+QUIZ_SHARDS = [alias for alias in os.environ.get(
+    'QUIZ_SHARDS', ','.join(f'shard{number}' for number in range(1, len(DATABASE_SHARD_URLS) + 1))
+).split(',') if alias]
+# Each shard allocates ids from its own range, so rows keep their ids when a quiz moves
+QUIZ_SHARD_ID_FLOORS = {f'shard{number}': number << 40 for number in range(1, len(DATABASE_SHARD_URLS) + 1)}
+# Seconds rebalance_quizzes waits after freezing a quiz for in-flight writes to finish
+QUIZ_SHARD_FREEZE_GRACE = float(os.environ.get('QUIZ_SHARD_FREEZE_GRACE', 1.0))
+# Seconds a process caches a quiz's shard lookup; moves wait this long for every
+# process to see their write freeze, so keep it short
+QUIZ_SHARD_LOOKUP_TIMEOUT = int(os.environ.get('QUIZ_SHARD_LOOKUP_TIMEOUT', 5))
+DATABASE_ROUTERS = ['quiz.sharding.ShardRouter', 'quiz.routers.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -88,6 +136,28 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing
+# QUIZ_PASSWORD_HASHER picks the algorithm for new hashes: 'pbkdf2', 'scrypt'
+# or 'argon2' (needs argon2-cffi). The others stay listed so existing hashes
+# keep verifying and are upgraded on the next login. Benchmark cost values
+# with `python -m benchmarks.password_hashing`.
+QUIZ_PASSWORD_HASHER = os.environ.get('QUIZ_PASSWORD_HASHER', 'pbkdf2')
+QUIZ_PBKDF2_ITERATIONS = int(os.environ.get('QUIZ_PBKDF2_ITERATIONS', 600000))
+QUIZ_SCRYPT_WORK_FACTOR = int(os.environ.get('QUIZ_SCRYPT_WORK_FACTOR', 2 ** 14))
+QUIZ_SCRYPT_BLOCK_SIZE = int(os.environ.get('QUIZ_SCRYPT_BLOCK_SIZE', 8))
+QUIZ_SCRYPT_PARALLELISM = int(os.environ.get('QUIZ_SCRYPT_PARALLELISM', 1))
+QUIZ_ARGON2_TIME_COST = int(os.environ.get('QUIZ_ARGON2_TIME_COST', 2))
+QUIZ_ARGON2_MEMORY_COST = int(os.environ.get('QUIZ_ARGON2_MEMORY_COST', 102400))
+QUIZ_ARGON2_PARALLELISM = int(os.environ.get('QUIZ_ARGON2_PARALLELISM', 8))
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'quiz.hashers.TunedPBKDF2PasswordHasher',
+    'scrypt': 'quiz.hashers.TunedScryptPasswordHasher',
+    'argon2': 'quiz.hashers.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[QUIZ_PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != QUIZ_PASSWORD_HASHER
+]
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -99,6 +169,10 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# The attempt leaderboard index uses INCLUDE columns, which only PostgreSQL
+# supports; SQLite simply builds the index without them.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # CORS settings
 if DEBUG:
     CORS_ALLOW_ALL_ORIGINS = True
@@ -111,11 +185,15 @@ else:
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'quiz.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Reverse proxies in front of the app (1 on Render). Client addresses for
+    # the login throttle come from X-Forwarded-For only through these hops;
+    # with 0 the header is ignored and REMOTE_ADDR is used.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
 # JWT Settings
@@ -125,3 +203,87 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
 }
+# How CachedJWTAuthentication resolves the token's user:
+# 'db' (query every request), 'cache' (short-TTL in-process cache) or
+# 'stateless' (trust the signed claims, no database access)
+QUIZ_JWT_USER_RESOLUTION = os.environ.get('QUIZ_JWT_USER_RESOLUTION', 'cache')
+QUIZ_JWT_USER_CACHE_TTL = float(os.environ.get('QUIZ_JWT_USER_CACHE_TTL', 60))
+
+# Quiz caching
+# Per-quiz derived data (answer keys, rendered payloads) is cached in-process
+# and in the default Django cache, keyed by the version token on the Quiz row.
+# A shared backend (Redis/memcached) makes invalidations immediate and shares
+# the rendered data between workers.
+QUIZ_ANSWER_KEY_CACHE_SIZE = int(os.environ.get('QUIZ_ANSWER_KEY_CACHE_SIZE', 256))
+QUIZ_PAYLOAD_CACHE_SIZE = int(os.environ.get('QUIZ_PAYLOAD_CACHE_SIZE', 256))
+QUIZ_CACHE_TIMEOUT = int(os.environ.get('QUIZ_CACHE_TIMEOUT', 3600))
+# Seconds a worker trusts its cached copy of a quiz's version token (stored on
+# the Quiz row); edits reach workers with a per-process cache within this time
+QUIZ_VERSION_CACHE_TIMEOUT = int(os.environ.get('QUIZ_VERSION_CACHE_TIMEOUT', 5))
+# Cache-Control sent with GET /api/quizzes/{id}/ (clients revalidate via ETag)
+QUIZ_DETAIL_CACHE_CONTROL = os.environ.get('QUIZ_DETAIL_CACHE_CONTROL', 'public, max-age=60')
+# Default page size of GET /api/quizzes/
+QUIZ_LIST_PAGE_SIZE = int(os.environ.get('QUIZ_LIST_PAGE_SIZE', 20))
+# Rows fetched per database round trip when streaming attempt exports
+QUIZ_EXPORT_CHUNK_SIZE = int(os.environ.get('QUIZ_EXPORT_CHUNK_SIZE', 2000))
+# Default number of entries in GET /api/quizzes/{id}/leaderboard/ (max 100)
+QUIZ_LEADERBOARD_SIZE = int(os.environ.get('QUIZ_LEADERBOARD_SIZE', 10))
+# Max questions per INSERT when creating quizzes (backends may cap it lower)
+QUIZ_QUESTION_BULK_BATCH_SIZE = int(os.environ.get('QUIZ_QUESTION_BULK_BATCH_SIZE', 500))
+
+# Quiz attempt write-behind
+# When enabled, graded attempts are appended to a local SQLite spool and
+# bulk-inserted by a background thread instead of inside the request. Run
+# `manage.py drain_attempt_queue` to flush or replay the spool manually.
+QUIZ_ATTEMPT_WRITE_BEHIND = os.environ.get('QUIZ_ATTEMPT_WRITE_BEHIND', 'False') == 'True'
+QUIZ_ATTEMPT_SPOOL_PATH = os.environ.get('QUIZ_ATTEMPT_SPOOL_PATH', str(BASE_DIR / 'attempt_spool.sqlite3'))
+QUIZ_ATTEMPT_BATCH_SIZE = int(os.environ.get('QUIZ_ATTEMPT_BATCH_SIZE', 500))
+# Seconds between background flushes; 0 disables the flusher thread
+QUIZ_ATTEMPT_FLUSH_INTERVAL = float(os.environ.get('QUIZ_ATTEMPT_FLUSH_INTERVAL', 1.0))
+# How new attempts store their answers: 'json' ({question_id: answer}) or
+# 'packed' (option indices and a correctness bitmap, see quiz.packing).
+# Convert existing rows with `manage.py convert_attempt_answers`.
+QUIZ_ATTEMPT_ANSWER_ENCODING = os.environ.get('QUIZ_ATTEMPT_ANSWER_ENCODING', 'json')
+# Max submissions accepted by POST /api/quizzes/{id}/submit/batch/
+QUIZ_SUBMIT_BATCH_MAX = int(os.environ.get('QUIZ_SUBMIT_BATCH_MAX', 1000))
+
+# Attempt archival
+# `manage.py archive_attempts --older-than DAYS` moves old attempts to gzip
+# NDJSON segment files under QUIZ_ARCHIVE_DIR (see quiz.archive) and deletes
+# them from the database; export them with ?archived=true.
+QUIZ_ARCHIVE_DIR = os.environ.get('QUIZ_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+# Rows per independently compressed block (the unit a time-range read decompresses)
+QUIZ_ARCHIVE_BLOCK_ROWS = int(os.environ.get('QUIZ_ARCHIVE_BLOCK_ROWS', 1000))
+# Rows per segment file
+QUIZ_ARCHIVE_SEGMENT_ROWS = int(os.environ.get('QUIZ_ARCHIVE_SEGMENT_ROWS', 100000))
+
+# Attempt drafts
+# Saves to PATCH /api/quizzes/{id}/attempts/{attempt}/ are coalesced in the
+# cache and upserted into the database every QUIZ_DRAFT_FLUSH_INTERVAL
+# seconds (0 disables the flusher thread; drafts then wait for the submit).
+# Coalescing needs a shared cache backend; with the default per-process cache
+# every save is written to the database directly.
+QUIZ_DRAFT_FLUSH_INTERVAL = float(os.environ.get('QUIZ_DRAFT_FLUSH_INTERVAL', 5.0))
+QUIZ_DRAFT_CACHE_TIMEOUT = int(os.environ.get('QUIZ_DRAFT_CACHE_TIMEOUT', 6 * 3600))
+
+# Request instrumentation
+# Fraction of requests measured by quiz.middleware.PerformanceMiddleware
+# (0 disables it). Histograms are served at /api/metrics/.
+QUIZ_METRICS_SAMPLE_RATE = float(os.environ.get('QUIZ_METRICS_SAMPLE_RATE', 1.0))
+# Server-Timing headers expose database time to clients, so only on by default in DEBUG
+QUIZ_METRICS_SERVER_TIMING = os.environ.get('QUIZ_METRICS_SERVER_TIMING', str(DEBUG)) == 'True'
+# /api/metrics/ requires "Authorization: Bearer <token>" and is not served without one
+QUIZ_METRICS_TOKEN = os.environ.get('QUIZ_METRICS_TOKEN', '')
+
+# Login throttling
+# In-process token buckets checked before LoginView hashes anything. A request
+# is rejected with 429 when its client IP bucket, or its (username, IP) bucket, is
+# empty. Buckets hold up to *_BURST tokens and refill at *_RATE tokens per
+# second; a burst of 0 disables that bucket. The IP bucket is generous
+# because a whole classroom often shares one NAT address.
+QUIZ_LOGIN_USERNAME_BURST = int(os.environ.get('QUIZ_LOGIN_USERNAME_BURST', 10))
+QUIZ_LOGIN_USERNAME_RATE = float(os.environ.get('QUIZ_LOGIN_USERNAME_RATE', 0.2))
+QUIZ_LOGIN_IP_BURST = int(os.environ.get('QUIZ_LOGIN_IP_BURST', 300))
+QUIZ_LOGIN_IP_RATE = float(os.environ.get('QUIZ_LOGIN_IP_RATE', 10))
+# Distinct usernames/IPs tracked per process (least recently used are dropped)
+QUIZ_LOGIN_BUCKETS_MAX = int(os.environ.get('QUIZ_LOGIN_BUCKETS_MAX', 100000))